@@ -2,19 +2,20 @@
 import os
 import time
 import yaml
+from functools import lru_cache
 from .utilities import *
-from openai import OpenAI
+
+# The editor docs and the OpenAI client are loaded on first use, so importing
+# this module (every web and Celery worker does, via views) stays cheap.
 
 _DOC_PATH = os.path.join(os.path.dirname(__file__), "Editor Documentation.txt")
-with open(_DOC_PATH, encoding="utf-8") as _f:
-    _EDITOR_DOCS = _f.read()
 
-PROMPT_INSTRUCTIONS = f"""
+_PROMPT_INSTRUCTIONS = """
 The following documentation describes the full template format. The docs use YAML syntax
 (as written in the editor); when returning templates you must use JSON syntax instead —
 but all rules for parameters, expressions, answers, diagrams, and validation apply equally.
 
-{_EDITOR_DOCS}
+{docs}
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 JSON RETURN FORMAT
@@ -50,9 +51,22 @@ OUTPUT RULES
 """
 
 
-chat_key=os.environ["CHAT_KEY"]
+@lru_cache(maxsize=None)
+def load_editor_docs() -> str:
+    with open(_DOC_PATH, encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def prompt_instructions() -> str:
+    return _PROMPT_INSTRUCTIONS.format(docs=load_editor_docs())
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.environ["CHAT_KEY"])
 
-client = OpenAI(api_key=chat_key)
 
 def _extract_existing_questions(skill) -> list[str]:
     """Return question texts from all existing templates for this skill."""
@@ -90,7 +104,7 @@ def generate_template_content(skill, grade) -> dict:
         f"Create a structured practice template for the skill: '{skill.description}' "
         f"and for the grade: '{grade}' which relates to '{maths_stage(grade)}'.\n"
     )
-    prompt += PROMPT_INSTRUCTIONS
+    prompt += prompt_instructions()
     prompt += (
         "\n- Provide exactly 5 easy templates, 5 medium templates, and 5 hard templates."
         "\n- The \"title\" must describe what the question actually asks, not the skill name."
@@ -101,7 +115,7 @@ def generate_template_content(skill, grade) -> dict:
 
     # print(prompt)
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o-mini",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.4,
@@ -119,13 +133,13 @@ def update_template(existing_yaml: str, user_instruction: str) -> dict:
         f"INSTRUCTION: {user_instruction}\n\n"
         f"EXISTING TEMPLATE (YAML):\n{existing_yaml}\n\n"
     )
-    prompt += PROMPT_INSTRUCTIONS
+    prompt += prompt_instructions()
     prompt += (
         "\n- Return ONLY ONE template as a single JSON object (not an array)."
         "\n- Preserve all existing fields (title, years, difficulty, skill) unless the instruction requires changing them."
     )
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o-mini",
         messages=[{"role": "user", "content": prompt}],
         temperature=0.3,
@@ -155,7 +169,7 @@ def generate_template_from_image(image_b64: str, mime_type: str, skills: list, g
         "Infer the difficulty ('easy', 'medium', or 'hard') from the question's complexity.\n\n"
         f"AVAILABLE SKILLS (Year {grade}):\n{skill_lines}\n\n"
     )
-    prompt += PROMPT_INSTRUCTIONS
+    prompt += prompt_instructions()
     prompt += (
         "\n- Return ONLY ONE template as a single JSON object (not an array)."
         f"\n- Set the 'years' field to {grade}."
@@ -165,7 +179,7 @@ def generate_template_from_image(image_b64: str, mime_type: str, skills: list, g
     if additional_prompt and additional_prompt.strip():
         prompt += f"\n\nAdditional instructions from the user: {additional_prompt.strip()}"
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o",
         messages=[{
             "role": "user",
@@ -202,11 +216,11 @@ def generate_knowledge_from_image(image_b64: str, mime_type: str, additional_pro
         "DIAGRAM DOCUMENTATION\n"
         "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
     )
-    prompt += _EDITOR_DOCS
+    prompt += load_editor_docs()
     if additional_prompt and additional_prompt.strip():
         prompt += f"\n\nAdditional instructions: {additional_prompt.strip()}"
 
-    response = client.chat.completions.create(
+    response = get_client().chat.completions.create(
         model="gpt-4o",
         messages=[{
             "role": "user",
@@ -0,0 +1,184 @@
+from bisect import bisect_right
+from datetime import time
+from math import ceil
+
+# Availability engine. A day is worked on as sorted lists of half-open
+# (start, end) intervals in minutes from midnight: availability windows,
+# bookings (plus buffers) and blocked time. Free time is the windows with the
+# blocks subtracted, and the bookable slots are the grid points in the free
+# time where a whole session fits. Where each mark of the day needs its own
+# state (e.g. which appointment covers 09:15), day_grid paints the intervals
+# onto one list entry per STEP_MINUTES mark.
+#
+# Bookings and buffers block their exact minutes. The 15-minute stepping this
+# replaced only blocked the marks it stepped onto from each booking's start,
+# so an off-grid booking (10:10-10:40) or buffer (10 minutes) blocked none of
+# the quarter-hour slots it overlaps. Here those slots are blocked; on
+# quarter-hour data both give the same slots (see availability_bench.py).
+
+STEP_MINUTES = 15
+DAY_MINUTES = 24 * 60
+
+
+def to_minutes(t) -> float:
+    """Minutes from midnight for a time (seconds kept as a fraction)."""
+    m = t.hour * 60 + t.minute
+    if t.second or t.microsecond:
+        m += (t.second + t.microsecond / 1e6) / 60
+    return m
+
+
+def parse_hhmm(text) -> int:
+    hour, minute = map(int, text.split(":"))
+    return hour * 60 + minute
+
+
+def to_time(m) -> time:
+    m = int(m) % DAY_MINUTES
+    return time(m // 60, m % 60)
+
+
+def hhmm(m) -> str:
+    m = int(m) % DAY_MINUTES
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def minutes_on(day, moment) -> float:
+    """Minutes from the start of `day` to the (local, wall-clock) datetime `moment`."""
+    return (moment.date() - day).days * DAY_MINUTES + to_minutes(moment.time())
+
+
+def merge(intervals) -> list:
+    """Sorted union of (start, end) intervals; empty ones are dropped."""
+    merged = []
+    for start, end in sorted(i for i in intervals if i[0] < i[1]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract(intervals, blocks) -> list:
+    """`intervals` minus `blocks`, both merged; one pass over each list."""
+    free = []
+    j = 0
+    for start, end in intervals:
+        while j < len(blocks) and blocks[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(blocks) and blocks[k][0] < end:
+            if blocks[k][0] > start:
+                free.append((start, blocks[k][0]))
+            start = max(start, blocks[k][1])
+            k += 1
+        if start < end:
+            free.append((start, end))
+    return free
+
+
+def covers(intervals, m) -> bool:
+    """True if minute `m` is inside one of the merged `intervals`."""
+    i = bisect_right(intervals, (m, float("inf"))) - 1
+    return i >= 0 and intervals[i][0] <= m < intervals[i][1]
+
+
+def slot_starts(free, session, origin, step=STEP_MINUTES) -> list:
+    """Starts on the grid origin + k*step where `session` minutes fit in `free`."""
+    starts = []
+    for start, end in free:
+        first = origin + ceil((start - origin) / step) * step
+        starts.extend(range(int(first), int(end - session) + 1, step))
+    return starts
+
+
+def bookable_starts(windows, blocks, session, step=STEP_MINUTES) -> list:
+    """Session starts in each window (in window order, on that window's grid)
+    that overlap none of the merged `blocks`."""
+    starts = []
+    for window in windows:
+        starts.extend(slot_starts(subtract([window], blocks), session, window[0], step))
+    return starts
+
+
+def day_grid(windows, booked, step=STEP_MINUTES) -> list:
+    """The state of each `step`-minute mark of a day: the item of the first
+    (start, end, item) in `booked` covering it, else "available" inside one
+    of `windows`, else "outside"."""
+    n = DAY_MINUTES // step
+    grid = ["outside"] * n
+    for start, end in windows:
+        _paint(grid, start, end, step, "available")
+    # Earlier bookings win where they overlap, so paint them last
+    for start, end, item in reversed(booked):
+        _paint(grid, start, end, step, item)
+    return grid
+
+
+def _paint(grid, start, end, step, value):
+    a = max(0, ceil(start / step))
+    b = min(len(grid), ceil(end / step))
+    if a < b:
+        grid[a:b] = [value] * (b - a)
+
+
+def _state_at(windows, booked, m):
+    # The day_grid state at any minute, on or off the grid
+    for start, end, item in booked:
+        if start <= m < end:
+            return item
+    if any(start <= m < end for start, end in windows):
+        return "available"
+    return "outside"
+
+
+def day_slots(windows, booked, session, step=STEP_MINUTES) -> tuple:
+    """(grid, bookable) for one day: the day_grid states, and the minutes of
+    the available marks whose session end (on the same day) is available too."""
+    grid = day_grid(windows, booked, step)
+    bookable = []
+    for i, state in enumerate(grid):
+        if state != "available":
+            continue
+        end = (i * step + session) % DAY_MINUTES
+        end_state = grid[end // step] if end % step == 0 else _state_at(windows, booked, end)
+        if end_state == "available":
+            bookable.append(i * step)
+    return grid, bookable
+
+
+# ---------- WEEKLY AND ADHOC SLOTS ---------------
+
+def weekly_bookable_slots(availability, weekly_bookings, session, buffer) -> dict:
+    """Bookable "HH:MM" session starts per weekday (0-6) for availability
+    windows and weekly bookings (anything with weekday, start_time, end_time).
+    Each booking blocks its time plus `buffer` minutes either side."""
+    blocked = {}
+    for wb in weekly_bookings:
+        blocked.setdefault(wb.weekday, []).append(
+            (to_minutes(wb.start_time) - buffer, to_minutes(wb.end_time) + buffer)
+        )
+    blocked = {weekday: merge(intervals) for weekday, intervals in blocked.items()}
+
+    result = {i: [] for i in range(7)}
+    for av in availability:
+        window = (to_minutes(av.start_time), to_minutes(av.end_time))
+        starts = bookable_starts([window], blocked.get(av.weekday, []), session)
+        result[av.weekday].extend(hhmm(m) for m in starts)
+    return result
+
+
+def adhoc_bookable_slots(weekly, booking_map, dates) -> dict:
+    """The `weekly` slots on each date, less those starting inside one of that
+    date's bookings (booking_map: {"YYYY-MM-DD": [{"start_time", "end_time"}]})."""
+    result = {}
+    for day in dates:
+        day_str = day.isoformat()
+        booked = merge(
+            (parse_hhmm(b["start_time"]), parse_hhmm(b["end_time"]))
+            for b in booking_map.get(day_str, [])
+        )
+        slots = (parse_hhmm(time_str) for time_str in weekly.get(day.weekday(), []))
+        result[day_str] = [hhmm(m) for m in slots if not covers(booked, m)]
+    return result
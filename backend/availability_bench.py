@@ -0,0 +1,280 @@
+import random
+import time as _time
+from datetime import datetime, date, time, timedelta
+from types import SimpleNamespace
+
+from .availability import (
+    DAY_MINUTES, to_minutes, to_time, minutes_on, merge, bookable_starts, day_grid, day_slots,
+    weekly_bookable_slots, adhoc_bookable_slots,
+)
+
+# Benchmark of the availability engine against the 15-minute stepping it
+# replaced. The legacy_* functions are the old algorithms, kept here only as
+# the reference: both versions run over the same randomly generated tutors
+# (plain objects, no database) and must give identical output.
+#
+# With off_grid=True the tutors' bookings start on any 5-minute mark and
+# buffers can be 5 or 10 minutes. There the outputs are expected to differ:
+# the old stepping never blocked a quarter-hour slot for an off-grid booking
+# or buffer, the engine blocks every slot that overlaps one.
+
+WEEK_START = date(2026, 3, 2)   # a Monday
+
+
+# ---------- LEGACY STEPPING ---------------
+
+def legacy_weekly_slots(availability, weekly_bookings, session_minutes, buffer_minutes):
+    session_delta = timedelta(minutes=session_minutes)
+    buffer_delta = timedelta(minutes=buffer_minutes)
+    blocked = {i: set() for i in range(7)}
+
+    for wb in weekly_bookings:
+        start_dt = datetime.combine(date.today(), wb.start_time) - buffer_delta
+        end_dt = datetime.combine(date.today(), wb.end_time) + buffer_delta
+        cur = start_dt
+        while cur < end_dt:
+            blocked[wb.weekday].add(cur.time())
+            cur += timedelta(minutes=15)
+
+    result = {i: [] for i in range(7)}
+    for av in availability:
+        start = datetime.combine(date.today(), av.start_time)
+        end = datetime.combine(date.today(), av.end_time)
+        cur = start
+        while cur + session_delta <= end:
+            conflict = False
+            check = cur
+            while check < cur + session_delta:
+                if check.time() in blocked[av.weekday]:
+                    conflict = True
+                    break
+                check += timedelta(minutes=15)
+            if not conflict:
+                result[av.weekday].append(cur.time().strftime("%H:%M"))
+            cur += timedelta(minutes=15)
+    return result
+
+
+def legacy_adhoc_slots(weekly_slots, booking_map, dates):
+    result = {}
+    for day in dates:
+        day_str = day.isoformat()
+        blocked = set()
+        for b in booking_map.get(day_str, []):
+            start_h, start_m = map(int, b["start_time"].split(":"))
+            end_h, end_m = map(int, b["end_time"].split(":"))
+            cur = datetime.combine(day, time(start_h, start_m))
+            end = datetime.combine(day, time(end_h, end_m))
+            while cur < end:
+                blocked.add(cur.time().strftime("%H:%M"))
+                cur += timedelta(minutes=15)
+        slot_dts = []
+        for time_str in weekly_slots.get(day.weekday(), []):
+            hour, minute = map(int, time_str.split(":"))
+            slot_dts.append(datetime.combine(day, time(hour, minute)))
+        result[day_str] = [
+            dt.time().strftime("%H:%M") for dt in slot_dts if dt.time().strftime("%H:%M") not in blocked
+        ]
+    return result
+
+
+def _legacy_status(d, t, appointments, windows):
+    dt = datetime.combine(d, t)
+    for appt in appointments:
+        if appt.start_datetime <= dt < appt.end_datetime:
+            return appt
+    for window in windows:
+        if window.start_time <= t < window.end_time:
+            return "available"
+    return "outside"
+
+
+def legacy_day_slots(d, windows, appointments, session_minutes):
+    """Segment states and bookable times for one day, as User.generate_weekly_slots had them."""
+    states = []
+    bookable = []
+    for minute in range(0, DAY_MINUTES, 15):
+        t = (datetime.min + timedelta(minutes=minute)).time()
+        state = _legacy_status(d, t, appointments, windows)
+        states.append(state)
+        if state != "available":
+            continue
+        end_t = (datetime.combine(d, t) + timedelta(minutes=session_minutes)).time()
+        if _legacy_status(d, end_t, appointments, windows) == "available":
+            bookable.append(t)
+    return states, bookable
+
+
+def legacy_calendar_day(d, windows, bookings, session_minutes, buffer_minutes):
+    """Bookable times and 5-minute segment types for one day, as tutor_calendar had them."""
+    session = timedelta(minutes=session_minutes)
+    buffer = timedelta(minutes=buffer_minutes)
+    bookable = []
+    for window in windows:
+        start_dt = datetime.combine(d, window.start_time)
+        end_dt = datetime.combine(d, window.end_time)
+        candidate = start_dt
+        while candidate + timedelta(minutes=15) <= end_dt:
+            session_end = candidate + session
+            if session_end <= end_dt and all(
+                session_end + buffer <= b.start_datetime or candidate >= b.end_datetime + buffer
+                for b in bookings
+            ):
+                bookable.append(candidate.time())
+            candidate += timedelta(minutes=15)
+
+    segments = []
+    for minute in range(0, DAY_MINUTES, 5):
+        t = (datetime.min + timedelta(minutes=minute)).time()
+        if any(b.start_datetime.time() <= t < b.end_datetime.time() for b in bookings):
+            segments.append("booked_other")
+        elif any(w.start_time <= t < w.end_time for w in windows):
+            segments.append("available")
+        else:
+            segments.append("outside")
+    return bookable, segments
+
+
+# ---------- ENGINE, SAME INPUTS ---------------
+
+def engine_day_slots(d, windows, appointments, session_minutes):
+    booked = [(minutes_on(d, a.start_datetime), minutes_on(d, a.end_datetime), a) for a in appointments]
+    grid, bookable = day_slots([(to_minutes(w.start_time), to_minutes(w.end_time)) for w in windows],
+                               booked, session_minutes)
+    return grid, [to_time(m) for m in bookable]
+
+
+def engine_calendar_day(d, windows, bookings, session_minutes, buffer_minutes):
+    spans = [(to_minutes(w.start_time), to_minutes(w.end_time)) for w in windows]
+    blocks = merge(
+        (minutes_on(d, b.start_datetime) - buffer_minutes, minutes_on(d, b.end_datetime) + buffer_minutes)
+        for b in bookings
+    )
+    bookable = [to_time(m) for m in bookable_starts(spans, blocks, session_minutes)]
+    booked = [
+        (to_minutes(b.start_datetime.time()), to_minutes(b.end_datetime.time()), "booked_other")
+        for b in bookings
+    ]
+    return bookable, day_grid(spans, booked, 5)
+
+
+# ---------- SYNTHETIC TUTORS ---------------
+
+def _mark(rng, lo, hi, step=15):
+    return rng.randrange(lo // step, hi // step + 1) * step
+
+
+def _clock(m):
+    return time(m // 60, m % 60)
+
+
+def random_tutor(rng, off_grid=False):
+    """A tutor's week: availability windows, weekly and adhoc bookings, all on
+    quarter hours; with `off_grid`, bookings and buffers use 5-minute marks."""
+    step = 5 if off_grid else 15
+    tutor = SimpleNamespace(
+        session=rng.choice([30, 45, 60, 90]),
+        buffer=rng.choice([0, 5, 10, 15, 30] if off_grid else [0, 15, 30]),
+        availability=[], weekly=[], adhoc=[],
+    )
+    for weekday in range(7):
+        for _ in range(rng.randint(0, 2)):
+            start = _mark(rng, 6 * 60, 16 * 60)
+            end = min(start + _mark(rng, 60, 8 * 60), 23 * 60 + 45)
+            tutor.availability.append(SimpleNamespace(weekday=weekday, start_time=_clock(start), end_time=_clock(end)))
+        for _ in range(rng.randint(0, 4)):
+            start = _mark(rng, 7 * 60, 20 * 60, step)
+            end = start + rng.choice([30, 45, 60, 90])
+            tutor.weekly.append(SimpleNamespace(weekday=weekday, start_time=_clock(start), end_time=_clock(end)))
+        day = WEEK_START + timedelta(days=weekday)
+        for _ in range(rng.randint(0, 4)):
+            start = datetime.combine(day, time.min) + timedelta(minutes=_mark(rng, 7 * 60, 21 * 60, step))
+            end = start + timedelta(minutes=rng.choice([30, 45, 60, 90]))
+            tutor.adhoc.append(SimpleNamespace(id=len(tutor.adhoc) + 1, start_datetime=start, end_datetime=end))
+    return tutor
+
+
+def _booking_map(tutor):
+    booking_map = {}
+    for b in tutor.adhoc:
+        booking_map.setdefault(b.start_datetime.date().isoformat(), []).append({
+            "start_time": b.start_datetime.strftime("%H:%M"),
+            "end_time": b.end_datetime.strftime("%H:%M"),
+        })
+    return booking_map
+
+
+def _days(tutor):
+    """(date, windows, adhoc bookings) for each day of the tutor's week."""
+    days = []
+    for i in range(7):
+        d = WEEK_START + timedelta(days=i)
+        windows = [av for av in tutor.availability if av.weekday == i]
+        bookings = [b for b in tutor.adhoc if b.start_datetime.date() == d]
+        days.append((d, windows, bookings))
+    return days
+
+
+# ---------- BENCHMARK ---------------
+
+def _call_sites(tutors):
+    """{name: (legacy, engine)}, each a function of one tutor returning comparable output."""
+    dates = [WEEK_START + timedelta(days=i) for i in range(7)]
+    return {
+        "weekly_slots": (
+            lambda t: legacy_weekly_slots(t.availability, t.weekly, t.session, t.buffer),
+            lambda t: weekly_bookable_slots(t.availability, t.weekly, t.session, t.buffer),
+        ),
+        "adhoc_slots": (
+            lambda t: legacy_adhoc_slots(t.weekly_slots, t.booking_map, dates),
+            lambda t: adhoc_bookable_slots(t.weekly_slots, t.booking_map, dates),
+        ),
+        "week_segments": (
+            lambda t: [legacy_day_slots(d, w, b, t.session) for d, w, b in t.days],
+            lambda t: [engine_day_slots(d, w, b, t.session) for d, w, b in t.days],
+        ),
+        "calendar": (
+            lambda t: [legacy_calendar_day(d, w, b, t.session, t.buffer) for d, w, b in t.days],
+            lambda t: [engine_calendar_day(d, w, b, t.session, t.buffer) for d, w, b in t.days],
+        ),
+    }
+
+
+def _time_ms(fn, tutors, repeat):
+    best = None
+    for _ in range(repeat):
+        start = _time.perf_counter()
+        for tutor in tutors:
+            fn(tutor)
+        elapsed = (_time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3)
+
+
+def run_bench(tutors=200, repeat=3, seed=0, off_grid=False):
+    """Run old and new availability code over `tutors` random tutors.
+
+    Returns {"tutors", "off_grid", "results": {call site: {"legacy_ms",
+    "engine_ms", "speedup", "differing", "mismatches"}}}; differing counts
+    the tutors whose outputs differ and mismatches lists (up to 5) of them.
+    """
+    rng = random.Random(seed)
+    sample = [random_tutor(rng, off_grid) for _ in range(tutors)]
+    for tutor in sample:
+        tutor.weekly_slots = legacy_weekly_slots(tutor.availability, tutor.weekly, tutor.session, tutor.buffer)
+        tutor.booking_map = _booking_map(tutor)
+        tutor.days = _days(tutor)
+
+    results = {}
+    for name, (legacy, engine) in _call_sites(sample).items():
+        mismatches = [i for i, tutor in enumerate(sample) if legacy(tutor) != engine(tutor)]
+        legacy_ms = _time_ms(legacy, sample, repeat)
+        engine_ms = _time_ms(engine, sample, repeat)
+        results[name] = {
+            "legacy_ms": legacy_ms,
+            "engine_ms": engine_ms,
+            "speedup": round(legacy_ms / engine_ms, 1) if engine_ms else 0.0,
+            "differing": len(mismatches),
+            "mismatches": mismatches[:5],
+        }
+    return {"tutors": tutors, "off_grid": off_grid, "results": results}
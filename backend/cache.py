@@ -1,9 +1,222 @@
 from .models import *
+import threading as _threading
+from contextlib import contextmanager
+from time import time_ns as _time_ns, monotonic as _monotonic, sleep as _sleep
+from uuid import uuid4 as _uuid4
+from django.conf import settings
+from django.core.cache import caches
+
+
+# ----------- SHARED BACKEND ------------------
+# Cached calendars, student lists and the skills matrix live in a Django cache
+# (Redis in production, per-process locmem locally and in tests; see
+# CALENDAR_CACHE_ALIAS), so every web worker reads and invalidates the same
+# copy. Keys are namespaced by kind of data and versioned per tutor:
+#
+#   calendar:<namespace>:<tutor_id>:<tutor version>.<namespace version>[:<part>]
+#
+# Bumping a version counter makes every key built on it unreachable at once,
+# in every worker; the orphaned entries expire after CACHE_TIMEOUT.
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+# Read-modify-write updates of a tutor's entries hold a lock in the shared
+# cache: at most LOCK_WAIT seconds are spent waiting for it (the caller then
+# invalidates instead), and a worker that dies holding it blocks others for
+# at most LOCK_TIMEOUT seconds.
+LOCK_WAIT = 0.2
+LOCK_TIMEOUT = 5
+
+_STATS_LOCK = _threading.Lock()
+_REGISTRY = []   # every TutorCache, for calendar_cache_stats()
+
+
+def calendar_cache():
+    return caches[getattr(settings, "CALENDAR_CACHE_ALIAS", "default")]
+
+
+def _version_key(namespace, tutor_id):
+    return f"calendar:version:{namespace}:{tutor_id}"
+
+
+def _new_version():
+    # Counters start from the clock, so one that was evicted and is
+    # recreated can never reuse a number already in old keys
+    return _time_ns() // 1000
+
+
+def _bump(key):
+    backend = calendar_cache()
+    try:
+        backend.incr(key)
+    except ValueError:
+        if not backend.add(key, _new_version(), None):
+            backend.incr(key)
+
+
+def bump_tutor_version(tutor_id):
+    """Invalidate every cached entry of every kind for this tutor, in all workers."""
+    _bump(_version_key("tutor", tutor_id))
+
+
+def week_end(week_start):
+    """When a cached 7-day window starting on `week_start` (ISO date) stops being useful."""
+    return datetime.combine(date.fromisoformat(week_start) + timedelta(days=7), time.min)
+
+
+class TutorCache:
+    """One kind of cached data, stored in the shared cache per tutor.
+
+    A tutor's entries are a single value (part="") or several values told apart
+    by `part`, e.g. one per week start. Values read from the cache are copies:
+    to change an entry, modify it and set() it again.
+
+    ttl:       seconds an entry lives
+    max_parts: most parts kept per tutor; writing one more evicts the least
+               recently written
+    expires:   part -> datetime after which that entry is useless (e.g.
+               week_end); such entries are never kept past it
+
+    Parts starting with "#" hold metadata about the tutor's entries (such
+    as BOOKING_INDEX): they live for `ttl` and do not count towards max_parts.
+
+    Hits, misses and evictions are counted per process (see stats()).
+    """
+
+    def __init__(self, namespace, ttl=CACHE_TIMEOUT, max_parts=None, expires=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_parts = max_parts
+        self.expires = expires
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        _REGISTRY.append(self)
+
+    def _count(self, name, n=1):
+        with _STATS_LOCK:
+            self._stats[name] += n
+
+    def stats(self):
+        with _STATS_LOCK:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _prefix(self, tutor_id):
+        backend = calendar_cache()
+        keys = [_version_key("tutor", tutor_id), _version_key(self.namespace, tutor_id)]
+        versions = backend.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                backend.add(key, _new_version(), None)
+                versions[key] = backend.get(key)
+        return f"calendar:{self.namespace}:{tutor_id}:{versions[keys[0]]}.{versions[keys[1]]}"
+
+    @staticmethod
+    def _part_key(prefix, part):
+        return f"{prefix}:{part}" if part else prefix
+
+    def key(self, tutor_id, part=""):
+        return self._part_key(self._prefix(tutor_id), part)
+
+    def _timeout(self, part):
+        """Seconds to keep `part`, or 0 if it has already expired."""
+        if self.expires is None or not part or part.startswith("#"):
+            return self.ttl
+        remaining = int((self.expires(part) - datetime.now()).total_seconds())
+        return max(0, min(self.ttl, remaining))
+
+    def _store(self, prefix, values):
+        """Write {part: value} under `prefix`, keeping the tutor's parts within bounds."""
+        backend = calendar_cache()
+        live = {part: value for part, value in values.items() if self._timeout(part) > 0}
+        for part, value in live.items():
+            backend.set(self._part_key(prefix, part), value, self._timeout(part))
+        written = [part for part in live if not part.startswith("#")]
+        if (self.max_parts is None and self.expires is None) or not written:
+            return
+
+        # The tutor's written parts, oldest first, kept alongside the entries
+        index_key = f"{prefix}#parts"
+        parts = [p for p in backend.get(index_key, []) if p not in written] + written
+        evicted = [p for p in parts if self._timeout(p) == 0]   # past weeks
+        parts = [p for p in parts if p not in evicted]
+        if self.max_parts is not None and len(parts) > self.max_parts:
+            evicted += parts[:-self.max_parts]
+            parts = parts[-self.max_parts:]
+        if evicted:
+            backend.delete_many([self._part_key(prefix, p) for p in evicted])
+            self._count("evictions", len(evicted))
+        backend.set(index_key, parts, self.ttl)
+
+    def get(self, tutor_id, part=""):
+        value = calendar_cache().get(self.key(tutor_id, part))
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, tutor_id, value, part=""):
+        self._store(self._prefix(tutor_id), {part: value})
+
+    def get_or_build(self, tutor_id, build, part=""):
+        prefix = self._prefix(tutor_id)
+        value = calendar_cache().get(self._part_key(prefix, part))
+        if value is not None:
+            self._count("hits")
+            return value
+        self._count("misses")
+        value = build()
+        self._store(prefix, {part: value})
+        return value
+
+    def get_parts(self, tutor_id, parts):
+        """{part: value} for those of `parts` that are cached."""
+        prefix = self._prefix(tutor_id)
+        keys = {self._part_key(prefix, part): part for part in parts}
+        found = calendar_cache().get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_parts(self, tutor_id, values):
+        self._store(self._prefix(tutor_id), values)
+
+    def delete(self, tutor_id, part=""):
+        calendar_cache().delete(self.key(tutor_id, part))
+
+    def invalidate(self, tutor_id):
+        """Drop all of this tutor's entries in this namespace."""
+        _bump(_version_key(self.namespace, tutor_id))
+
+    @contextmanager
+    def locked(self, tutor_id):
+        """Hold this tutor's update lock for the namespace, in all workers.
+
+        Yields True once held, or False if it could not be had within
+        LOCK_WAIT; changing a cached entry without the lock could overwrite
+        another worker's change, so invalidate() instead.
+        """
+        backend = calendar_cache()
+        key = f"calendar:lock:{self.namespace}:{tutor_id}"
+        token = _uuid4().hex
+        deadline = _monotonic() + LOCK_WAIT
+        while not backend.add(key, token, LOCK_TIMEOUT):
+            if _monotonic() >= deadline:
+                yield False
+                return
+            _sleep(0.01)
+        try:
+            yield True
+        finally:
+            if backend.get(key) == token:
+                backend.delete(key)
+
+
+def calendar_cache_stats():
+    """Per-namespace hit/miss/eviction counts of this process's cache lookups."""
+    return {c.namespace: c.stats() for c in _REGISTRY}
 
 
 # ----------- STUDENTS ------------------
 
-STUDENTS_CACHE = {}
+STUDENTS_CACHE = TutorCache("students")
 
 def build_student_summary(student):
     profile = student.get_student_profile()
@@ -23,11 +236,7 @@ def build_student_summary(student):
 
 
 def get_cached_students_for_tutor(tutor):
-    global STUDENTS_CACHE
-    tutor_id = tutor.id
-
-    # Build fresh if missing
-    if tutor_id not in STUDENTS_CACHE:
+    def build():
         links = TutorStudent.objects.filter(tutor=tutor).select_related(
             "student__student_profile"
         )
@@ -37,184 +246,327 @@ def get_cached_students_for_tutor(tutor):
             student = link.student
             summary = student.to_dict()
             data.append(summary)
+        return data
 
-        STUDENTS_CACHE[tutor_id] = data
-
-    return STUDENTS_CACHE[tutor_id]
+    return STUDENTS_CACHE.get_or_build(tutor.id, build)
 
 def update_student_cache(student):
-    global STUDENTS_CACHE
-
     # Find all tutors linked to this student
     profile = student.get_student_profile()
     tutor = student.get_tutor()
     updated_summary = profile.to_dict()
 
-    if tutor.id not in STUDENTS_CACHE: STUDENTS_CACHE[tutor.id] = []
+    with STUDENTS_CACHE.locked(tutor.id) as held:
+        if not held:
+            STUDENTS_CACHE.invalidate(tutor.id)
+            return
+
+        # Nothing cached yet: the next read builds the full list
+        students = STUDENTS_CACHE.get(tutor.id)
+        if students is None:
+            return
 
-    students = STUDENTS_CACHE[tutor.id]
+        # Try to find existing entry
+        found = False
+        for i, entry in enumerate(students):
+            if entry["user_id"] == student.id:
+                students[i] = updated_summary
+                found = True
+                break
 
-    # Try to find existing entry
-    found = False
-    for i, entry in enumerate(students):
-        if entry["user_id"] == student.id:
-            students[i] = updated_summary
-            found = True
-            break
+        # If not found, add it
+        if not found:
+            students.append(updated_summary)
 
-    # If not found, add it
-    if not found:
-        students.append(updated_summary)
+        STUDENTS_CACHE.set(tutor.id, students)
 
 
 def invalidate_students_cache_for_tutor(tutor_id):
-    global STUDENTS_CACHE
     print("Invalidating student cache for tutor:", tutor_id)
-    # STUDENTS_CACHE = {}
-    if tutor_id in STUDENTS_CACHE:
-        del STUDENTS_CACHE[tutor_id]
+    STUDENTS_CACHE.invalidate(tutor_id)
 
 
 # ------------AD HOC SLOTS -------------
 
-ADHOC_SLOTS_CACHE = {}
-ADHOC_BOOKINGS_CACHE = {}
+# Part: week start. Tutors page through a few weeks and students always see
+# the week from tomorrow, so only recent windows are kept; each one expires
+# once its last day is over.
+ADHOC_MAX_WEEKS = 12
+
+ADHOC_SLOTS_CACHE = TutorCache("adhoc_slots", max_parts=ADHOC_MAX_WEEKS, expires=week_end)
+ADHOC_BOOKINGS_CACHE = TutorCache("adhoc_bookings", max_parts=ADHOC_MAX_WEEKS, expires=week_end)
 
 from datetime import date, timedelta
 
 def get_availability_adhoc(tutor, week_start):
-    tutor_id = tutor.id
-    key = (tutor_id, week_start)
-    start_date = date.fromisoformat(week_start)
-
-    if key not in ADHOC_SLOTS_CACHE:
+    def build():
+        start_date = date.fromisoformat(week_start)
         dates = [start_date + timedelta(days=i) for i in range(7)]
         weekly_slots = get_weekly_slots(tutor)
-        slots = tutor.booking_slots_adhoc(weekly_slots, dates)
-        ADHOC_SLOTS_CACHE[key] = slots
+        return tutor.booking_slots_adhoc(weekly_slots, dates)
 
-    return ADHOC_SLOTS_CACHE[key]
+    return ADHOC_SLOTS_CACHE.get_or_build(tutor.id, build, week_start)
 
 def get_adhoc_bookings(tutor, week_start):
-    tutor_id = tutor.id
-    key = (tutor_id, week_start)
-
-    if key not in ADHOC_BOOKINGS_CACHE:
+    def build():
         start_date = date.fromisoformat(week_start)
         dates = [start_date + timedelta(days=i) for i in range(7)]
-        bookings = tutor.booking_list_adhoc(dates)
-        ADHOC_BOOKINGS_CACHE[key] = bookings
+        return tutor.booking_list_adhoc(dates)
 
-    return ADHOC_BOOKINGS_CACHE[key]
+    return get_or_build_indexed(ADHOC_BOOKINGS_CACHE, tutor.id, week_start, build)
 
 def invalidate_availability_adhoc(tutor_id):
-    global ADHOC_SLOTS_CACHE
-    today = date.today()
-
-    ADHOC_SLOTS_CACHE = {
-        key: value
-        for key, value in ADHOC_SLOTS_CACHE.items()
-        if key[0] != tutor_id and date.fromisoformat(key[1]) >= today
-    }
+    ADHOC_SLOTS_CACHE.invalidate(tutor_id)
 
 def invalidate_adhoc_bookings(tutor_id):
-    global ADHOC_BOOKINGS_CACHE
-    today = date.today()
-
-    ADHOC_BOOKINGS_CACHE = {
-        key: value
-        for key, value in ADHOC_BOOKINGS_CACHE.items()
-        if key[0] != tutor_id and date.fromisoformat(key[1]) >= today
-    }
+    ADHOC_BOOKINGS_CACHE.invalidate(tutor_id)
+    ADHOC_MASKED_CACHE.invalidate(tutor_id)
 
-def mask_availability_adhoc(bookings_by_date, student_id):
-    import copy
-    safe = copy.deepcopy(bookings_by_date)
-
-    for day_str, bookings in safe.items():
-        for b in bookings:
-            b["status"] = "booked_self" if b.get("student_id") == student_id else "booked_other"
-            b.pop("student_name", None)
-            b.pop("student_id", None)
-
-    return safe
-
-def mask_adhoc_bookings(bookings, student_id):
-    import copy
-    safe = copy.deepcopy(bookings)
-
-    for day_str, items in safe.items():
-        for b in items:
-            b["status"] = "booked_self" if b.get("student_id") == student_id else "booked_other"
-            b.pop("student_name", None)
-            b.pop("student_id", None)
-
-    return safe
+def _week_starts_containing(day):
+    """Week starts (ISO dates) of the cached 7-day windows that include `day`."""
+    return [(day - timedelta(days=i)).isoformat() for i in range(7)]
 
 
 # ------------ WEEKLY BOOKING AVAILABILITY -------------
 
-WEEKLY_SLOTS_CACHE = {}
-WEEKLY_BOOKINGS_CACHE = {}
+WEEKLY_SLOTS_CACHE = TutorCache("weekly_slots")
+WEEKLY_BOOKINGS_CACHE = TutorCache("weekly_bookings")
 
 def get_weekly_slots(tutor):
-    tutor_id = tutor.id
-    if tutor_id not in WEEKLY_SLOTS_CACHE:
-        WEEKLY_SLOTS_CACHE[tutor_id] = tutor.booking_slots_weekly()
-    return WEEKLY_SLOTS_CACHE[tutor_id]
+    return WEEKLY_SLOTS_CACHE.get_or_build(tutor.id, tutor.booking_slots_weekly)
 
 def get_weekly_bookings(tutor):
-    tutor_id = tutor.id
-    if tutor_id not in WEEKLY_BOOKINGS_CACHE:
-        WEEKLY_BOOKINGS_CACHE[tutor_id] = tutor.booking_list_weekly()
-    return WEEKLY_BOOKINGS_CACHE[tutor_id]
+    return get_or_build_indexed(WEEKLY_BOOKINGS_CACHE, tutor.id, "", tutor.booking_list_weekly)
 
 def invalidate_weekly_slots(tutor_id):
-    WEEKLY_SLOTS_CACHE.pop(tutor_id, None)
+    WEEKLY_SLOTS_CACHE.invalidate(tutor_id)
 
 def invalidate_weekly_bookings(tutor_id):
-    WEEKLY_BOOKINGS_CACHE.pop(tutor_id, None)
+    WEEKLY_BOOKINGS_CACHE.invalidate(tutor_id)
+    WEEKLY_MASKED_CACHE.invalidate(tutor_id)
+
 
-def mask_weekly_bookings(weekly_bookings, student_id):
-    import copy
-    safe = copy.deepcopy(weekly_bookings)
+# ---------- MASKED BOOKINGS FOR STUDENTS ---------------
+# A student sees their tutor's bookings with names and ids removed and a
+# status of booked_self or booked_other. That depends only on which bookings
+# are the viewer's, so each cached bookings entry is projected once into a
+# masked template plus the owner (student id) of each booking, and a request
+# only swaps in booked_self for the viewer's own bookings. The projections are
+# dropped whenever the bookings they came from change.
 
-    for weekday, bookings in safe.items():
-        for b in bookings:
-            # Mark whether the booking belongs to the student
-            if b.get("student_id") == student_id:
-                b["status"] = "booked_self"
-            else:
-                b["status"] = "booked_other"
+MASKED_FIELDS = ("student_name", "student_id")
 
-            b.pop("student_name", None)
-            b.pop("student_id", None)
+WEEKLY_MASKED_CACHE = TutorCache("weekly_bookings_masked")
+ADHOC_MASKED_CACHE = TutorCache("adhoc_bookings_masked", max_parts=ADHOC_MAX_WEEKS, expires=week_end)
+
+def masked_projection(bookings):
+    """{"template": bookings masked as booked_other, "owners": student id of each, by the same keys}"""
+    template, owners = {}, {}
+    for key, items in bookings.items():
+        masked = []
+        for b in items:
+            m = {k: v for k, v in b.items() if k not in MASKED_FIELDS}
+            m["status"] = "booked_other"
+            masked.append(m)
+        template[key] = masked
+        owners[key] = [b.get("student_id") for b in items]
+    return {"template": template, "owners": owners}
+
+def overlay_masked(projection, student_id):
+    """The masked bookings as `student_id` sees them. Only their own bookings are copied."""
+    result = {}
+    for key, items in projection["template"].items():
+        owners = projection["owners"][key]
+        result[key] = [
+            {**b, "status": "booked_self"} if owner == student_id else b
+            for b, owner in zip(items, owners)
+        ]
+    return result
+
+def mask_bookings(bookings, student_id):
+    return overlay_masked(masked_projection(bookings), student_id)
+
+# Kept for callers holding a bookings dict rather than a tutor
+mask_weekly_bookings = mask_adhoc_bookings = mask_availability_adhoc = mask_bookings
+
+def get_masked_weekly_bookings(tutor, student_id):
+    projection = WEEKLY_MASKED_CACHE.get_or_build(
+        tutor.id, lambda: masked_projection(get_weekly_bookings(tutor))
+    )
+    return overlay_masked(projection, student_id)
+
+def get_masked_adhoc_bookings(tutor, week_start, student_id):
+    projection = ADHOC_MASKED_CACHE.get_or_build(
+        tutor.id, lambda: masked_projection(get_adhoc_bookings(tutor, week_start)), week_start
+    )
+    return overlay_masked(projection, student_id)
+
+
+# ---------- BOOKING INDEX ---------------
+# The weekly and adhoc bookings caches each keep an index (part BOOKING_INDEX)
+# from booking id to every place that booking is cached, as (part, day,
+# position): a weekly booking is in one place, an adhoc one in each cached
+# window that covers its date. Confirm, edit and delete go straight to those
+# positions instead of scanning every day of every cached week.
+#
+# The index is only useful if it lists every cached entry, so:
+#  - it is read and written under the tutor's lock (TutorCache.locked);
+#  - it is created empty only when the namespace is invalidated, never on a
+#    miss, because a missing index may have been evicted while entries it
+#    described are still cached. Entries built while there is no index are
+#    left out of it, and the next change then invalidates the namespace;
+#  - every change bumps a per-tutor counter first, and an entry is only
+#    cached (and indexed) if the counter did not move while it was built;
+#  - a location that points at a cached entry but not at the booking means
+#    the index is out of step with the entries, and also invalidates.
+
+BOOKING_INDEX = "#index"
+
+def _reset_index(cache, tutor_id):
+    """Drop the tutor's entries and start an empty index (call holding the lock)."""
+    cache.invalidate(tutor_id)
+    cache.set_parts(tutor_id, {BOOKING_INDEX: {}})
+
+def _changes_key(cache, tutor_id):
+    return f"calendar:changes:{cache.namespace}:{tutor_id}"
+
+def get_or_build_indexed(cache, tutor_id, part, build):
+    """Cached bookings entry `part`, or build() it and cache it along with its index entries.
+
+    A booking change applied while build() runs may be missing from what it
+    read, so the built entry is then returned without being cached.
+    """
+    backend = calendar_cache()
+    # The prefix is fixed before building: if the namespace is invalidated
+    # meanwhile, the entry and its index entries go where no one looks
+    prefix = cache._prefix(tutor_id)
+    value = backend.get(cache._part_key(prefix, part))
+    if value is not None:
+        cache._count("hits")
+        return value
+    cache._count("misses")
+    changes = backend.get(_changes_key(cache, tutor_id))
+    bookings = build()
+    with cache.locked(tutor_id) as held:
+        if not held or backend.get(_changes_key(cache, tutor_id)) != changes:
+            return bookings
+        values = {part: bookings}
+        index = backend.get(cache._part_key(prefix, BOOKING_INDEX))
+        if index is not None:
+            # Locations in an earlier copy of this entry are stale now
+            for booking_id in list(index):
+                index[booking_id] = [loc for loc in index[booking_id] if loc[0] != part]
+                if not index[booking_id]:
+                    del index[booking_id]
+            for day, items in bookings.items():
+                for pos, b in enumerate(items):
+                    index.setdefault(b["id"], []).append((part, day, pos))
+            values[BOOKING_INDEX] = index
+        cache._store(prefix, values)
+    return bookings
+
+def _locations(entries, index, booking_id):
+    """The booking's indexed locations in `entries`, or None if one does not hold it."""
+    found = []
+    for part, day, pos in index.get(booking_id, []):
+        if part not in entries:
+            continue   # that entry has expired or been evicted
+        items = entries[part].get(day)
+        if not items or pos >= len(items) or items[pos].get("id") != booking_id:
+            return None
+        found.append((part, day, pos))
+    return found
+
+def _remove_booking(entries, index, booking_id, locations):
+    """Take a booking out of `entries` ({part: bookings}) at its `locations`."""
+    for part, day, pos in locations:
+        items = entries[part][day]
+        # Fill the gap with the day's last booking, so nothing else shifts
+        last = items.pop()
+        if pos < len(items):
+            items[pos] = last
+            index[last["id"]] = [
+                (part, day, pos) if loc == (part, day, len(items)) else loc
+                for loc in index.get(last["id"], [])
+            ]
+    index.pop(booking_id, None)
+
+def _insert_booking(entries, index, data, day):
+    for part, bookings in entries.items():
+        items = bookings.setdefault(day, [])
+        index.setdefault(data["id"], []).append((part, day, len(items)))
+        items.append(data)
+
+def apply_booking_change(cache, tutor_id, booking_id, data=None, day=None, parts=()):
+    """Update one booking in `cache`'s cached entries through the index.
+
+    The booking is removed from wherever it is cached and, unless `data` is
+    None (deleted), added as `data` under `day` to each of `parts` that is
+    cached. Returns False (after invalidating the namespace) if the entries
+    could not be updated safely.
+    """
+    # Before anything else, so an entry being built from older data is not cached
+    _bump(_changes_key(cache, tutor_id))
+    with cache.locked(tutor_id) as held:
+        if not held:
+            cache.invalidate(tutor_id)
+            return False
+        index = cache.get_parts(tutor_id, [BOOKING_INDEX]).get(BOOKING_INDEX)
+        if index is None:
+            _reset_index(cache, tutor_id)
+            return False
+
+        old_parts = {loc[0] for loc in index.get(booking_id, [])}
+        entries = cache.get_parts(tutor_id, list(old_parts | set(parts)))
+        locations = _locations(entries, index, booking_id)
+        if locations is None:
+            _reset_index(cache, tutor_id)
+            return False
+        _remove_booking(entries, index, booking_id, locations)
+        if data is not None:
+            _insert_booking({part: entries[part] for part in parts if part in entries}, index, data, day)
+
+        entries[BOOKING_INDEX] = index
+        cache.set_parts(tutor_id, entries)
+    return True
+
+def set_booking_field(cache, tutor_id, booking_id, field, value):
+    """Change one field of a cached booking in place."""
+    _bump(_changes_key(cache, tutor_id))
+    with cache.locked(tutor_id) as held:
+        if not held:
+            cache.invalidate(tutor_id)
+            return
+        index = cache.get_parts(tutor_id, [BOOKING_INDEX]).get(BOOKING_INDEX)
+        if index is None:
+            _reset_index(cache, tutor_id)
+            return
+        parts = {loc[0] for loc in index.get(booking_id, [])}
+        if not parts:
+            return
+        entries = cache.get_parts(tutor_id, list(parts))
+        locations = _locations(entries, index, booking_id)
+        if locations is None:
+            _reset_index(cache, tutor_id)
+            return
+        for part, day, pos in locations:
+            entries[part][day][pos][field] = value
+        cache.set_parts(tutor_id, entries)
 
-    return safe
 
 # ---------- COMBINED BOOKINGS ---------------
 
 def update_booking_confirmed_in_cache(tutor_id, booking_id, booking_type, new_value):
     if booking_type in ("weekly", "weekly_paused"):
-        weekly = WEEKLY_BOOKINGS_CACHE.get(tutor_id)
-        if not weekly:
-            return
-        for weekday, bookings in weekly.items():
-            for b in bookings:
-                if b.get("id") == booking_id:
-                    b["confirmed"] = new_value
-                    return
+        set_booking_field(WEEKLY_BOOKINGS_CACHE, tutor_id, booking_id, "confirmed", new_value)
+        # After the bookings change, so a projection rebuilt meanwhile is dropped too
+        WEEKLY_MASKED_CACHE.invalidate(tutor_id)
         return
 
     if booking_type == "adhoc":
-        for (tid, week_start), bookings_by_date in ADHOC_BOOKINGS_CACHE.items():
-            if tid != tutor_id:
-                continue
-            for day_str, bookings in bookings_by_date.items():
-                for b in bookings:
-                    if b.get("id") == booking_id:
-                        b["confirmed"] = new_value
-                        return
+        set_booking_field(ADHOC_BOOKINGS_CACHE, tutor_id, booking_id, "confirmed", new_value)
+        # After the bookings change, so a projection rebuilt meanwhile is dropped too
+        ADHOC_MASKED_CACHE.invalidate(tutor_id)
         return
 
 def update_booking_caches(booking, action):
@@ -223,27 +575,19 @@ def update_booking_caches(booking, action):
 
     is_weekly = isinstance(booking, BookingWeekly)
     is_adhoc = isinstance(booking, BookingAdhoc)
+    data = None if action == "delete" else booking.to_dict()
 
     # ---------------------------------------------------
     # WEEKLY BOOKINGS
     # ---------------------------------------------------
     if is_weekly:
-        weekly = WEEKLY_BOOKINGS_CACHE.get(tutor_id)
-
-        if weekly:
-            # Remove old entry
-            for weekday, items in weekly.items():
-                weekly[weekday] = [b for b in items if b.get("id") != booking.id]
-
-            # Reinsert unless deleted
-            if action != "delete":
-                weekday = booking.weekday
-                weekly.setdefault(weekday, [])
-                weekly[weekday].append(booking.to_dict())
+        weekday = data["weekday"] if data else None
+        apply_booking_change(WEEKLY_BOOKINGS_CACHE, tutor_id, booking.id, data, weekday, [""])
+        WEEKLY_MASKED_CACHE.invalidate(tutor_id)
 
         # Only invalidate slots for time-changing actions
         if action not in ("confirm"):
-            WEEKLY_SLOTS_CACHE.pop(tutor_id, None)
+            WEEKLY_SLOTS_CACHE.invalidate(tutor_id)
 
         return
 
@@ -251,35 +595,22 @@ def update_booking_caches(booking, action):
     # ADHOC BOOKINGS
     # ---------------------------------------------------
     if is_adhoc:
-        # Find all cached weeks for this tutor
-        keys = [(tid, week_start)
-                for (tid, week_start) in ADHOC_BOOKINGS_CACHE.keys()
-                if tid == tutor_id]
-
-        for key in keys:
-            bookings_by_date = ADHOC_BOOKINGS_CACHE[key]
-
-            # Remove old entry
-            for day_str, items in bookings_by_date.items():
-                bookings_by_date[day_str] = [b for b in items if b.get("id") != booking.id]
-
-            # Reinsert unless deleted
-            if action != "delete":
-                day_str = booking.start_datetime.date().isoformat()
-                bookings_by_date.setdefault(day_str, [])
-                bookings_by_date[day_str].append(booking.to_dict())
+        # The cached windows that cover the booking's (new) local date
+        day_str = data["day_str"] if data else None
+        parts = _week_starts_containing(date.fromisoformat(day_str)) if data else []
+        apply_booking_change(ADHOC_BOOKINGS_CACHE, tutor_id, booking.id, data, day_str, parts)
+        ADHOC_MASKED_CACHE.invalidate(tutor_id)
 
         # Only invalidate slots for time-changing actions
         if action not in ("confirm"):
-            for key in keys:
-                ADHOC_SLOTS_CACHE.pop(key, None)
+            ADHOC_SLOTS_CACHE.invalidate(tutor_id)
 
         return
 
 # ----------SKILLS ---------------
 
 
-MATRIX_CACHE = None
+MATRIX_CACHE = TutorCache("matrix")   # not per tutor: stored under tutor_id "all"
 GRADES = ["K", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
 
 def flatten_skills(skills, children_map, depth=0):
@@ -371,8 +702,15 @@ def build_matrix():
 
 
 def update_matrix_cache_for_count(skill_id):
-    global MATRIX_CACHE
-    if MATRIX_CACHE is None:
+    with MATRIX_CACHE.locked("all") as held:
+        if not held:
+            MATRIX_CACHE.invalidate("all")
+            return
+        _update_matrix_counts(skill_id)
+
+def _update_matrix_counts(skill_id):
+    matrix = MATRIX_CACHE.get("all")
+    if matrix is None:
         return
 
     # --- Recompute all counts for this skill, grouped by grade ---
@@ -401,7 +739,7 @@ def update_matrix_cache_for_count(skill_id):
     }
 
     # --- Update only the affected row in the cache ---
-    for row in MATRIX_CACHE["skills"]:
+    for row in matrix["skills"]:
         if row["id"] == skill_id:
             for g in GRADES:
                 g_str = str(g)
@@ -409,12 +747,13 @@ def update_matrix_cache_for_count(skill_id):
                 row["cells"][g_str]["validated"] = validated_counts.get(g_str, 0)
                 row["cells"][g_str]["unvalidated"] = unvalidated_counts.get(g_str, 0)
             break
+    MATRIX_CACHE.set("all", matrix)
 
 def get_matrix_cache():
-    global MATRIX_CACHE
-    if MATRIX_CACHE is None:
-        MATRIX_CACHE = build_matrix()   # heavy work
-    return MATRIX_CACHE
+    return MATRIX_CACHE.get_or_build("all", build_matrix)   # heavy work on a miss
+
+def invalidate_matrix_cache():
+    MATRIX_CACHE.invalidate("all")
 
 def filter_matrix_by_grade(matrix, grade):
     grade_str = str(grade)
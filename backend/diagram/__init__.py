@@ -1,15 +1,64 @@
-import pkgutil
 import importlib
+import os
+import pkgutil
+import re
+import threading
+from collections.abc import Mapping
 
 # Registry: { "Clock": module, "Rect": module, ... }
-DIAGRAM_REGISTRY = {}
+#
+# Diagram modules are found by scanning the package for a
+# `DIAGRAM_TYPE = "..."` line, and each one is imported the first time its
+# type is looked up, so importing the engine does not load all of them.
+
+_TYPE_LINE = re.compile(r"""^DIAGRAM_TYPE\s*=\s*["'](\w+)["']""", re.M)
+
+
+class LazyRegistry(Mapping):
+    """Diagram type -> module, importing each module on first access."""
+
+    def __init__(self, module_names):
+        self._module_names = module_names   # type -> module name
+        self._modules = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, diagram_type):
+        module = self._modules.get(diagram_type)
+        if module is not None:
+            return module
+        name = self._module_names[diagram_type]
+        with self._lock:
+            module = importlib.import_module(f"{__name__}.{name}")
+            if not (hasattr(module, "parse") and hasattr(module, "render")):
+                raise KeyError(diagram_type)
+            self._modules[diagram_type] = module
+        return module
+
+    def __iter__(self):
+        return iter(self._module_names)
+
+    def __len__(self):
+        return len(self._module_names)
+
+    def loaded(self):
+        """The types whose modules have been imported so far."""
+        return list(self._modules)
+
 
-for module_info in pkgutil.iter_modules(__path__):
-    if module_info.name == "engine":
-        continue  # don't load engine as a diagram type
+def _discover():
+    module_names = {}
+    for module_info in pkgutil.iter_modules(__path__):
+        if module_info.name == "engine":
+            continue  # don't load engine as a diagram type
+        path = os.path.join(__path__[0], f"{module_info.name}.py")
+        try:
+            with open(path, encoding="utf-8") as f:
+                m = _TYPE_LINE.search(f.read())
+        except OSError:
+            continue
+        if m:
+            module_names[m.group(1)] = module_info.name
+    return module_names
 
-    module = importlib.import_module(f"{__name__}.{module_info.name}")
-    # print("loading module:", module_info.name, hasattr(module, "DIAGRAM_TYPE"), hasattr(module, "parse"), hasattr(module, "render"))
 
-    if hasattr(module, "DIAGRAM_TYPE") and hasattr(module, "parse") and hasattr(module, "render"):
-        DIAGRAM_REGISTRY[module.DIAGRAM_TYPE] = module
\ No newline at end of file
+DIAGRAM_REGISTRY = LazyRegistry(_discover())
@@ -1,7 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
-from typing import Optional
+from functools import lru_cache
+from typing import Callable, Optional
+
+from . import dsl
 
 DIAGRAM_TYPE = "AlgebraTable"
 
@@ -27,49 +29,48 @@ class AlgebraTableDiagram:
     label_2: str = ""                      # row 2 label (default: expr)
 
 
+SCHEMA = {
+    "x_min":     (dsl.integer, 1),
+    "x_max":     (dsl.integer, 7),
+    "blank":     (dsl.integer, 0),
+    "blanks":    (dsl.text, ""),
+    "highlight": (dsl.integer, None),
+    "step":      (dsl.integer, 1),
+    "expr":      (dsl.text, "x"),
+    "label_1":   (dsl.text, ""),
+    "label_2":   (dsl.text, ""),
+}
+
+
 def parse(line: str) -> Optional[AlgebraTableDiagram]:
-    def get_int(key, default):
-        m = re.search(rf'\b{key}:\s*(-?\d+)', line)
-        return int(m.group(1)) if m else default
-
-    def get_str(key, default):
-        m = re.search(rf'\b{key}:\s*"([^"]*)"', line)
-        if m:
-            return m.group(1)
-        m = re.search(rf'\b{key}:\s*([^,)\s]+)', line)
-        return m.group(1) if m else default
-
-    x_min = get_int("x_min", 1)
-    x_max = get_int("x_max", 7)
-    blank = get_int("blank", 0)
-    step  = get_int("step", 1)
-    expr    = get_str("expr", "x")
-    label_1 = get_str("label_1", "")
-    label_2 = get_str("label_2", "")
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
+        return None
 
     # Parse blanks: "3,4,5"
-    blanks = []
-    m = re.search(r'\bblanks:\s*"([^"]*)"', line)
-    if m:
-        blanks = [int(v.strip()) for v in m.group(1).split(',') if v.strip().lstrip('-').isdigit()]
+    blanks = [int(v.strip()) for v in args["blanks"].split(',') if v.strip().lstrip('-').isdigit()]
 
-    highlight = get_int("highlight", blanks[0] if blanks else 0)
+    highlight = args["highlight"]
+    if highlight is None:
+        highlight = blanks[0] if blanks else 0
 
-    x_vals = list(range(x_min, x_max + 1, max(step, 1)))
+    x_vals = list(range(args["x_min"], args["x_max"] + 1, max(args["step"], 1)))
     if len(x_vals) < 2 or len(x_vals) > 12:
         return None
 
     return AlgebraTableDiagram(
-        x_min=x_min, x_max=x_max, expr=expr,
-        blank=blank, blanks=blanks, highlight=highlight,
-        step=step, label_1=label_1, label_2=label_2,
+        x_min=args["x_min"], x_max=args["x_max"], expr=args["expr"],
+        blank=args["blank"], blanks=blanks, highlight=highlight,
+        step=args["step"], label_1=args["label_1"], label_2=args["label_2"],
     )
 
 
-def _eval_expr(expr_str: str, x_val: int):
-    """Evaluate expr_str at x=x_val using sympy. Returns numeric value or None."""
+@lru_cache(maxsize=256)
+def compile_expr(expr_str: str) -> Optional[Callable]:
+    """Parse expr_str (implicit multiplication allowed, e.g. "2x+1") once and
+    return a plain Python function of x, or None if it cannot be parsed."""
     try:
-        from sympy import Symbol
+        from sympy import Symbol, lambdify
         from sympy.parsing.sympy_parser import (
             parse_expr, standard_transformations,
             implicit_multiplication_application,
@@ -77,12 +78,31 @@ def _eval_expr(expr_str: str, x_val: int):
         x = Symbol("x")
         transformations = standard_transformations + (implicit_multiplication_application,)
         result = parse_expr(expr_str, local_dict={"x": x}, transformations=transformations)
-        f = float(result.subs(x, x_val))
-        return int(f) if f == int(f) else round(f, 4)
+        return lambdify(x, result, "math")
+    except Exception:
+        return None
+
+
+def _eval_expr(expr_str: str, x_val: int):
+    """Evaluate expr_str at x=x_val. Returns numeric value or None."""
+    f = compile_expr(expr_str)
+    if f is None:
+        return None
+    try:
+        # Rounded before the integer check, so float noise such as
+        # 3.0000000000000004 shows as 3, as the exact sympy value did
+        val = round(float(f(x_val)), 4)
+        return int(val) if val == int(val) else val
     except Exception:
         return None
 
 
+@lru_cache(maxsize=256)
+def table_values(expr_str: str, x_vals: tuple) -> dict:
+    """{x: value} for every x in the table, evaluated in one pass."""
+    return {x_val: _eval_expr(expr_str, x_val) for x_val in x_vals}
+
+
 def _fmt(val) -> str:
     if val is None:
         return "?"
@@ -101,6 +121,7 @@ def viewbox(d: AlgebraTableDiagram) -> tuple:
 
 def render(d: AlgebraTableDiagram) -> str:
     x_vals = list(range(d.x_min, d.x_max + 1, max(d.step, 1)))
+    values = table_values(d.expr, tuple(x_vals))
     n_data_cols = len(x_vals)
     n_cols = n_data_cols + 1      # label column + data columns
 
@@ -180,7 +201,7 @@ def render(d: AlgebraTableDiagram) -> str:
                     text = ""
                     fs = font_size
                 else:
-                    text = _fmt(_eval_expr(d.expr, x_val))
+                    text = _fmt(values[x_val])
                     fs = font_size
 
             if text:
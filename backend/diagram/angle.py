@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
 from typing import List, Optional
 
+from . import dsl
+
 DIAGRAM_TYPE = "Angle"
 
 # Syntax: Angle(deg: 65)
@@ -17,24 +18,24 @@ class AngleDiagram:
     display_label: bool = True
 
 
-def parse(line: str) -> Optional[AngleDiagram]:
-    deg_match   = re.search(r'\bdeg:\s*([\d.]+)', line)
-    pos_match   = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
-    size_match  = re.search(r'\bsize:\s*([\d.]+)', line)
-    label_match = re.search(r'\bdisplay_label:\s*(true|false)', line)
+SCHEMA = {
+    "deg":           (dsl.number, dsl.REQUIRED),
+    "pos":           (dsl.point, (0.0, 0.0)),
+    "size":          (dsl.number, 12.0),
+    "display_label": (dsl.flag, True),
+}
+
 
-    if not deg_match:
+def parse(line: str) -> Optional[AngleDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
-    deg = float(deg_match.group(1))
+    deg = args["deg"]
     if deg <= 0 or deg >= 360:
         return None
 
-    pos           = [float(pos_match.group(1)), float(pos_match.group(2))] if pos_match else [0.0, 0.0]
-    size          = float(size_match.group(1)) if size_match else 12.0
-    display_label = (label_match.group(1) == "true") if label_match else True
-
-    return AngleDiagram(deg=deg, pos=pos, size=size, display_label=display_label)
+    return AngleDiagram(deg=deg, pos=list(args["pos"]), size=args["size"], display_label=args["display_label"])
 
 
 def render(d: AngleDiagram) -> str:
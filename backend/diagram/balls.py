@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass
 from typing import Tuple, Optional
 
+from . import dsl
+
 DIAGRAM_TYPE = "Balls"
 
 # Syntax: Balls(red: 3, blue: 5, green: 2, yellow: 1, white: 2, pos: (0, 0), scale: 1)
@@ -24,30 +25,26 @@ class BallsDiagram:
     scale: float = 1.0
 
 
-def parse(line: str) -> Optional[BallsDiagram]:
-    def get_int(key):
-        m = re.search(rf'\b{key}:\s*(\d+)', line)
-        return int(m.group(1)) if m else 0
-
-    pos_match = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
+SCHEMA = {
+    "red":    (dsl.integer, 0),
+    "blue":   (dsl.integer, 0),
+    "green":  (dsl.integer, 0),
+    "yellow": (dsl.integer, 0),
+    "white":  (dsl.integer, 0),
+    "pos":    (dsl.point, (0.0, 0.0)),
+    "scale":  (dsl.number, 1.0),
+}
 
-    red    = get_int("red")
-    blue   = get_int("blue")
-    green  = get_int("green")
-    yellow = get_int("yellow")
-    white  = get_int("white")
 
-    if red + blue + green + yellow + white == 0:
+def parse(line: str) -> Optional[BallsDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
-    pos = (float(pos_match.group(1)), float(pos_match.group(2))) if pos_match else (0.0, 0.0)
-
-    def get_scale():
-        m = re.search(r'\bscale:\s*([\d.]+)', line)
-        return float(m.group(1)) if m else 1.0
+    if args["red"] + args["blue"] + args["green"] + args["yellow"] + args["white"] == 0:
+        return None
 
-    return BallsDiagram(red=red, blue=blue, green=green, yellow=yellow, white=white,
-                        pos=pos, scale=get_scale())
+    return BallsDiagram(**args)
 
 
 _COLOURS = {
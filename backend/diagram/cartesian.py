@@ -1,7 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
-from typing import List, Optional
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+from . import dsl
 
 DIAGRAM_TYPE = "Cartesian"
 
@@ -22,40 +24,34 @@ class CartesianDiagram:
     x_tick_labels: List[str] = field(default_factory=list)
 
 
+SCHEMA = {
+    "xmin":          (dsl.number, dsl.REQUIRED),
+    "xmax":          (dsl.number, dsl.REQUIRED),
+    "ymin":          (dsl.number, dsl.REQUIRED),
+    "ymax":          (dsl.number, dsl.REQUIRED),
+    "eq":            (dsl.text, dsl.REQUIRED),
+    "pos":           (dsl.point, (0.0, 0.0)),
+    "w":             (dsl.number, None),
+    "h":             (dsl.number, None),
+    "square":        (dsl.flag, False),
+    "x_label":       (dsl.text, ""),
+    "y_label":       (dsl.text, ""),
+    "x_tick_labels": (dsl.text, ""),
+}
+
+
 def parse(line: str) -> Optional[CartesianDiagram]:
-    def get_num(key):
-        m = re.search(rf'\b{key}:\s*(-?[\d.]+)', line)
-        return float(m.group(1)) if m else None
-
-    def get_str(key):
-        m = re.search(rf'\b{key}:\s*"([^"]*)"', line)
-        return m.group(1) if m else ""
-
-    eq_match     = re.search(r'\beq:\s*"([^"]+)"', line)
-    pos_match    = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
-    square_match = re.search(r'\bsquare:\s*(true|false)', line)
-    w_val = get_num("w")
-    h_val = get_num("h")
-
-    xmin = get_num("xmin")
-    xmax = get_num("xmax")
-    ymin = get_num("ymin")
-    ymax = get_num("ymax")
-    eq = eq_match.group(1) if eq_match else None
-
-    if None in (xmin, xmax, ymin, ymax) or not eq:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or not args["eq"]:
         return None
 
-    pos    = [float(pos_match.group(1)), float(pos_match.group(2))] if pos_match else [0.0, 0.0]
-    square = (square_match.group(1) == "true") if square_match else False
-
-    xtl_raw = get_str("x_tick_labels")
+    xtl_raw = args["x_tick_labels"]
     x_tick_labels = [s.strip() for s in xtl_raw.split(",")] if xtl_raw else []
 
     return CartesianDiagram(
-        xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, eq=eq,
-        pos=pos, w=w_val or 44.0, h=h_val or 26.0, square=square,
-        x_label=get_str("x_label"), y_label=get_str("y_label"),
+        xmin=args["xmin"], xmax=args["xmax"], ymin=args["ymin"], ymax=args["ymax"], eq=args["eq"],
+        pos=list(args["pos"]), w=args["w"] or 44.0, h=args["h"] or 26.0, square=args["square"],
+        x_label=args["x_label"], y_label=args["y_label"],
         x_tick_labels=x_tick_labels,
     )
 
@@ -100,6 +96,125 @@ def _fmt_tick(n: float) -> str:
     return str(float(f"{n:.4g}"))
 
 
+# ----------- CURVE PLOTTING ------------------
+
+# Names available to equations: the math module plus abs. Built once.
+_EQ_NAMESPACE = {k: getattr(math, k) for k in dir(math) if not k.startswith("_")}
+_EQ_NAMESPACE["abs"] = abs
+_EQ_NAMESPACE["__builtins__"] = {}
+
+CURVE_INTERVALS = 32    # initial evenly spaced intervals across the x range
+CURVE_MAX_DEPTH = 6     # each interval is split at most this many times (32 * 2^6 = 2048)
+CURVE_TOLERANCE = 0.02  # SVG units a curve may stray from its straight-line segments
+
+
+@lru_cache(maxsize=256)
+def compile_equation(eq: str) -> Optional[Callable[[float], float]]:
+    """y = f(x) for an equation such as "x^2 - 3", compiled once per equation text.
+
+    Returns None if the equation does not compile.
+    """
+    try:
+        code = compile(f"lambda x: ({eq.replace('^', '**')})", "<eq>", "eval")
+        return eval(code, _EQ_NAMESPACE)  # noqa: S307
+    except Exception:
+        return None
+
+
+def sample_curve(f, xmin, xmax, to_svg_x, to_svg_y, height) -> List[List[tuple]]:
+    """Sample y = f(x) adaptively and return continuous runs of SVG points.
+
+    Each of CURVE_INTERVALS intervals is halved while its midpoint is further
+    than CURVE_TOLERANCE from the chord, so straight lines get few points and
+    bends, domain edges and asymptotes get many. Runs are broken where f is
+    undefined or not finite, and at jumps taller than the plot that the
+    midpoint does not bridge (e.g. tan(x) at pi/2).
+    """
+    def point(x):
+        try:
+            y = float(f(x))
+        except Exception:
+            return None
+        if not math.isfinite(y):
+            return None
+        return (to_svg_x(x), to_svg_y(y))
+
+    segments = []
+    current = []
+
+    def end_run():
+        if len(current) > 1:
+            segments.append(simplify(current))
+        current.clear()
+
+    def refine(xa, pa, xb, pb, depth):
+        # Emits the points after pa, up to and including pb
+        xm = (xa + xb) / 2
+        pm = point(xm)
+        if depth < CURVE_MAX_DEPTH and (pa or pb or pm):
+            if pa is None or pb is None or pm is None or abs(pm[1] - (pa[1] + pb[1]) / 2) > CURVE_TOLERANCE:
+                refine(xa, pa, xm, pm, depth + 1)
+                refine(xm, pm, xb, pb, depth + 1)
+                return
+        if pb is None:
+            end_run()
+            return
+        if pa is not None and abs(pb[1] - pa[1]) > height:
+            lo, hi = sorted((pa[1], pb[1]))
+            if pm is None or not lo <= pm[1] <= hi:
+                end_run()
+        current.append(pb)
+
+    step = (xmax - xmin) / CURVE_INTERVALS
+    xa = xmin
+    pa = point(xa)
+    if pa is not None:
+        current.append(pa)
+    for i in range(1, CURVE_INTERVALS + 1):
+        xb = xmin + step * i
+        pb = point(xb)
+        refine(xa, pa, xb, pb, 0)
+        xa, pa = xb, pb
+    end_run()
+    return segments
+
+
+def simplify(points: List[tuple], tol: float = CURVE_TOLERANCE) -> List[tuple]:
+    """Drop points that lie within `tol` of the line through their neighbours
+    (Ramer-Douglas-Peucker), so straight stretches become a single segment."""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy) or 1.0
+        worst, index = tol, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            dist = abs(dy * (x - x1) - dx * (y - y1)) / norm
+            if dist > worst:
+                worst, index = dist, i
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def path_data(points: List[tuple]) -> str:
+    """SVG path data for a polyline: one M, then implicit line-to pairs."""
+    coords = []
+    for x, y in points:
+        pair = f"{x:.2f},{y:.2f}"
+        if not coords or coords[-1] != pair:
+            coords.append(pair)
+    return "M" + " ".join(coords)
+
+
 def render(d: CartesianDiagram) -> str:
     # In square mode derive x range from y scale so 1 unit is equal length on both axes
     if d.square:
@@ -240,48 +355,13 @@ def render(d: CartesianDiagram) -> str:
     if not d.x_tick_labels and xmin < 0 < xmax and d.ymin < 0 < d.ymax:
         out.append(f'<text x="{axis_x - 0.4:.3f}" y="{axis_y + label_offset:.3f}" text-anchor="end" font-size="{font_size}" font-family="sans-serif" fill="#333">0</text>')
 
-    # Plot equation
-    try:
-        eq_norm = d.eq.replace("^", "**")
-        safe_ns = {k: getattr(math, k) for k in dir(math) if not k.startswith("_")}
-        safe_ns["abs"] = abs
-
-        STEPS = 400
-        segments = []
-        current = []
-
-        for i in range(STEPS + 1):
-            x = xmin + (xmax - xmin) * (i / STEPS)
-            try:
-                safe_ns["x"] = x
-                y_val = eval(eq_norm, {"__builtins__": {}}, safe_ns)  # noqa: S307
-                y_val = float(y_val)
-            except Exception:
-                if len(current) > 1:
-                    segments.append(current)
-                current = []
-                continue
-
-            if not math.isfinite(y_val):
-                if len(current) > 1:
-                    segments.append(current)
-                current = []
-                continue
-
-            sx = to_svg_x(x)
-            sy = to_svg_y(y_val)
-            cmd = f"M{sx:.3f},{sy:.3f}" if not current else f"L{sx:.3f},{sy:.3f}"
-            current.append(cmd)
-
-        if len(current) > 1:
-            segments.append(current)
-
-        for seg in segments:
+    # Plot equation (an invalid equation omits the curve silently)
+    f = compile_equation(d.eq)
+    if f is not None:
+        for seg in sample_curve(f, xmin, xmax, to_svg_x, to_svg_y, d.h):
             out.append(
-                f'<path d="{" ".join(seg)}" fill="none" stroke="#2563eb" '
+                f'<path d="{path_data(seg)}" fill="none" stroke="#2563eb" '
                 f'stroke-width="{sw * 2.5}" stroke-linejoin="round" clip-path="url(#{clip_id})"/>'
             )
-    except Exception:
-        pass  # Invalid equation — omit curve silently
 
     return "\n".join(out)
@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass
 from typing import Optional
 
+from . import dsl
+
 DIAGRAM_TYPE = "Circle"
 
 # Syntax: Circle(radius: 5, label_r: true, label_d: false)
@@ -22,22 +23,18 @@ class CircleDiagram:
     label_d: bool = False
 
 
-def parse(line: str) -> Optional[CircleDiagram]:
-    if not line.strip().startswith("Circle"):
-        return None
-
-    radius_match = re.search(r'\bradius:\s*([\d.]+)', line)
-    if not radius_match:
-        return None
-    radius = float(radius_match.group(1))
-
-    label_r_match = re.search(r'\blabel_r:\s*(true|false)', line)
-    label_r = (label_r_match.group(1) != 'false') if label_r_match else True
+SCHEMA = {
+    "radius":  (dsl.number, dsl.REQUIRED),
+    "label_r": (dsl.flag, True),
+    "label_d": (dsl.flag, False),
+}
 
-    label_d_match = re.search(r'\blabel_d:\s*(true|false)', line)
-    label_d = (label_d_match.group(1) != 'false') if label_d_match else False
 
-    return CircleDiagram(radius=radius, label_r=label_r, label_d=label_d)
+def parse(line: str) -> Optional[CircleDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
+        return None
+    return CircleDiagram(**args)
 
 
 def _fmt(n: float) -> str:
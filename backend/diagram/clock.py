@@ -3,6 +3,8 @@ import re
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
+from . import dsl
+
 DIAGRAM_TYPE = "Clock"
 
 # Clock(time: 10:00, pos: (0, 0))
@@ -14,20 +16,20 @@ class ClockDiagram:
     pos: Tuple[int, int]
 
 
-CLOCK_REGEX = re.compile(
-    r"Clock\s*\(\s*time:\s*([0-9]{1,2}:[0-9]{2})\s*,\s*pos:\s*\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)\s*\)"
-)
+SCHEMA = {
+    "time": (dsl.text, dsl.REQUIRED),
+    "pos":  (dsl.int_point, dsl.REQUIRED),
+}
+
+TIME = re.compile(r"[0-9]{1,2}:[0-9]{2}")
+
 
 def parse(line: str) -> Optional[ClockDiagram]:
-    match = CLOCK_REGEX.match(line)
-    if not match:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or not TIME.fullmatch(args["time"]):
         return None
 
-    time_str = match.group(1)
-    x = int(match.group(2))
-    y = int(match.group(3))
-
-    return ClockDiagram(type="Clock", time=time_str, pos=(x, y))
+    return ClockDiagram(type="Clock", time=args["time"], pos=args["pos"])
 
 
 def render(clock: ClockDiagram) -> str:
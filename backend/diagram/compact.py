@@ -0,0 +1,289 @@
+import hashlib
+import math
+import re
+
+# Compact SVG output: quantised coordinates, repeated presentation attributes
+# lifted into CSS classes or shared by runs of elements through a <g>, one
+# merged <defs>, and no whitespace between tags. Works on the SVG text the
+# diagram modules produce; the content of text elements is kept as written.
+
+# Attributes whose numbers are rounded to the viewBox precision
+GEOMETRY_ATTRS = {
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry",
+    "width", "height", "points", "d", "transform", "stroke-width", "font-size",
+}
+
+# Presentation attributes that may move into a shared CSS class
+STYLE_ATTRS = {
+    "fill", "stroke", "stroke-width", "stroke-linecap", "stroke-linejoin", "stroke-dasharray",
+    "opacity", "fill-opacity", "stroke-opacity", "font-size", "font-family", "font-weight",
+    "font-style", "text-anchor", "dominant-baseline", "clip-path",
+}
+
+# Inherited presentation attributes: on a <g> they apply to its children
+INHERITED_ATTRS = {
+    "fill", "stroke", "stroke-width", "stroke-linecap", "stroke-linejoin", "stroke-dasharray",
+    "fill-opacity", "stroke-opacity", "font-size", "font-family", "font-weight", "font-style",
+    "text-anchor",
+}
+
+# Coordinates that default to 0 on these elements, so x="0" etc. can go
+ZERO_DEFAULTS = {"x", "y", "cx", "cy", "x1", "y1", "x2", "y2"}
+ZERO_DEFAULT_TAGS = {"rect", "circle", "ellipse", "line", "text", "image", "use"}
+
+# Elements whose content is text (whitespace in them is significant)
+TEXT_TAGS = {"text", "tspan", "textPath", "title", "desc"}
+
+TAG = re.compile(r"<(\w+)((?:\s*[\w:-]+=\"[^\"]*\")*)\s*(/?)>")
+CLOSE_TAG = re.compile(r"</(\w+)>")
+ATTR = re.compile(r"([\w:-]+)=\"([^\"]*)\"")
+DECIMAL = re.compile(r"-?\d+\.\d+")
+PATH_SPACE = re.compile(r" (?=-)")   # path data needs no space before a minus sign
+DEFS = re.compile(r"<defs>(.*?)</defs>", re.S)
+DEF_ITEM = re.compile(r"<(\w+)\b[^>]*?(?:/>|>.*?</\1>)", re.S)
+
+
+def precision(vb_width: float, px_width: float = 500) -> int:
+    """Decimals needed for about 0.1px resolution when vb_width units span px_width pixels."""
+    if vb_width <= 0:
+        return 3
+    return max(0, min(4, math.ceil(-math.log10(vb_width / (10 * px_width)))))
+
+
+def _round(value: str, decimals: int) -> str:
+    def fmt(m):
+        text = f"{float(m.group(0)):.{decimals}f}"
+        if "." in text:
+            text = text.rstrip("0").rstrip(".")
+        if text == "-0":
+            return "0"
+        # 0.25 -> .25, -0.5 -> -.5
+        return text.replace("0.", ".", 1) if text.lstrip("-").startswith("0.") else text
+    return DECIMAL.sub(fmt, value)
+
+
+def _class_name(style) -> str:
+    # Named by content, so the same style gets the same class in every SVG
+    # (inline <style> rules are page-global and must not conflict).
+    digest = int(hashlib.sha1(repr(style).encode("utf-8")).hexdigest()[:8], 16)
+    name = ""
+    for _ in range(5):
+        digest, digit = divmod(digest, 36)
+        name += "0123456789abcdefghijklmnopqrstuvwxyz"[digit]
+    return f"d{name}"
+
+
+def compact_body(body: str, decimals: int) -> tuple:
+    """Compact the inner markup of one SVG. Returns (css, defs, body)."""
+    # One <defs>, with duplicate entries (e.g. repeated clip paths) dropped
+    defs_items = []
+    for block in DEFS.findall(body):
+        for m in DEF_ITEM.finditer(block):
+            item = TAG.sub(lambda t: _write_tag(t.group(1), _attrs(t, decimals), t.group(3)), m.group(0))
+            if item not in defs_items:
+                defs_items.append(item)
+    body = DEFS.sub("", body)
+
+    # Elements as (tag, attrs, "/" if self-closing), with closing tags and
+    # text between them as str
+    items = []
+    pos = 0
+    depth = 0   # open text elements
+    for m in TAG.finditer(body):
+        depth = _add_between(items, body[pos:m.start()], depth)
+        pos = m.end()
+        items.append((m.group(1), _attrs(m, decimals), m.group(3)))
+        if m.group(1) in TEXT_TAGS and not m.group(3):
+            depth += 1
+    _add_between(items, body[pos:], depth)
+    items = _merge_lines(items)
+
+    counts = {}
+    for item in items:
+        if not isinstance(item, str):
+            style = _style(item[1])
+            if style:
+                counts[style] = counts.get(style, 0) + 1
+
+    # Lift a style into a class only where that makes the output smaller
+    rules = {}
+    for style, count in counts.items():
+        name = _class_name(style)
+        rule = f".{name}{{{';'.join(f'{k}:{v}' for k, v in style)}}}"
+        inline = sum(len(f' {k}="{v}"') for k, v in style)
+        if count * inline > len(rule) + count * len(f' class="{name}"'):
+            rules[style] = (name, rule)
+
+    # Classes whose every property is inherited can move to a <g>, like attributes
+    inherited_classes = set()
+    for style, (name, rule) in rules.items():
+        if all(k in INHERITED_ATTRS for k, v in style):
+            inherited_classes.add(name)
+
+    classed = []
+    for item in items:
+        if not isinstance(item, str):
+            tag, attrs, close = item
+            style = _style(attrs)
+            if style in rules:
+                attrs = [(k, v) for k, v in attrs if k not in STYLE_ATTRS] + [("class", rules[style][0])]
+            item = (tag, attrs, close)
+        classed.append(item)
+
+    out = []
+    for item in _group(classed, inherited_classes):
+        out.append(item if isinstance(item, str) else _write_tag(*item))
+
+    css = "".join(rule for name, rule in rules.values())
+    return css, "".join(defs_items), "".join(out)
+
+
+def _add_between(items, text, depth) -> int:
+    """Append the closing tags and text in `text` (the markup between two
+    opening tags). Whitespace-only text outside text elements is dropped;
+    all other text is kept exactly. Returns the new text element depth."""
+    pos = 0
+    for m in CLOSE_TAG.finditer(text):
+        _add_text(items, text[pos:m.start()], depth)
+        items.append(m.group(0))
+        if m.group(1) in TEXT_TAGS:
+            depth -= 1
+        pos = m.end()
+    _add_text(items, text[pos:], depth)
+    return depth
+
+
+def _add_text(items, text, depth):
+    if text and (depth > 0 or text.strip()):
+        items.append(text)
+
+
+def _units(items) -> list:
+    """Split items into units: a self-closing element, an element holding only
+    text, or any other single item (which cannot be grouped)."""
+    units = []
+    i = 0
+    while i < len(items):
+        item = items[i]
+        unit = [item]
+        if not isinstance(item, str) and not item[2]:
+            close = f"</{item[0]}>"
+            j = i + 1
+            while j < len(items) and isinstance(items[j], str) and items[j] != close:
+                j += 1
+            if j < len(items) and items[j] == close:
+                unit = items[i:j + 1]
+        units.append(unit)
+        i += len(unit)
+    return units
+
+
+def _shared(unit, inherited_classes) -> tuple:
+    """The attributes of a unit's element that could move to an enclosing <g>."""
+    head = unit[0]
+    if isinstance(head, str) or (len(unit) == 1 and not head[2]):
+        return ()
+    return tuple(
+        (k, v) for k, v in head[1]
+        if k in INHERITED_ATTRS or (k == "class" and v in inherited_classes)
+    )
+
+
+def _group(items, inherited_classes) -> list:
+    """Wrap each run of adjacent elements with the same inherited attributes
+    in one <g> carrying them, where that makes the output smaller."""
+    out = []
+    units = _units(items)
+    i = 0
+    while i < len(units):
+        shared = _shared(units[i], inherited_classes)
+        j = i + 1
+        while j < len(units) and shared and _shared(units[j], inherited_classes) == shared:
+            j += 1
+        attr_text = len("".join(f' {k}="{v}"' for k, v in shared))
+        if j - i > 1 and (j - i) * attr_text > len("<g></g>") + attr_text:
+            keys = {k for k, v in shared}
+            out.append(("g", list(shared), ""))
+            for unit in units[i:j]:
+                tag, attrs, close = unit[0]
+                out.append((tag, [(k, v) for k, v in attrs if k not in keys], close))
+                out.extend(unit[1:])
+            out.append("</g>")
+        else:
+            for unit in units[i:j]:
+                out.extend(unit)
+        i = j
+    return out
+
+
+def _attrs(m, decimals) -> list:
+    attrs = []
+    zero_defaults = ZERO_DEFAULTS if m.group(1) in ZERO_DEFAULT_TAGS else ()
+    for k, v in ATTR.findall(m.group(2)):
+        if k in GEOMETRY_ATTRS:
+            v = _round(v, decimals)
+        if k in zero_defaults and v == "0":
+            continue
+        if k == "d":
+            v = PATH_SPACE.sub("", v)
+        attrs.append((k, v))
+    return attrs
+
+
+def _write_tag(tag, attrs, close) -> str:
+    attr_text = "".join(f' {k}="{v}"' for k, v in attrs)
+    return f"<{tag}{attr_text}{close}>"
+
+
+def _style(attrs) -> tuple:
+    return tuple(sorted((k, v) for k, v in attrs if k in STYLE_ATTRS))
+
+
+LINE_ENDS = ("x1", "y1", "x2", "y2")
+
+
+def _merge_lines(items):
+    """Replace each run of adjacent <line/> elements with identical other
+    attributes by one <path/> of move/line segments."""
+    merged = []
+    run_attrs = None   # non-endpoint attrs of the path being extended
+    for item in items:
+        if not isinstance(item, str) and item[0] == "line" and item[2] == "/":
+            ends = dict(item[1])
+            rest = [(k, v) for k, v in item[1] if k not in LINE_ENDS]
+            # Markers sit on each line's ends, so those lines stay separate
+            if not any(k.startswith("marker") for k in ends):
+                x1, y1, x2, y2 = (ends.get(k, "0") for k in LINE_ENDS)
+                if y1 == y2:
+                    segment = f"M{x1} {y1}H{x2}"
+                elif x1 == x2:
+                    segment = f"M{x1} {y1}V{y2}"
+                else:
+                    segment = f"M{x1} {y1}L{x2} {y2}"
+                segment = PATH_SPACE.sub("", segment)
+                if run_attrs == rest:
+                    tag, attrs, close = merged[-1]
+                    merged[-1] = (tag, [("d", attrs[0][1] + segment)] + attrs[1:], close)
+                else:
+                    merged.append(("path", [("d", segment)] + rest, "/"))
+                    run_attrs = rest
+                continue
+        merged.append(item)
+        run_attrs = None
+    return merged
+
+
+def compact_svg_document(body: str, vb: tuple, svg_w: int, svg_h: int) -> str:
+    """The <svg> document for `body` in compact form."""
+    vb_min_x, vb_min_y, vb_w, vb_h = vb
+    decimals = precision(vb_w, svg_w)
+    css, defs, body = compact_body(body, decimals)
+    vb_str = " ".join(_round(str(float(n)), decimals) for n in vb)
+    return (
+        f'<svg width="{svg_w}" height="{svg_h}" viewBox="{vb_str}" xmlns="http://www.w3.org/2000/svg">'
+        + (f"<style>{css}</style>" if css else "")
+        + (f"<defs>{defs}</defs>" if defs else "")
+        + body
+        + "</svg>"
+    )
+
@@ -1,7 +1,8 @@
-import re
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
+from . import dsl
+
 DIAGRAM_TYPE = "DiceSumGrid"
 
 # Example:
@@ -14,26 +15,21 @@ class DiceSumGridDiagram:
     pos: Tuple[float, float]
 
 
-DICE_SUM_GRID_REGEX = re.compile(
-    r"DiceSumGrid\s*\(\s*target:\s*(?P<target>\d+)\s*,\s*pos:\s*\(\s*(?P<x>-?\d+)\s*,\s*(?P<y>-?\d+)\s*\)\s*\)"
-)
+SCHEMA = {
+    "target": (dsl.integer, dsl.REQUIRED),
+    "pos":    (dsl.point, dsl.REQUIRED),
+}
 
 
 def parse(line: str) -> Optional[DiceSumGridDiagram]:
-    print("DiceSumGrid parse")
-    match = DICE_SUM_GRID_REGEX.match(line)
-    if not match:
-        print("DiceSumGrid Regex failed")
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
-    target = int(match.group("target"))
-    px = float(match.group("x"))
-    py = float(match.group("y"))
-
     return DiceSumGridDiagram(
         type="DiceSumGrid",
-        target=target,
-        pos=(px, py)
+        target=args["target"],
+        pos=args["pos"]
     )
 
 
@@ -2,6 +2,8 @@ import re
 from dataclasses import dataclass
 from typing import Optional, Tuple
 
+from . import dsl
+
 DIAGRAM_TYPE = "DotArray"
 
 # DotArray(count: 2x2, pos: (0, 0))
@@ -14,29 +16,28 @@ class DotArrayDiagram:
     pos: Tuple[float, float]
 
 
-DOTARRAY_REGEX = re.compile(
-    r"DotArray\s*\(\s*count:\s*(?P<count>\d+(?:x\d+)?)\s*,\s*pos:\s*\(\s*(?P<x>-?\d+)\s*,\s*(?P<y>-?\d+)\s*\)\s*\)"
-)
+SCHEMA = {
+    "count": (dsl.text, dsl.REQUIRED),
+    "pos":   (dsl.point, dsl.REQUIRED),
+}
+
+COUNT = re.compile(r"(\d+)(?:x(\d+))?")
+
 
 def parse(line: str) -> Optional[DotArrayDiagram]:
-    print("DotArray parse")
-    match = DOTARRAY_REGEX.match(line)
+    args = dsl.bind(line, SCHEMA)
+    match = COUNT.fullmatch(args["count"]) if args else None
     if not match:
-        print("DotArray Regex failed")
         return None
 
-    count_str = match.group("count")
-    px = float(match.group("x"))
-    py = float(match.group("y"))
-
     # Support "3" or "3x4"
-    if "x" in count_str:
-        rows, cols = map(int, count_str.split("x"))
+    if match.group(2):
+        rows, cols = int(match.group(1)), int(match.group(2))
     else:
         rows = 1
-        cols = int(count_str)
+        cols = int(match.group(1))
 
-    return DotArrayDiagram(type="DotArray", rows=rows, cols=cols, pos=(px, py))
+    return DotArrayDiagram(type="DotArray", rows=rows, cols=cols, pos=args["pos"])
 
 
 def render(dotarray: DotArrayDiagram) -> str:
@@ -0,0 +1,242 @@
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+# Shared parser for diagram lines of the form
+#   Name(key: value, key: value, ...)
+#
+# Values:
+#   numbers   3, -2.5              -> int / float
+#   strings   "Jan", “Jan”         -> str
+#   booleans  true, false          -> bool
+#   tuples    (1, 2)               -> tuple
+#   lists     [1, 2], [("a", 1)]   -> tuple
+#   anything else up to the next , ) or ] is kept as bare text, e.g.
+#   time: 3:15, count: 3x4, expr: 2*(x+1)
+#
+# Each module declares a schema {key: (coerce, default)} and calls bind(),
+# so the line is scanned once (and only once per distinct text) instead of
+# once per attribute.
+
+NAME = re.compile(r"\s*([A-Za-z_]\w*)")
+KEY = re.compile(r"[A-Za-z_]\w*")
+NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)")
+TRAILING_JUNK = "}])"   # left after a number by unbalanced template braces
+
+OPEN_QUOTES = {'"': '"”', "“": '"”'}
+CLOSERS = {"(": ")", "[": "]"}
+
+REQUIRED = object()   # schema default for keys that must be present
+
+
+class Call(NamedTuple):
+    name: str
+    args: MappingProxyType   # key -> value, read-only (shared through the cache)
+
+
+def _skip_space(text, i):
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _bare(raw):
+    raw = raw.strip()
+    if NUMBER.fullmatch(raw):
+        return float(raw) if "." in raw else int(raw)
+    if raw in ("true", "false"):
+        return raw == "true"
+    return raw
+
+
+def _value(text, i):
+    """Read one value starting at text[i]; returns (value, index after it)."""
+    i = _skip_space(text, i)
+    if i >= len(text):
+        return "", i
+    c = text[i]
+
+    if c in OPEN_QUOTES:
+        end = i + 1
+        while end < len(text) and text[end] not in OPEN_QUOTES[c]:
+            end += 1
+        return text[i + 1:end], min(end + 1, len(text))
+
+    if c in CLOSERS:
+        closer = CLOSERS[c]
+        items = []
+        i += 1
+        while True:
+            i = _skip_space(text, i)
+            if i >= len(text):
+                break
+            if text[i] in ")]":
+                # A mismatched bracket also ends the sequence
+                i += 1 if text[i] == closer else 0
+                break
+            if text[i] == ",":
+                i += 1
+                continue
+            # A missing comma between items, as in ("a", 1) ("b", 2), is
+            # tolerated: the next item simply starts where this one ended
+            item, i = _value(text, i)
+            items.append(item)
+        return tuple(items), i
+
+    # Bare text: up to the next , ) or ] outside brackets
+    depth = 0
+    start = i
+    while i < len(text):
+        ch = text[i]
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            if depth == 0:
+                break
+            depth -= 1
+        elif ch == "," and depth == 0:
+            break
+        i += 1
+    return _bare(text[start:i]), i
+
+
+@lru_cache(maxsize=1024)
+def parse_call(line: str) -> Optional[Call]:
+    """Parse `Name(key: value, ...)` in one pass. None if there is no leading name.
+
+    Parsing is lenient, like the per-key regexes it replaces: pairs without a
+    key or colon are skipped, and a missing closing bracket is tolerated.
+    """
+    m = NAME.match(line)
+    if not m:
+        return None
+    args = {}
+    i = _skip_space(line, m.end())
+    if i < len(line) and line[i] == "(":
+        i += 1
+        while i < len(line):
+            i = _skip_space(line, i)
+            if i >= len(line) or line[i] == ")":
+                break
+            if line[i] == ",":
+                i += 1
+                continue
+            key = KEY.match(line, i)
+            colon = _skip_space(line, key.end()) if key else i
+            if not key or colon >= len(line) or line[colon] != ":":
+                # Not a key: value pair; skip to the next separator
+                _, end = _value(line, i)
+                i = max(end, i + 1)
+                continue
+            args[key.group(0)], i = _value(line, colon + 1)
+            i = _skip_space(line, i)
+            while i < len(line) and line[i] not in ",)":
+                i += 1
+    return Call(m.group(1), MappingProxyType(args))
+
+
+@lru_cache(maxsize=1024)
+def search_value(line: str, key: str):
+    """The value after the first `key:` anywhere in `line` (KeyError if none).
+
+    The fallback for keys the left-to-right parse did not find or could not
+    use, e.g. a key after the closing bracket or after a malformed value;
+    the per-key regexes this parser replaced searched the whole line too.
+    """
+    m = re.search(rf"\b{re.escape(key)}\s*:", line)
+    if not m:
+        raise KeyError(key)
+    return _value(line, m.end())[0]
+
+
+def bind(line: str, schema: dict) -> Optional[dict]:
+    """Arguments of `line` coerced by `schema` ({key: (coerce, default)}).
+
+    A key missing from the parsed call, or whose value cannot be coerced, is
+    looked up again in the whole line (search_value). Failing that it takes
+    its default. Returns None if the line does not parse or a REQUIRED key is
+    missing or invalid.
+    """
+    call = parse_call(line)
+    if call is None:
+        return None
+    values = {}
+    for key, (coerce, default) in schema.items():
+        try:
+            values[key] = coerce(call.args[key])
+            continue
+        except (KeyError, TypeError, ValueError):
+            pass
+        try:
+            values[key] = coerce(search_value(line, key))
+        except (KeyError, TypeError, ValueError):
+            if default is REQUIRED:
+                return None
+            values[key] = default
+    return values
+
+
+# ----------- COERCERS ------------------
+
+def number(v) -> float:
+    if isinstance(v, bool):
+        raise TypeError("expected a number")
+    if isinstance(v, str):
+        # Bare text is a number only up to a stray closing bracket, e.g.
+        # "12}" -> 12 (as the old regexes read it); "1/2" or "3cm" is not one
+        raw = v.strip().rstrip(TRAILING_JUNK).strip()
+        if not NUMBER.fullmatch(raw):
+            raise ValueError(f"expected a number: {v!r}")
+        v = raw
+    return float(v)
+
+
+def integer(v) -> int:
+    return int(number(v))
+
+
+def text(v) -> str:
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, tuple):
+        raise TypeError("expected text")
+    return str(v)
+
+
+def flag(v) -> bool:
+    if not isinstance(v, bool):
+        raise TypeError("expected true or false")
+    return v
+
+
+def point(v) -> tuple:
+    x, y = v
+    return (number(x), number(y))
+
+
+def int_point(v) -> tuple:
+    x, y = v
+    return (integer(x), integer(y))
+
+
+def numbers(v) -> list:
+    if not isinstance(v, tuple):
+        raise TypeError("expected a list")
+    return [number(item) for item in v]
+
+
+def number_pairs(v) -> list:
+    return [point(item) for item in v]
+
+
+def labelled_values(v) -> list:
+    """[("Jan", 45), ...] -> [("Jan", 45.0), ...]; malformed entries are dropped."""
+    pairs = []
+    for item in v:
+        try:
+            label, value = item
+            pairs.append((text(label), number(value)))
+        except (TypeError, ValueError):
+            continue
+    return pairs
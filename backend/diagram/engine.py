@@ -1,7 +1,91 @@
+import math
+import multiprocessing
+import os
 import re
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from typing import List
 
 from . import DIAGRAM_REGISTRY
+from .compact import compact_svg_document
+
+# Set DIAGRAM_DEBUG=true to log every parsed line and render error.
+DEBUG = os.getenv("DIAGRAM_DEBUG", "false").lower() == "true"
+
+# Set DIAGRAM_COMPACT_SVG=true for minified SVG output (see compact.py). Each
+# SVG, including each frame of a multi-step question, stays self-contained.
+COMPACT_SVG = os.getenv("DIAGRAM_COMPACT_SVG", "false").lower() == "true"
+
+# Version of the SVG the engine draws. Bump it when a change to the diagram
+# modules or to compact.py changes their output: stored SVGs (the diagram_svg
+# columns) drawn under another version, or the other COMPACT_SVG setting, are
+# re-rendered each time they are used until backfill_diagram_svg (or a save)
+# stores them again.
+ENGINE_VERSION = 3
+SVG_FORMAT = f"{ENGINE_VERSION}:{'compact' if COMPACT_SVG else 'full'}"
+
+DEFAULT_VIEWBOX = (-30, -15, 60, 30)
+
+# Rendered SVG is cached by diagram code, up to roughly this many bytes
+# (code + SVG). A single entry may use at most 1/8 of the budget.
+SVG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Batch rendering: seconds allowed per diagram, and the most diagrams per batch
+BATCH_ITEM_TIMEOUT = float(os.getenv("DIAGRAM_BATCH_TIMEOUT", "5"))
+MAX_BATCH_DIAGRAMS = 200
+
+DIAGRAM_NAME = re.compile(r"[A-Za-z_]\w*")
+
+
+def _log(message):
+    if DEBUG:
+        print(f"render_diagram_from_code: {message}")
+
+
+def _find_module(line):
+    """The diagram module for a code line, looked up by its leading name."""
+    m = DIAGRAM_NAME.match(line)
+    module = DIAGRAM_REGISTRY.get(m.group(0)) if m else None
+    if module is not None:
+        return m.group(0), module
+    # Lines such as "RectFoo(...)" used to match by prefix; keep accepting them
+    for diagram_type in DIAGRAM_REGISTRY:
+        if line.startswith(diagram_type):
+            return diagram_type, DIAGRAM_REGISTRY.get(diagram_type)
+    return None, None
+
+
+# ----------- PROCESS-WIDE SVG CACHE ------------------
+
+_SVG_CACHE = OrderedDict()   # code -> svg (LRU order)
+_SVG_CACHE_LOCK = threading.Lock()
+_SVG_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def _entry_size(code, svg):
+    return sys.getsizeof(code) + sys.getsizeof(svg)
+
+
+def svg_cache_stats():
+    """Hit/miss counts and current size of the rendered-SVG cache."""
+    with _SVG_CACHE_LOCK:
+        stats = dict(_SVG_CACHE_STATS, entries=len(_SVG_CACHE), max_bytes=SVG_CACHE_MAX_BYTES)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def clear_svg_cache():
+    with _SVG_CACHE_LOCK:
+        _SVG_CACHE.clear()
+        _SVG_CACHE_STATS.update(hits=0, misses=0, evictions=0, bytes=0)
+
 
 def render_diagram_from_code(code: str) -> str:
     if not code:
@@ -12,44 +96,222 @@ def render_diagram_from_code(code: str) -> str:
     if not code.strip():
         return ""
 
-    # print("Render diagram from code")
+    svg = _cache_get(code)
+    if svg is None:
+        svg = _render(code)
+        _cache_put(code, svg)
+    return svg
+
+
+def _cache_get(code):
+    with _SVG_CACHE_LOCK:
+        svg = _SVG_CACHE.get(code)
+        if svg is not None:
+            _SVG_CACHE.move_to_end(code)
+            _SVG_CACHE_STATS["hits"] += 1
+            return svg
+        _SVG_CACHE_STATS["misses"] += 1
+        return None
+
+
+def _cache_put(code, svg):
+    size = _entry_size(code, svg)
+    if size > SVG_CACHE_MAX_BYTES // 8:
+        return
+    with _SVG_CACHE_LOCK:
+        if code not in _SVG_CACHE:
+            _SVG_CACHE[code] = svg
+            _SVG_CACHE_STATS["bytes"] += size
+        while _SVG_CACHE_STATS["bytes"] > SVG_CACHE_MAX_BYTES:
+            old_code, old_svg = _SVG_CACHE.popitem(last=False)
+            _SVG_CACHE_STATS["bytes"] -= _entry_size(old_code, old_svg)
+            _SVG_CACHE_STATS["evictions"] += 1
+
+
+def _render(code: str) -> str:
+    return render_parsed(parse_diagram(code))
+
+
+def parse_diagram(code: str) -> list:
+    """The lines of diagram code as (diagram_type, module, parsed) in order,
+    skipping lines that match no module or fail to parse."""
     lines = [l.strip() for l in re.split(r'[\n;]', code) if l.strip()]
-    fragments = []
+    diagrams = []
+    for line in lines:
+        diagram_type, module = _find_module(line)
+        if module is None:
+            _log(f"no match for {line!r}")
+            continue
+        try:
+            parsed = module.parse(line)
+            _log(f"parsed={parsed}")
+            if parsed:
+                diagrams.append((diagram_type, module, parsed))
+            else:
+                _log(f"not parsed successfully: {line!r}")
+        except Exception as e:
+            print(f"render_diagram_from_code: ERROR in {diagram_type}: {e}")
+            if DEBUG:
+                traceback.print_exc()
+    return diagrams
 
-    DEFAULT_VIEWBOX = (-30, -15, 60, 30)
 
-    print(f"render_diagram_from_code: registry={list(DIAGRAM_REGISTRY.keys())}")
+def render_parsed(diagrams: list) -> str:
+    """The <svg> document for parse_diagram output; the last diagram with a
+    viewbox sets the viewBox."""
+    fragments = []
     vb = DEFAULT_VIEWBOX
-    for line in lines:
-        print(f"render_diagram_from_code: line={line!r}")
-        matched = False
-        for diagram_type, module in DIAGRAM_REGISTRY.items():
-            if line.startswith(diagram_type):
-                matched = True
-                try:
-                    parsed = module.parse(line)
-                    print(f"render_diagram_from_code: parsed={parsed}")
-                    if parsed:
-                        fragments.append(module.render(parsed))
-                        if hasattr(module, "viewbox"):
-                            vb = module.viewbox(parsed)
-                    else:
-                        print("Not parsed successfully")
-                except Exception as e:
-                    import traceback
-                    print(f"render_diagram_from_code: ERROR in {diagram_type}: {e}")
-                    traceback.print_exc()
-                break
-        if not matched:
-            print(f"render_diagram_from_code: no match for {line!r}")
+    for diagram_type, module, parsed in diagrams:
+        try:
+            fragments.append(module.render(parsed))
+            if hasattr(module, "viewbox"):
+                vb = module.viewbox(parsed)
+        except Exception as e:
+            print(f"render_diagram_from_code: ERROR in {diagram_type}: {e}")
+            if DEBUG:
+                traceback.print_exc()
+
+    return svg_document(fragments, vb)
+
 
+def is_static_diagram(code) -> bool:
+    """True for diagram code with no {{ }} expressions, whose SVG never changes."""
+    return (
+        isinstance(code, str) and bool(code.strip())
+        and code.strip().lower() != "none" and "{{" not in code
+    )
+
+
+def render_static_diagram(code) -> str:
+    """SVG for static diagram code, for storing at save time ("" if not static or on error)."""
+    if not is_static_diagram(code):
+        return ""
+    try:
+        return render_diagram_from_code(code)
+    except Exception:
+        return ""
+
+
+def svg_document(fragments: List[str], vb: tuple, compact: bool = None) -> str:
+    """Wrap rendered diagram fragments in an <svg> element with viewBox `vb`.
+
+    In compact mode (COMPACT_SVG unless `compact` is given) the output is
+    minified; see compact.py.
+    """
     vb_min_x, vb_min_y, vb_w, vb_h = vb
     svg_w = 500
     svg_h = round(svg_w * vb_h / vb_w)
+    if COMPACT_SVG if compact is None else compact:
+        return compact_svg_document("\n".join(fragments), vb, svg_w, svg_h)
     vb_str = f"{vb_min_x} {vb_min_y} {vb_w} {vb_h}"
 
     pre = f'<svg width="{svg_w}" height="{svg_h}" viewBox="{vb_str}" xmlns="http://www.w3.org/2000/svg">'
     body = "\n".join(fragments)
     post = '</svg>'
 
-    return pre + str(body) + post
\ No newline at end of file
+    return pre + str(body) + post
+
+
+# ----------- BATCH RENDERING ------------------
+
+class DiagramTimeout(BaseException):
+    # BaseException, so the per-line `except Exception` in _render and the
+    # per-point handlers in the modules do not swallow it
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise DiagramTimeout()
+
+
+def render_diagram_task(code: str, timeout: float) -> dict:
+    """Pool task: render one diagram, giving up after `timeout` seconds."""
+    signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return {"diagram_svg": render_diagram_from_code(code), "error": None}
+    except DiagramTimeout:
+        return {"diagram_svg": "", "error": f"Timed out after {timeout:g}s"}
+    except Exception as e:
+        return {"diagram_svg": "", "error": str(e)}
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn, not fork: a forked child of a threaded server could
+            # inherit the SVG cache lock in a held state
+            _POOL = ProcessPoolExecutor(
+                os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _POOL
+
+
+def _discard_pool(pool):
+    """Stop a pool with a worker stuck past its timeout; the next batch starts a new one."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+
+
+def _is_blank(code) -> bool:
+    return not isinstance(code, str) or not code.strip() or code.strip().lower() == "none"
+
+
+def render_diagrams_batch(codes, timeout: float = None) -> list:
+    """Render a list of diagram codes; returns [{"diagram_svg", "error"}] in input order.
+
+    Cached diagrams are answered directly; the rest (each distinct code once)
+    are rendered in parallel on a process pool with one worker per core. Each
+    diagram has `timeout` seconds: the worker abandons a render at its deadline,
+    and if a worker does not answer at all the batch stops waiting for it.
+    """
+    timeout = BATCH_ITEM_TIMEOUT if timeout is None else timeout
+    results = [None] * len(codes)
+    pending = OrderedDict()   # code -> indexes in `codes`
+    for i, code in enumerate(codes):
+        if _is_blank(code):
+            results[i] = {"diagram_svg": "", "error": None}
+            continue
+        svg = _cache_get(code)
+        if svg is not None:
+            results[i] = {"diagram_svg": svg, "error": None}
+        else:
+            pending.setdefault(code, []).append(i)
+
+    if pending:
+        pool = _get_pool()
+        futures = {code: pool.submit(render_diagram_task, code, timeout) for code in pending}
+        # Workers enforce the per-item timeout; this is the backstop for a
+        # render stuck where the alarm cannot interrupt it (e.g. inside C code)
+        rounds = math.ceil(len(pending) / pool._max_workers)
+        deadline = time.monotonic() + rounds * timeout + timeout
+        stuck = False
+        for code, future in futures.items():
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                if result["error"] is None:
+                    _cache_put(code, result["diagram_svg"])
+            except FutureTimeout:
+                stuck = True
+                result = {"diagram_svg": "", "error": f"Timed out after {timeout:g}s"}
+            except Exception as e:
+                # BrokenProcessPool and the like
+                stuck = True
+                result = {"diagram_svg": "", "error": str(e)}
+            for i in pending[code]:
+                results[i] = dict(result)
+        if stuck:
+            _discard_pool(pool)
+    return results
@@ -1,8 +1,9 @@
 
-import re
 from dataclasses import dataclass
 from typing import Optional, Tuple, List
 
+from . import dsl
+
 DIAGRAM_TYPE = "GraphColumn"
 
 @dataclass
@@ -14,39 +15,21 @@ class GraphColumnDiagram:
 # Example accepted:
 # GraphColumn(points: [("Dogs", 5), ("Cats", 6)], pos: (0,0))
 
-# Capture the points list and the pos tuple
-GRAPH_COLUMN_REGEX = re.compile(
-    r'GraphColumn\s*\(\s*'
-    r'points:\s*\[(?P<cols>.+?)\]\s*,\s*'
-    r'pos:\s*\(\s*(?P<x>-?\d+(?:\.\d*)?)\s*,\s*(?P<y>-?\d+(?:\.\d*)?)\s*\)\s*'
-    r'\)\s*$'
-)
 
-# Capture pairs like ("Label", 12.3). Accept straight and curly quotes.
-PAIR_REGEX = re.compile(
-    r'\(\s*[\"“”](.*?)[\"“”]\s*,\s*(-?\d+(?:\.\d*)?)\s*\)'
-)
+SCHEMA = {
+    "points": (dsl.labelled_values, dsl.REQUIRED),
+    "pos":    (dsl.point, dsl.REQUIRED),
+}
 
 def parse(line: str) -> Optional[GraphColumnDiagram]:
-    match = GRAPH_COLUMN_REGEX.match(line)
-    if not match:
-        return None
-
-    cols_raw = match.group("cols")
-    px = float(match.group("x"))
-    py = float(match.group("y"))
-
-    pairs: List[Tuple[str, float]] = []
-    for label, value in PAIR_REGEX.findall(cols_raw):
-        pairs.append((label, float(value)))
-
-    if not pairs:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or not args["points"]:
         return None
 
     return GraphColumnDiagram(
         type=DIAGRAM_TYPE,
-        points=pairs,
-        pos=(px, py)
+        points=args["points"],
+        pos=args["pos"]
     )
 
 def render(diagram: GraphColumnDiagram) -> str:
@@ -1,9 +1,10 @@
 
-import re
 import math
 from dataclasses import dataclass, field
 from typing import Optional, Tuple, List
 
+from . import dsl
+
 DIAGRAM_TYPE = "GraphLine"
 
 # Syntax:
@@ -19,37 +20,20 @@ class GraphLineDiagram:
     show_values: bool = True
 
 
-# Accept pairs like ("Label", 12.3); allow straight or curly quotes
-PAIR_REGEX = re.compile(
-    r'\(\s*(["\u201c\u201d])(.*?)\1\s*,\s*(-?\d+(?:\.\d*)?)\s*\)'
-)
+SCHEMA = {
+    "points":      (dsl.labelled_values, dsl.REQUIRED),
+    "pos":         (dsl.point, (0.0, 0.0)),
+    "y_label":     (dsl.text, ""),
+    "show_values": (dsl.flag, True),
+}
 
 
 def parse(line: str) -> Optional[GraphLineDiagram]:
-    if not line.startswith("GraphLine"):
-        return None
-
-    pts_match = re.search(r'points:\s*\[(.+?)\]', line)
-    if not pts_match:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or not args["points"]:
         return None
 
-    points: List[Tuple[str, float]] = []
-    for _, label, value in PAIR_REGEX.findall(pts_match.group(1)):
-        points.append((label, float(value)))
-
-    if not points:
-        return None
-
-    pos_match = re.search(r'pos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
-    pos = (float(pos_match.group(1)), float(pos_match.group(2))) if pos_match else (0.0, 0.0)
-
-    y_label_match = re.search(r'y_label:\s*"([^"]*)"', line)
-    y_label = y_label_match.group(1) if y_label_match else ""
-
-    sv_match = re.search(r'\bshow_values:\s*(true|false)', line)
-    show_values = (sv_match.group(1) != "false") if sv_match else True
-
-    return GraphLineDiagram(type=DIAGRAM_TYPE, points=points, pos=pos, y_label=y_label, show_values=show_values)
+    return GraphLineDiagram(type=DIAGRAM_TYPE, **args)
 
 
 def _nice_step(approx: float) -> float:
@@ -1,7 +1,8 @@
-import re
 from dataclasses import dataclass
 from typing import Optional, Tuple, List
 
+from . import dsl
+
 DIAGRAM_TYPE = "GraphPie"
 
 @dataclass
@@ -13,39 +14,21 @@ class GraphPieDiagram:
 # Example:
 # GraphPie(points: [("Pizza", 15), ("Pasta", 18)], pos: (0,0))
 
-GRAPH_PIE_REGEX = re.compile(
-    r'GraphPie\s*\(\s*'
-    r'points:\s*\[(?P<pts>.+?)\]\s*,\s*'
-    r'pos:\s*\(\s*(?P<x>-?\d+(?:\.\d*)?)\s*,\s*(?P<y>-?\d+(?:\.\d*)?)\s*\)\s*'
-    r'\)\s*$'
-)
 
-# Accept pairs like ("Label", 12.3); allow straight or curly quotes
-PAIR_REGEX = re.compile(
-    r'\(\s*([\"“”])(.*?)\1\s*,\s*(-?\d+(?:\.\d*)?)\s*\)'
-)
+SCHEMA = {
+    "points": (dsl.labelled_values, dsl.REQUIRED),
+    "pos":    (dsl.point, dsl.REQUIRED),
+}
 
 def parse(line: str) -> Optional[GraphPieDiagram]:
-    print("Pie Parse")
-    m = GRAPH_PIE_REGEX.match(line)
-    if not m:
-        return None
-
-    pts_raw = m.group("pts")
-    px = float(m.group("x"))
-    py = float(m.group("y"))
-
-    points: List[Tuple[str, float]] = []
-    for _, label, value in PAIR_REGEX.findall(pts_raw):
-        points.append((label, float(value)))
-
-    if not points:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or not args["points"]:
         return None
 
     return GraphPieDiagram(
         type=DIAGRAM_TYPE,
-        points=points,
-        pos=(px, py),
+        points=args["points"],
+        pos=args["pos"],
     )
 
 def _polar_to_cartesian(cx: float, cy: float, r: float, angle_deg: float) -> Tuple[float, float]:
@@ -1,7 +1,8 @@
-import re
 from dataclasses import dataclass
 from typing import Optional, Tuple, List
 
+from . import dsl
+
 DIAGRAM_TYPE = "NumberLine"
 
 # NumberLine(min: 0, max: 10, arrows: [({{a}}, {{a + b}})], pos: (0, 0))
@@ -15,40 +16,25 @@ class NumberLineDiagram:
     pos: Tuple[float, float]
 
 
-NUMBERLINE_REGEX = re.compile(
-    r"NumberLine\s*\(\s*min:\s*(?P<min>-?\d+)\s*,\s*max:\s*(?P<max>-?\d+)\s*,\s*arrows:\s*\[(?P<arrows>[^\]]*)\]\s*,\s*pos:\s*\(\s*(?P<x>-?\d+)\s*,\s*(?P<y>-?\d+)\s*\)\s*\)"
-)
-
-ARROW_REGEX = re.compile(r"\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)")
+SCHEMA = {
+    "min":    (dsl.number, dsl.REQUIRED),
+    "max":    (dsl.number, dsl.REQUIRED),
+    "arrows": (dsl.number_pairs, dsl.REQUIRED),
+    "pos":    (dsl.point, dsl.REQUIRED),
+}
 
 
 def parse(line: str) -> Optional[NumberLineDiagram]:
-    print("NumberLine parse")
-    match = NUMBERLINE_REGEX.match(line)
-    if not match:
-        print("NumberLine Regex failed")
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
-    min_val = float(match.group("min"))
-    max_val = float(match.group("max"))
-    px = float(match.group("x"))
-    py = float(match.group("y"))
-
-    arrows_str = match.group("arrows").strip()
-    arrows: List[Tuple[float, float]] = []
-
-    if arrows_str:
-        for m in ARROW_REGEX.finditer(arrows_str):
-            start = float(m.group(1))
-            end = float(m.group(2))
-            arrows.append((start, end))
-
     return NumberLineDiagram(
         type="NumberLine",
-        min_val=min_val,
-        max_val=max_val,
-        arrows=arrows,
-        pos=(px, py),
+        min_val=args["min"],
+        max_val=args["max"],
+        arrows=args["arrows"],
+        pos=args["pos"],
     )
 
 
@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
 from typing import List, Optional
 
+from . import dsl
+
 DIAGRAM_TYPE = "ParallelLines"
 
 # Syntax: ParallelLines(angle: 60, arc_1: 1, arc_2: 0, ..., arc_8: 2, label_1: 60, label_2: ?, ...)
@@ -29,24 +30,27 @@ class ParallelLinesDiagram:
     scale: float = 1.0
 
 
-def parse(line: str) -> Optional[ParallelLinesDiagram]:
-    def get_num(key):
-        m = re.search(rf'\b{key}:\s*(-?[\d.]+)', line)
-        return float(m.group(1)) if m else None
+SCHEMA = {
+    "angle": (dsl.number, 60.0),
+    "scale": (dsl.number, 1.0),
+    **{f"arc_{i}": (dsl.integer, 0) for i in range(1, 9)},
+    **{f"label_{i}": (dsl.text, "") for i in range(1, 9)},
+}
 
-    def get_str(key):
-        # Match label_N: value  — value is everything up to the next comma or closing paren
-        m = re.search(rf'\b{key}:\s*([^,)\s]+)', line)
-        return m.group(1) if m else ""
 
-    angle = get_num("angle") or 60.0
-    scale = get_num("scale") or 1.0
+def parse(line: str) -> Optional[ParallelLinesDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
+        return None
+
+    angle = args["angle"] or 60.0
+    scale = args["scale"] or 1.0
 
     # Clamp angle to (0, 180) exclusive
     angle = max(1.0, min(179.0, angle))
 
-    arcs = [int(get_num(f"arc_{i}") or 0) for i in range(1, 9)]
-    labels = [get_str(f"label_{i}") for i in range(1, 9)]
+    arcs = [args[f"arc_{i}"] for i in range(1, 9)]
+    labels = [args[f"label_{i}"] for i in range(1, 9)]
 
     return ParallelLinesDiagram(angle=angle, arcs=arcs, labels=labels, scale=scale)
 
@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass
 from typing import Optional, List, Tuple
 
+from . import dsl
+
 DIAGRAM_TYPE = "Polygon"
 
 # Syntax: Polygon(sides: [5, 5, 5, 4, 3], pos: (x, y), scale: 1.5, labels: true, name: "")
@@ -29,35 +30,21 @@ class PolygonDiagram:
     name: str = ""
 
 
-def parse(line: str) -> Optional[PolygonDiagram]:
-    if not line.strip().startswith("Polygon"):
-        return None
-
-    sides_match = re.search(r'sides:\s*\[([^\]]+)\]', line)
-    if not sides_match:
-        return None
+SCHEMA = {
+    "sides":  (dsl.numbers, dsl.REQUIRED),
+    "pos":    (dsl.point, (0.0, 0.0)),
+    "scale":  (dsl.number, 0.0),
+    "labels": (dsl.flag, True),
+    "name":   (dsl.text, ""),
+}
 
-    try:
-        sides = [float(s.strip()) for s in sides_match.group(1).split(',') if s.strip()]
-    except ValueError:
-        return None
 
-    if len(sides) < 3:
+def parse(line: str) -> Optional[PolygonDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None or len(args["sides"]) < 3:
         return None
 
-    pos_match = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
-    pos = (float(pos_match.group(1)), float(pos_match.group(2))) if pos_match else (0.0, 0.0)
-
-    scale_match = re.search(r'\bscale:\s*([\d.]+)', line)
-    scale = float(scale_match.group(1)) if scale_match else 0.0
-
-    labels_match = re.search(r'\blabels:\s*(true|false)', line)
-    labels = (labels_match.group(1) != 'false') if labels_match else True
-
-    name_match = re.search(r'\bname:\s*"([^"]*)"', line)
-    name = name_match.group(1) if name_match else ""
-
-    return PolygonDiagram(sides=sides, pos=pos, scale=scale, labels=labels, name=name)
+    return PolygonDiagram(**args)
 
 
 def _build_vertices(sides: List[float], scale: float, pos: Tuple[float, float]) -> List[Tuple[float, float]]:
@@ -110,7 +97,6 @@ def _fmt(n: float) -> str:
     return str(int(n)) if n == int(n) else f"{n:.4g}"
 
 
-
 def render(d: PolygonDiagram) -> str:
     scale = d.scale if d.scale > 0 else _auto_scale(d.sides)
     verts = _build_vertices(d.sides, scale, d.pos)
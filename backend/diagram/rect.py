@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
 from typing import Optional, Tuple
 
+from . import dsl
+
 DIAGRAM_TYPE = "Rect"
 
 # Syntax: Rect(x: 5, y: 3, pos: (0, 0), scale: 1, labels: true)
@@ -19,29 +20,23 @@ class RectDiagram:
     name: str = ""
 
 
-def parse(line: str) -> Optional[RectDiagram]:
-    def get_num(key):
-        m = re.search(rf'\b{key}:\s*(-?[\d.]+)', line)
-        return float(m.group(1)) if m else None
-
-    pos_match = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
-    labels_match = re.search(r'\blabels:\s*(true|false)', line)
-    name_match = re.search(r'\bname:\s*"([^"]*)"', line)
+SCHEMA = {
+    "x":      (dsl.number, dsl.REQUIRED),
+    "y":      (dsl.number, dsl.REQUIRED),
+    "pos":    (dsl.point, (0.0, 0.0)),
+    "scale":  (dsl.number, 1.0),
+    "labels": (dsl.flag, True),
+    "name":   (dsl.text, ""),
+}
 
-    x = get_num("x")
-    y = get_num("y")
 
-    if x is None or y is None:
+def parse(line: str) -> Optional[RectDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
-    pos = (float(pos_match.group(1)), float(pos_match.group(2))) if pos_match else (0.0, 0.0)
-    scale = get_num("scale") or 1.0
-    labels = (labels_match.group(1) != "false") if labels_match else True
-    name = name_match.group(1) if name_match else ""
-
-    result = RectDiagram(x=x, y=y, pos=pos, scale=scale, labels=labels, name=name)
-    print(f"Rect parse: x={x}, y={y}, pos={pos}, scale={scale}, labels={labels}, name={name!r}")
-    return result
+    args["scale"] = args["scale"] or 1.0
+    return RectDiagram(**args)
 
 
 def render(d: RectDiagram) -> str:
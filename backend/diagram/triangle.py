@@ -1,8 +1,9 @@
-import re
 import math
 from dataclasses import dataclass, field
 from typing import List, Optional
 
+from . import dsl
+
 DIAGRAM_TYPE = "Triangle"
 
 # Syntax: Triangle(a: 5, b: 7, c: 6)
@@ -35,31 +36,24 @@ class TriangleDiagram:
     scale: float = 1.0
 
 
-def parse(line: str) -> Optional[TriangleDiagram]:
-    def get_num(key):
-        m = re.search(rf'\b{key}:\s*(-?[\d.]+)', line)
-        return float(m.group(1)) if m else None
-
-    def get_int(key):
-        v = get_num(key)
-        return int(v) if v is not None else None
-
-    def get_str(key):
-        m = re.search(rf'\b{key}:\s*"([^"]*)"', line)
-        if m:
-            return m.group(1)
-        m = re.search(rf'\b{key}:\s*([^,)\s]+)', line)
-        return m.group(1) if m else ""
+SCHEMA = {
+    "a":     (dsl.number, dsl.REQUIRED),
+    "b":     (dsl.number, dsl.REQUIRED),
+    "c":     (dsl.number, None),
+    "pos":   (dsl.point, (0.0, 0.0)),
+    "scale": (dsl.number, 1.0),
+    **{key: (dsl.integer, 0) for key in ("ticks_a", "ticks_b", "ticks_c", "arcs_A", "arcs_B", "arcs_C")},
+    **{key: (dsl.text, "") for key in ("label_A", "label_B", "label_C", "label_a", "label_b", "label_c")},
+}
 
-    pos_match = re.search(r'\bpos:\s*\(\s*(-?[\d.]+)\s*,\s*(-?[\d.]+)\s*\)', line)
 
-    a = get_num("a")
-    b = get_num("b")
-    c = get_num("c")
-
-    if None in (a, b):
+def parse(line: str) -> Optional[TriangleDiagram]:
+    args = dsl.bind(line, SCHEMA)
+    if args is None:
         return None
 
+    a, b, c = args["a"], args["b"], args["c"]
+
     # If c is omitted, assume a right angle at vertex C (c is the hypotenuse)
     if c is None:
         c = math.sqrt(a * a + b * b)
@@ -67,26 +61,8 @@ def parse(line: str) -> Optional[TriangleDiagram]:
     if a + b <= c or a + c <= b or b + c <= a:
         return None
 
-    pos = [float(pos_match.group(1)), float(pos_match.group(2))] if pos_match else [0.0, 0.0]
-    scale = get_num("scale") or 1.0
-
-    return TriangleDiagram(
-        a=a, b=b, c=c,
-        ticks_a=get_int("ticks_a") or 0,
-        ticks_b=get_int("ticks_b") or 0,
-        ticks_c=get_int("ticks_c") or 0,
-        arcs_A=get_int("arcs_A") or 0,
-        arcs_B=get_int("arcs_B") or 0,
-        arcs_C=get_int("arcs_C") or 0,
-        label_A=get_str("label_A"),
-        label_B=get_str("label_B"),
-        label_C=get_str("label_C"),
-        label_a=get_str("label_a"),
-        label_b=get_str("label_b"),
-        label_c=get_str("label_c"),
-        pos=pos,
-        scale=scale,
-    )
+    args.update(c=c, pos=list(args["pos"]), scale=args["scale"] or 1.0)
+    return TriangleDiagram(**args)
 
 
 def _tick_marks(x1, y1, x2, y2, count, sw):
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from backend.models import Template, Knowledge
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render and store the SVG of parameter-free Template and Knowledge diagrams. "
+        "Rows drawn by another engine version are re-rendered on every use until stored "
+        "again, so run this after a deploy that bumps ENGINE_VERSION or changes DIAGRAM_COMPACT_SVG"
+    )
+
+    def handle(self, *args, **options):
+        for model in (Knowledge, Template):
+            rendered = cleared = 0
+            for obj in model.objects.all().iterator():
+                old = (obj.diagram_svg, obj.diagram_svg_version)
+                obj.render_diagram_svg()
+                if (obj.diagram_svg, obj.diagram_svg_version) == old:
+                    continue
+                # update() rather than save(): no updated_at bump or save side effects
+                model.objects.filter(pk=obj.pk).update(
+                    diagram_svg=obj.diagram_svg, diagram_svg_version=obj.diagram_svg_version,
+                )
+                if obj.diagram_svg:
+                    rendered += 1
+                else:
+                    cleared += 1
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: rendered {rendered}, cleared {cleared}"
+            ))
@@ -0,0 +1,145 @@
+import glob
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.models import Template
+from backend.render.bench import (
+    run_bench, save_report, load_report, compare_reports, check_import_budgets, REGRESSION_THRESHOLD,
+)
+
+
+def load_corpus(source, path=None):
+    """(name, content) pairs for the chosen template source.
+
+    db:     every Template with content
+    yaml:   question_templates/*.yaml (or the files matching `path`)
+    backup: templates_backup.json (or the export file at `path`)
+    """
+    if source == "db":
+        return [
+            (f"{t.id}:{t.name or ''}", t.content)
+            for t in Template.objects.exclude(content="").order_by("id")
+            if t.content
+        ]
+
+    if source == "yaml":
+        pattern = path or os.path.join(settings.BASE_DIR, "question_templates", "*.yaml")
+        corpus = []
+        for file_path in sorted(glob.glob(pattern)):
+            with open(file_path, "r", encoding="utf-8") as f:
+                corpus.append((os.path.basename(file_path), f.read()))
+        return corpus
+
+    if source == "backup":
+        file_path = path or os.path.join(settings.BASE_DIR, "templates_backup.json")
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"File not found: {file_path}")
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Invalid JSON: {e}")
+        # Backup records have no id; their position in the file is stable
+        return [(f"#{i}", r["content"]) for i, r in enumerate(records) if r.get("content")]
+
+    raise CommandError(f"Unknown source: {source}")
+
+
+class Command(BaseCommand):
+    help = "Benchmark the question renderer over the template library"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["db", "yaml", "backup"], default="db",
+                            help="Templates to render (default: db)")
+        parser.add_argument("--path", help="Glob (yaml) or JSON file (backup) overriding the default location")
+        parser.add_argument("-k", type=int, default=50, help="Renders per template (default: 50)")
+        parser.add_argument("--seed", type=int, default=0, help="First seed; render i uses seed + i")
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+        parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                            help=f"Relative slowdown counted as a regression (default: {REGRESSION_THRESHOLD})")
+        parser.add_argument("--top", type=int, default=10, help="Slowest templates to list (default: 10)")
+        parser.add_argument("--imports", action="store_true",
+                            help="Check worker startup import times against their budgets instead of rendering")
+
+    def handle(self, *args, **options):
+        if options["imports"]:
+            return self.check_imports()
+        if options["k"] < 1:
+            raise CommandError("-k must be at least 1")
+
+        corpus = load_corpus(options["source"], options["path"])
+        if not corpus:
+            raise CommandError("No templates to benchmark")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = load_report(options["compare"])
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+
+        def progress(name, result):
+            if result["renders"]:
+                self.stdout.write(
+                    f"  {name[:50]:50} {result['ops_per_sec']:>9} ops/s  "
+                    f"p50 {result['p50_ms']:>8}  p95 {result['p95_ms']:>8}  p99 {result['p99_ms']:>8} ms  "
+                    f"rejected {result['rule_rejection_rate']:.0%}"
+                )
+            else:
+                self.stderr.write(f"  {name[:50]:50} FAILED {result['first_error']}")
+
+        self.stdout.write(f"Rendering {len(corpus)} templates x {options['k']} ...")
+        report = run_bench(corpus, options["k"], options["seed"], on_result=progress)
+        report["source"] = options["source"]
+        summary = report["summary"]
+
+        self.stdout.write("")
+        self.stdout.write("Stages (per-template p50, ms):")
+        for stage, s in sorted(summary["stages"].items(), key=lambda item: -item[1]["p95_ms"]):
+            self.stdout.write(f"  {stage:20} p50 {s['p50_ms']:>8}  p95 {s['p95_ms']:>8}  p99 {s['p99_ms']:>8}")
+
+        slowest = sorted(
+            ((name, r) for name, r in report["templates"].items() if r["renders"]),
+            key=lambda item: -item[1]["p95_ms"],
+        )[:options["top"]]
+        self.stdout.write("")
+        self.stdout.write(f"Slowest {len(slowest)} templates (p95, ms):")
+        for name, r in slowest:
+            self.stdout.write(f"  {name[:50]:50} {r['p95_ms']:>8}")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['templates']} templates ({summary['failed_templates']} failed), "
+            f"{summary['renders']} renders, {summary['ops_per_sec']} ops/sec, "
+            f"rule rejection rate {summary['rule_rejection_rate']:.1%}"
+        ))
+
+        if options["output"]:
+            save_report(report, options["output"])
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare_reports(baseline, report, options["threshold"])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(f"  REGRESSION {line}")
+                raise CommandError(
+                    f"{len(regressions)} regressions beyond {options['threshold']:.0%} against {options['compare']}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def check_imports(self):
+        try:
+            profiles, violations = check_import_budgets()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        for profile in profiles:
+            slowest = ", ".join(f"{name} {ms}" for name, ms in profile["slowest"])
+            self.stdout.write(f"  {profile['module']:30} {profile['total_ms']:>8} ms   slowest: {slowest}")
+        if violations:
+            for line in violations:
+                self.stderr.write(f"  OVER BUDGET {line}")
+            raise CommandError(f"{len(violations)} import budget violations")
+        self.stdout.write(self.style.SUCCESS("All modules import within budget"))
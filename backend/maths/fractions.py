@@ -1,6 +1,3 @@
-import sympy as sp
-
-
 def denominator(x):
     """Return the denominator of a fraction value.
 
@@ -18,6 +15,7 @@ def denominator(x):
         from fractions import Fraction as _F
         return _F(x).denominator
     # Fallback: convert via nsimplify (handles floats etc.)
+    import sympy as sp
     r = sp.nsimplify(x)
     if hasattr(r, 'q'):
         return int(r.q)
@@ -40,6 +38,7 @@ def numerator(x):
         from fractions import Fraction as _F
         return _F(x).numerator
     # Fallback: convert via nsimplify
+    import sympy as sp
     r = sp.nsimplify(x)
     if hasattr(r, 'p'):
         return int(r.p)
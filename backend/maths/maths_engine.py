@@ -1,13 +1,18 @@
-import sympy as sp
 from .probability import *
 from .fractions import *
 
+
+def sympy_factorial(n):
+    import sympy as sp
+    return sp.factorial(n)
+
+
 ALLOWED_FUNCS = {
     "ways_sum": ways_sum,
     "nCr": nCr,
     "nPr": nPr,
     "hypergeom": hypergeom,
-    "factorial": sp.factorial,
+    "factorial": sympy_factorial,
     "denominator": denominator,
     "numerator": numerator,
 }
@@ -34,6 +39,7 @@ def evaluate_number_expression(expr: str, params: dict, print_details=False):
         print("Eval number (post):", expr)
 
     try:
+        import sympy as sp
         sympy_expr = float(sp.sympify(expr, locals=ALLOWED_FUNCS))
         if print_details:
             print("Sympy number:", sympy_expr)
@@ -47,6 +53,7 @@ def evaluate_fraction_expression(expr: str, params: dict):
         expr = expr.replace(f"{{{{{key}}}}}", str(val))
 
     try:
+        import sympy as sp
         sympy_expr = sp.sympify(expr, locals=ALLOWED_FUNCS)
         return sp.simplify(sympy_expr)
     except Exception:
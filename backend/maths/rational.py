@@ -0,0 +1,127 @@
+import ast
+from fractions import Fraction
+
+
+class Unsupported(Exception):
+    """The expression needs more than exact int/Fraction arithmetic (floats, symbols, surds...)."""
+
+
+def normalise(value):
+    """Collapse whole Fractions to int; reject anything that is not an exact rational."""
+    if isinstance(value, bool):
+        raise Unsupported("boolean value")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, Fraction):
+        return value.numerator if value.denominator == 1 else value
+    raise Unsupported(f"non-rational value {value!r}")
+
+
+def _add(a, b): return normalise(a + b)
+def _sub(a, b): return normalise(a - b)
+def _mul(a, b): return normalise(a * b)
+
+
+def _div(a, b):
+    if b == 0:
+        raise Unsupported("division by zero")
+    return normalise(Fraction(a) / b)
+
+
+def _floordiv(a, b):
+    if b == 0:
+        raise Unsupported("division by zero")
+    return normalise(a // b)
+
+
+def _mod(a, b):
+    if b == 0:
+        raise Unsupported("modulo by zero")
+    return normalise(a % b)
+
+
+def _pow(a, b):
+    if not isinstance(b, int):
+        raise Unsupported("non-integer exponent")
+    if b < 0:
+        if a == 0:
+            raise Unsupported("zero to a negative power")
+        return normalise(Fraction(a) ** b)
+    return normalise(a ** b)
+
+
+_BINARY_OPS = {
+    ast.Add: _add,
+    ast.Sub: _sub,
+    ast.Mult: _mul,
+    ast.Div: _div,
+    ast.FloorDiv: _floordiv,
+    ast.Mod: _mod,
+    ast.Pow: _pow,
+}
+
+
+def _compile_node(node, funcs):
+    """Turn an AST node into a closure taking a {name: value} mapping."""
+    if isinstance(node, ast.Constant):
+        value = normalise(node.value)
+        return lambda names: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+
+        def lookup(names):
+            if name not in names:
+                raise Unsupported(f"unbound name {name!r}")
+            return names[name]
+        return lookup
+
+    if isinstance(node, ast.BinOp):
+        op = _BINARY_OPS.get(type(node.op))
+        if op is None:
+            raise Unsupported(f"operator {type(node.op).__name__}")
+        left = _compile_node(node.left, funcs)
+        right = _compile_node(node.right, funcs)
+        return lambda names: op(left(names), right(names))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand, funcs)
+        if isinstance(node.op, ast.USub):
+            return lambda names: -operand(names)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise Unsupported(f"operator {type(node.op).__name__}")
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in funcs or node.keywords:
+            raise Unsupported("call to an unsupported function")
+        fn = funcs[node.func.id]
+        args = [_compile_node(a, funcs) for a in node.args]
+
+        def call(names):
+            values = [a(names) for a in args]
+            try:
+                result = fn(*values)
+            except Unsupported:
+                raise
+            except Exception as e:
+                raise Unsupported(f"{node.func.id}: {e}") from e
+            return normalise(result)
+        return call
+
+    raise Unsupported(f"syntax {type(node).__name__}")
+
+
+def compile_rational(text, funcs):
+    """Compile an arithmetic expression into a callable over int/Fraction values.
+
+    Follows sympify's reading of the text: ^ means power and / is exact
+    division. The returned callable takes a {name: value} mapping and raises
+    Unsupported when a value or operation falls outside exact rationals, so
+    the caller can fall back to sympy.
+    """
+    try:
+        tree = ast.parse(text.replace("^", "**").strip(), mode="eval")
+    except SyntaxError as e:
+        raise Unsupported(f"syntax error: {e}") from e
+    return _compile_node(tree.body, funcs)
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0017_template_knowledge_items"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="seed",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0018_question_seed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="knowledge",
+            name="diagram_svg",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="template",
+            name="diagram_svg",
+            field=models.TextField(blank=True, default=""),
+        ),
+        migrations.AddField(
+            model_name="knowledge",
+            name="diagram_svg_version",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="template",
+            name="diagram_svg_version",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+    ]
@@ -12,6 +12,10 @@ from django.contrib.auth.models import UserManager
 
 from django.db.models import Count
 from .utilities import *
+from .availability import (
+    STEP_MINUTES, DAY_MINUTES, to_minutes, to_time, minutes_on, merge, bookable_starts,
+    day_slots, weekly_bookable_slots, adhoc_bookable_slots,
+)
 
 
 from django.utils import timezone
@@ -167,88 +171,12 @@ class User(AbstractUser):
 
         availability = TutorAvailability.objects.filter(tutor=self)
         weekly_bookings = BookingWeekly.objects.filter(tutor=self)
-        session_delta = timedelta(minutes=self.default_session_minutes)
-        buffer_delta = timedelta(minutes=self.buffer_minutes)
-        blocked = defaultdict(set)
-
-        for wb in weekly_bookings:
-            start_dt = datetime.combine(date.today(), wb.start_time) - buffer_delta
-            end_dt = datetime.combine(date.today(), wb.end_time) + buffer_delta
-            cur = start_dt
-            while cur < end_dt:
-                blocked[wb.weekday].add(cur.time())
-                cur += timedelta(minutes=15)
-
-        result = {i: [] for i in range(7)}
-
-        for av in availability:
-            weekday = av.weekday
-            start = datetime.combine(date.today(), av.start_time)
-            end = datetime.combine(date.today(), av.end_time)
-            cur = start
-            while cur + session_delta <= end:
-                slot_time = cur.time()
-                conflict = False
-                check = cur
-                while check < cur + session_delta:
-                    if check.time() in blocked[weekday]:
-                        conflict = True
-                        break
-                    check += timedelta(minutes=15)
-
-                if not conflict:
-                    result[weekday].append(slot_time.strftime("%H:%M"))
-
-                cur += timedelta(minutes=15)
-
-        return result
+        return weekly_bookable_slots(availability, weekly_bookings, self.default_session_minutes, self.buffer_minutes)
 
     def booking_slots_adhoc(self, weekly_slots, dates):
         # Get all adhoc bookings for the date range
         booking_map = self.booking_list_adhoc(dates)
-        result = {}
-
-        for day in dates:
-            day_str = day.isoformat()
-            weekday = day.weekday()
-
-            # Weekly base slots for this weekday
-            base_slots = weekly_slots.get(weekday, [])
-
-            # Convert weekly slot times into datetime objects for this specific date
-            slot_dts = []
-            for time_str in base_slots:
-                hour, minute = map(int, time_str.split(":"))
-                slot_dts.append(
-                    datetime.combine(day, time(hour, minute))
-                )
-
-            # Build a set of blocked increments from adhoc bookings
-            blocked = set()
-
-            for b in booking_map.get(day_str, []):
-                # b["start_time"] and b["end_time"] are HH:MM strings
-                start_h, start_m = map(int, b["start_time"].split(":"))
-                end_h, end_m = map(int, b["end_time"].split(":"))
-
-                cur = datetime.combine(day, time(start_h, start_m))
-                end = datetime.combine(day, time(end_h, end_m))
-
-                # Mark every 15‑minute increment as blocked
-                while cur < end:
-                    blocked.add(cur.time().strftime("%H:%M"))
-                    cur += timedelta(minutes=15)
-
-            # Filter out blocked slots
-            final_slots = [
-                dt.time().strftime("%H:%M")
-                for dt in slot_dts
-                if dt.time().strftime("%H:%M") not in blocked
-            ]
-
-            result[day_str] = final_slots
-
-        return result
+        return adhoc_bookable_slots(weekly_slots, booking_map, dates)
 
     def booking_list_weekly(self):
         if self.role != "tutor":
@@ -339,8 +267,7 @@ class User(AbstractUser):
         return self.booking_create_adhoc(new_start_dt)
 
     def generate_weekly_slots(self, week_start, student=None, tutor_view=False):
-        tutor_profile = self.get_tutor_profile()
-        session_td = timedelta(minutes=self.default_session_minutes)
+        session_minutes = self.default_session_minutes
         week = []
 
         # Build the week skeletonx`
@@ -360,18 +287,20 @@ class User(AbstractUser):
             ).select_related("student")
         )
 
-        # Group appointments by date for fast lookup
+        # Each appointment as (start, end, appt) in minutes on every local day it touches
         appointments_by_date = defaultdict(list)
         for appt in appointments:
-            date_key = appt.start_datetime.date()
-            appointments_by_date[date_key].append(appt)
+            start = timezone.localtime(appt.start_datetime)
+            end = timezone.localtime(appt.end_datetime)
+            for day in week:
+                d = day["date"]
+                if start.date() <= d <= end.date():
+                    appointments_by_date[d].append((minutes_on(d, start), minutes_on(d, end), appt))
 
         appt_start_times = defaultdict(set)
-
         for appt in appointments:
-            date_key = appt.start_datetime.date()
-            start_time = appt.start_datetime.time().replace(second=0, microsecond=0)
-            appt_start_times[date_key].add(start_time)
+            start = timezone.localtime(appt.start_datetime)
+            appt_start_times[start.date()].add(start.time().replace(second=0, microsecond=0))
 
         # ── 2. Fetch blocked days for the week
         blocked_days = set(
@@ -387,26 +316,35 @@ class User(AbstractUser):
         for av in TutorAvailability.objects.filter(tutor=self):
             availability_by_weekday.setdefault(av.weekday, []).append(av)
 
-        # ── 4. Build segments and bookable slots in memory
+        # ── 4. Build segments and bookable slots, one grid pass per day
         for day in week:
             d = day["date"]
 
-            for minute in range(0, 24 * 60, 15):
-                t = (datetime.min + timedelta(minutes=minute)).time()
-
-                status, appt = tutor_profile.appointment_status_fast(
-                    d, t, student,
-                    blocked_days,
-                    appointments_by_date,
-                    availability_by_weekday,
-                )
+            if d in blocked_days:
+                day["segments"] = [
+                    {"time": to_time(m), "type": "blocked"} for m in range(0, DAY_MINUTES, STEP_MINUTES)
+                ]
+                continue
 
-                if tutor_view and status in ("booked_self", "booked_other"):
+            windows = [
+                (to_minutes(av.start_time), to_minutes(av.end_time))
+                for av in availability_by_weekday.get(d.weekday(), [])
+            ]
+            grid, bookable = day_slots(windows, appointments_by_date[d], session_minutes)
+            day["bookable_slots"] = [to_time(m) for m in bookable]
+
+            for i, state in enumerate(grid):
+                t = to_time(i * STEP_MINUTES)
+                if state in ("available", "outside"):
+                    status = state
+                elif student and state.student == student and not tutor_view:
+                    status = "booked_self"
+                else:
                     status = "booked_other"
-
                 segment = {"time": t, "type": status}
 
-                if appt:
+                if status in ("booked_self", "booked_other"):
+                    appt = state
                     segment["bookingId"] = appt.id
 
                     # Only label the FIRST slot of the appointment
@@ -423,25 +361,6 @@ class User(AbstractUser):
 
                 day["segments"].append(segment)
 
-                # Only compute bookable_slots for available segments
-                if status != "available":
-                    continue
-
-                end_dt = datetime.combine(d, t) + session_td
-                end_t = end_dt.time()
-
-                end_status, _ = tutor_profile.appointment_status_fast(
-                    d,
-                    end_t,
-                    student,
-                    blocked_days,
-                    appointments_by_date,
-                    availability_by_weekday,
-                )
-
-                if end_status == "available":
-                    day["bookable_slots"].append(t)
-
         # print("Generate Slots (week):")
         # print_segments(week)
 
@@ -687,66 +606,109 @@ class TutorProfile(models.Model):
         }
 
 
+    def availability_context(self, start_date, end_date=None):
+        return AvailabilityContext.load(self, start_date, end_date)
+
     def appointment_status(self, date_obj, time_obj, student=None):
-        dt = make_aware(datetime.combine(date_obj, time_obj))
-
-        if TutorBlockedDay.objects.filter(tutor=self.tutor, date=date_obj).exists(): return "blocked"
-        appt = BookingAdhoc.objects.filter(tutor=self.tutor, start_datetime__lte=dt, end_datetime__gt=dt).first()
-        if appt:
-            print("BookingAdhoc status:", appt.student, student)
-            if student and appt.student == student:
-                return "booked_self"
-            return "booked_other"
-
-        weekday = date_obj.weekday()  # Monday=0 ... Sunday=6
-        availability = TutorAvailability.objects.filter(tutor=self.tutor, weekday=weekday)
-        if not availability.exists(): return "outside"
-        for window in availability:
-            if window.start_time <= time_obj < window.end_time:
-                return "available"
-        return "outside"
+        return self.availability_context(date_obj).status_at(date_obj, time_obj, student)
 
-    def appointment_status_fast(
-        self,
-        date_obj,
-        time_obj,
-        student,
-        blocked_days,
-        appointments_by_date,
-        availability_by_weekday,
-    ):
-        # 1. Blocked day
-        if date_obj in blocked_days:
-            return "blocked", None
+    def is_available(self, date, start, end):
+        context = self.availability_context(date)
+        start_status = context.status_at(date, start)
+        end_status = context.status_at(date, end)
+        return start_status == "available" and end_status == "available"
 
-        dt = make_aware(datetime.combine(date_obj, time_obj))
 
-        # 2. BookingAdhoc check (using pre-fetched appointments for that date)
-        for appt in appointments_by_date.get(date_obj, []):
-            if appt.start_datetime <= dt < appt.end_datetime:
-                if student and appt.student == student:
-                    return "booked_self", appt
-                return "booked_other", appt
+class AvailabilityContext:
+    """A tutor's blocked days, adhoc appointments and availability windows for
+    a date range, loaded once (three queries) and answered from memory.
 
-        # 3. Availability windows
-        weekday = date_obj.weekday()  # Monday=0 ... Sunday=6
-        windows = availability_by_weekday.get(weekday, [])
-        for window in windows:
-            if window.start_time <= time_obj < window.end_time:
-                return "available", None
+    Times are local wall-clock; aware datetimes are converted to local time.
+    """
 
-        # 4. Outside availability
-        return "outside", None
+    def __init__(self, start_date, end_date, blocked_days, appointments, availability, session_minutes=60):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.blocked_days = set(blocked_days)
+        self.appointments = list(appointments)   # earlier ones win where they overlap
+        self.session_minutes = session_minutes
+        self.windows = defaultdict(list)   # weekday -> [(start, end)] in minutes
+        for av in availability:
+            self.windows[av.weekday].append((to_minutes(av.start_time), to_minutes(av.end_time)))
+        self._booked = {}   # date -> [(start, end, appt)] in minutes on that date
+
+    @classmethod
+    def load(cls, profile, start_date, end_date=None):
+        end_date = end_date or start_date
+        tutor = profile.tutor
+        range_start = make_aware(datetime.combine(start_date, time.min))
+        range_end = make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        return cls(
+            start_date,
+            end_date,
+            TutorBlockedDay.objects.filter(tutor=tutor, date__range=(start_date, end_date)).values_list("date", flat=True),
+            BookingAdhoc.objects.filter(tutor=tutor, start_datetime__lt=range_end, end_datetime__gt=range_start).order_by("pk"),
+            TutorAvailability.objects.filter(tutor=tutor),
+            profile.default_session_minutes,
+        )
 
+    def _booked_on(self, day):
+        if not self.start_date <= day <= self.end_date:
+            raise ValueError(f"{day} is outside the loaded range {self.start_date} to {self.end_date}")
+        booked = self._booked.get(day)
+        if booked is None:
+            booked = []
+            for appt in self.appointments:
+                start, end = _local(appt.start_datetime), _local(appt.end_datetime)
+                if start.date() <= day <= end.date():
+                    booked.append((minutes_on(day, start), minutes_on(day, end), appt))
+            self._booked[day] = booked
+        return booked
+
+    def status_at(self, date_obj, time_obj, student=None):
+        """"blocked", "booked_self", "booked_other", "available" or "outside"."""
+        if date_obj in self.blocked_days:
+            return "blocked"
+        m = to_minutes(time_obj)
+        for start, end, appt in self._booked_on(date_obj):
+            if start <= m < end:
+                if student and appt.student_id == student.id:
+                    return "booked_self"
+                return "booked_other"
+        if any(start <= m < end for start, end in self.windows[date_obj.weekday()]):
+            return "available"
+        return "outside"
 
+    def is_free(self, start, end):
+        """True if all of start-end (datetimes on one day) is inside availability,
+        on a day that is not blocked, and clear of appointments."""
+        start, end = _local(start), _local(end)
+        day = start.date()
+        if day in self.blocked_days:
+            return False
+        s, e = minutes_on(day, start), minutes_on(day, end)
+        if any(b_start < e and s < b_end for b_start, b_end, appt in self._booked_on(day)):
+            return False
+        return any(w_start <= s and e <= w_end for w_start, w_end in merge(self.windows[day.weekday()]))
+
+    def free_slots(self, session_minutes=None):
+        """{date: [start time]} for each date in the range: the session starts,
+        every STEP_MINUTES from a window's start, for which is_free holds."""
+        session = session_minutes or self.session_minutes
+        result = {}
+        day = self.start_date
+        while day <= self.end_date:
+            starts = []
+            if day not in self.blocked_days:
+                booked = merge((start, end) for start, end, appt in self._booked_on(day))
+                starts = bookable_starts(merge(self.windows[day.weekday()]), booked, session)
+            result[day] = [to_time(m) for m in starts]
+            day += timedelta(days=1)
+        return result
 
 
-    def is_available(self, date, start, end):
-        start_available = self.appointment_status(date, start) == "available"
-        end_available = self.appointment_status(date, end) == "available"
-        print("Is available (start, end):", start_available, self.appointment_status(date, start), end_available,
-              self.appointment_status(date, end))
-        return start_available and end_available
+def _local(moment):
+    return timezone.localtime(moment) if timezone.is_aware(moment) else moment
 
 
 class Skill(models.Model):
@@ -834,6 +796,18 @@ class Notification(models.Model):
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
 
+def _stored_diagram_svg(obj):
+    """obj.diagram_svg, first re-rendered if another engine version drew it.
+
+    The fresh SVG is only set on `obj`, not written back: reads stay reads,
+    and save() or backfill_diagram_svg stores it.
+    """
+    from .diagram.engine import SVG_FORMAT
+    if obj.diagram_svg_version != SVG_FORMAT:
+        obj.render_diagram_svg()
+    return obj.diagram_svg
+
+
 class Template(models.Model):
     # --- Core content ---
     name = models.CharField(max_length=200, blank=True, null=True)
@@ -876,9 +850,44 @@ class Template(models.Model):
     last_validated_at = models.DateTimeField(null=True, blank=True)
     knowledge_items = models.ManyToManyField('Knowledge', blank=True, related_name='templates')
 
+    # SVG of the template's diagram when it has no {{ }} expressions ("" otherwise),
+    # and the engine SVG_FORMAT it was drawn with
+    diagram_svg = models.TextField(blank=True, default="")
+    diagram_svg_version = models.CharField(max_length=32, blank=True, default="")
+
     def __str__(self):
         return f"{self.subject} (v{self.version})"
 
+    def render_diagram_svg(self):
+        """Store the SVG of a parameter-free diagram, so renders don't redraw it."""
+        from .render import get_compiled_template
+        from .diagram.engine import render_static_diagram, SVG_FORMAT
+        try:
+            code = get_compiled_template(self.content or "").static_diagram
+        except Exception:
+            code = None
+        self.diagram_svg = render_static_diagram(code)
+        self.diagram_svg_version = SVG_FORMAT
+
+    def stored_diagram_svg(self):
+        return _stored_diagram_svg(self)
+
+    def save(self, *args, **kwargs):
+        self.render_diagram_svg()
+        super().save(*args, **kwargs)
+        # Drop this process's compiled copy; other workers miss on the new content hash
+        from .render import invalidate_compiled_template
+        invalidate_compiled_template(self.pk)
+        from .question_pool import discard_question_pool
+        discard_question_pool(self.pk)
+
+    def delete(self, *args, **kwargs):
+        from .render import invalidate_compiled_template
+        invalidate_compiled_template(self.pk)
+        from .question_pool import discard_question_pool
+        discard_question_pool(self.pk)
+        return super().delete(*args, **kwargs)
+
 class Knowledge(models.Model):
     """
     A reusable piece of knowledge (formula, rule, definition) attached to one
@@ -889,6 +898,8 @@ class Knowledge(models.Model):
     title = models.CharField(max_length=200)
     text = models.TextField(blank=True)
     diagram = models.TextField(blank=True)
+    diagram_svg = models.TextField(blank=True, default="")   # pre-rendered when diagram has no {{ }}
+    diagram_svg_version = models.CharField(max_length=32, blank=True, default="")
     text_2 = models.TextField(blank=True)
     skills = models.ManyToManyField(Skill, blank=True, related_name="knowledge_items")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -897,6 +908,26 @@ class Knowledge(models.Model):
     def __str__(self):
         return self.title
 
+    def render_diagram_svg(self):
+        from .diagram.engine import render_static_diagram, SVG_FORMAT
+        self.diagram_svg = render_static_diagram(self.diagram)
+        self.diagram_svg_version = SVG_FORMAT
+
+    def stored_diagram_svg(self):
+        return _stored_diagram_svg(self)
+
+    def save(self, *args, **kwargs):
+        self.render_diagram_svg()
+        super().save(*args, **kwargs)
+        # Pooled questions embed the rendered knowledge items
+        from .question_pool import discard_knowledge_pools
+        discard_knowledge_pools(self)
+
+    def delete(self, *args, **kwargs):
+        from .question_pool import discard_knowledge_pools
+        discard_knowledge_pools(self)
+        return super().delete(*args, **kwargs)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -929,10 +960,18 @@ class Question(models.Model):
     selected_answer = models.TextField(null=True)
     correct = models.BooleanField(default=True)
     time_taken_ms = models.IntegerField(null=True, blank=True)
+    seed = models.BigIntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"Instance {self.id} of {self.template.name}"
 
+    def rerender(self):
+        """Render this question again from its template and seed (None if it has no seed)."""
+        if self.seed is None:
+            return None
+        from .template_utilities import generate_values_and_question
+        return generate_values_and_question(self.template_id, debug_yaml=False, seed=self.seed)
+
 class QuestionAttempt(models.Model):
     question = models.ForeignKey(Question, null=True, on_delete=models.CASCADE)
     student = models.ForeignKey(django_settings.AUTH_USER_MODEL, null=True, on_delete=models.CASCADE)
@@ -0,0 +1,200 @@
+import time
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from .models import Template
+from .render.compiled import content_hash
+from .render.batch import params_key
+
+
+# ----------- PRE-RENDERED QUESTION POOLS ------------------
+# Each validated template keeps a few ready-rendered instances in the Django
+# cache, so answering a question does not have to render the next one inside
+# the request. Pools are refilled by the refill_question_pools Celery task.
+#
+# Every instance has its own key, numbered in the order it was added. A pool
+# is two counters: `head`, the next number to take, and `tail`, the next
+# number to fill. Taking claims a number with cache.incr(head), which is
+# atomic, so no instance is ever handed to two requests. Keys include the
+# template's content hash and a generation that discard_question_pool bumps,
+# so editing a template (or a knowledge item it shows) discards its pool.
+#
+# Pools only work in a cache every process shares (Redis, see settings):
+# with the per-process default cache the worker's pools are invisible to the
+# web processes, so pooling is skipped and questions are rendered on demand.
+
+POOL_SIZE = 20            # instances rendered ahead per template
+POOL_LOW_WATERMARK = 5    # refill once a pool has fewer than this
+POOL_TIMEOUT = 24 * 60 * 60
+REFILL_LOCK_TIMEOUT = 10 * 60
+
+_STATS_KEYS = ("hits", "misses", "refills", "rendered", "refill_ms")
+
+
+def pooling_enabled():
+    """True if the default cache is shared between processes."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _generation_key(template_id):
+    return f"question_pool:{template_id}:generation"
+
+
+def _pool_key(template, generation=None):
+    """Prefix of the keys of the template's current pool."""
+    if generation is None:
+        generation = cache.get(_generation_key(template.id), 0)
+    return f"question_pool:{template.id}:{generation}:{content_hash(template.content)}"
+
+
+def _stat_key(name):
+    return f"question_pool_stats:{name}"
+
+
+def _incr(key, delta=1, timeout=None):
+    """Atomically add `delta` to the counter at `key`; returns the new value."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # First use (or evicted): start the counter
+        if not cache.add(key, delta, timeout):
+            return cache.incr(key, delta)
+        return delta
+
+
+def _bounds(pool):
+    """(head, tail) of the pool with key prefix `pool`."""
+    counters = cache.get_many([f"{pool}:head", f"{pool}:tail"])
+    return counters.get(f"{pool}:head", 0), counters.get(f"{pool}:tail", 0)
+
+
+def pool_size(template):
+    if not pooling_enabled():
+        return 0
+    head, tail = _bounds(_pool_key(template))
+    return max(0, tail - head)
+
+
+def take_pooled_question(template):
+    """Pop a ready-rendered preview for `template`, or None if its pool is empty."""
+    if not pooling_enabled():
+        return None
+    pool = _pool_key(template)
+    head, tail = _bounds(pool)
+    preview = None
+    if head < tail:
+        # Claim the next number; a request that loses the race gets a later one
+        n = _incr(f"{pool}:head", timeout=POOL_TIMEOUT) - 1
+        if n < tail:
+            preview = cache.get(f"{pool}:{n}")
+            cache.delete(f"{pool}:{n}")
+    _incr(_stat_key("misses" if preview is None else "hits"))
+    return preview
+
+
+def discard_question_pool(template_id):
+    """Drop the template's pool; the instances left behind expire with POOL_TIMEOUT."""
+    if pooling_enabled():
+        _incr(_generation_key(template_id))
+
+
+def discard_knowledge_pools(knowledge):
+    """Drop the pools of the templates that show `knowledge` (their instances embed it)."""
+    for template_id in knowledge.templates.values_list("id", flat=True):
+        discard_question_pool(template_id)
+
+
+def refill_pool(template, target=POOL_SIZE):
+    """Top the template's pool up to `target` instances. Returns the number added."""
+    from .template_utilities import generate_question_batch
+
+    if not pooling_enabled():
+        return 0
+    generation = cache.get(_generation_key(template.id), 0)
+    pool = _pool_key(template, generation)
+    # One refill per pool at a time, so two never fill the same numbers
+    lock = f"{pool}:refilling"
+    if not cache.add(lock, True, REFILL_LOCK_TIMEOUT):
+        return 0
+    try:
+        head, tail = _bounds(pool)
+        missing = target - max(0, tail - head)
+        if missing <= 0:
+            return 0
+
+        start = time.perf_counter()
+        header = {}
+        added = []
+        pooled = cache.get_many([f"{pool}:{n}" for n in range(head, tail)]).values()
+        existing = {params_key(item.get("params")) for item in pooled}
+        for record in generate_question_batch(template, missing):
+            if record["type"] == "template":
+                header = {
+                    "skill": record["skill"],
+                    "grade": record["grade"],
+                    "difficulty": record["difficulty"],
+                    "knowledge_items": record["knowledge_items"],
+                }
+            elif record["type"] == "question":
+                preview = {k: v for k, v in record.items() if k not in ("type", "index")}
+                if params_key(preview.get("params")) in existing:
+                    continue
+                preview.update(header)
+                added.append(preview)
+
+        # Numbers at or past the tail may have been claimed (and missed) while
+        # rendering, so continue after them. Only takers move the head, and the
+        # tail moves once the instances are in place.
+        first = max(_bounds(pool))
+        cache.set_many({f"{pool}:{first + i}": preview for i, preview in enumerate(added)}, POOL_TIMEOUT)
+        cache.set(f"{pool}:tail", first + len(added), POOL_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+    elapsed_ms = int((time.perf_counter() - start) * 1000)
+    _incr(_stat_key("refills"))
+    _incr(_stat_key("rendered"), len(added))
+    _incr(_stat_key("refill_ms"), elapsed_ms)
+    cache.set(_stat_key("last_refill_ms"), elapsed_ms, None)
+    return len(added)
+
+
+def refill_question_pools(low_watermark=POOL_LOW_WATERMARK, target=POOL_SIZE):
+    """Refill every validated template whose pool is below the watermark."""
+    summary = {"checked": 0, "refilled": 0, "rendered": 0}
+    if not pooling_enabled():
+        return summary
+    for template in Template.objects.filter(validated=True).select_related("skill"):
+        summary["checked"] += 1
+        if pool_size(template) >= low_watermark:
+            continue
+        try:
+            added = refill_pool(template, target)
+        except Exception as e:
+            print(f"QUESTION POOL: refill failed for template {template.id}: {e}")
+            continue
+        summary["refilled"] += 1
+        summary["rendered"] += added
+    return summary
+
+
+def pool_stats():
+    stats = {name: cache.get(_stat_key(name)) or 0 for name in _STATS_KEYS}
+    requests = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+    stats["avg_refill_ms"] = stats["refill_ms"] / stats["refills"] if stats["refills"] else 0.0
+    stats["avg_ms_per_question"] = stats["refill_ms"] / stats["rendered"] if stats["rendered"] else 0.0
+    stats["last_refill_ms"] = cache.get(_stat_key("last_refill_ms"))
+    return stats
+
+
+def next_question_preview(template):
+    """A preview for the next question from `template`: pooled if possible, else rendered now.
+
+    Returns the same {"ok", "preview", "error"} shape as generate_values_and_question.
+    """
+    preview = take_pooled_question(template)
+    if preview is not None:
+        return {"ok": True, "preview": preview, "error": None}
+    from .template_utilities import generate_values_and_question
+    return generate_values_and_question(template.id, debug_yaml=False)
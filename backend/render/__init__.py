@@ -1 +1,4 @@
-from .render import render_template_preview
\ No newline at end of file
+from .render import render_template_preview
+from .compiled import CompiledTemplate, get_compiled_template, invalidate_compiled_template
+from .sampler import ParameterGenerationError
+from .context import RenderContext
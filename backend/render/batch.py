@@ -0,0 +1,111 @@
+import json
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .compiled import get_compiled_template
+from .render import render_template_preview
+from .sampler import ParameterGenerationError
+
+# Seeds tried per requested instance before giving up on finding more
+# distinct parameter sets (templates with few possible values run out).
+BATCH_OVERSAMPLE = 4
+
+# Set BATCH_RENDER_PROCESSES to spread batch renders over that many worker
+# processes, shared by every batch in this server process; 0 or 1 renders
+# them inline.
+BATCH_PROCESSES = int(os.getenv("BATCH_RENDER_PROCESSES", "0"))
+
+
+def params_key(params):
+    """A hashable identity for a parameter set, used to drop duplicate instances."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def _render_one(compiled, seed, debug_yaml):
+    try:
+        return render_template_preview(compiled, debug_yaml=debug_yaml, seed=seed)
+    except ParameterGenerationError as e:
+        # The rules cannot be met at all, so further seeds are pointless
+        return {"seed": seed, "error": str(e), "fatal": True}
+    except Exception as e:
+        return {"seed": seed, "error": f"{type(e).__name__}: {e}"}
+
+
+def render_instance(content, seed, debug_yaml=False):
+    """Render one instance of a template from its YAML text.
+
+    Used as the process-pool task: the content is sent rather than the
+    CompiledTemplate (code objects do not pickle) and each worker keeps its
+    own compiled cache.
+    """
+    return _render_one(get_compiled_template(content), seed, debug_yaml)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # spawn, not fork: a forked child of a threaded server could
+            # inherit a lock (e.g. a cache's) in a held state
+            _POOL = ProcessPoolExecutor(
+                BATCH_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _POOL
+
+
+def render_batch(content, n, seed=None, debug_yaml=False, stats=None):
+    """Yield up to `n` renders of a template with distinct parameter sets.
+
+    Instance i is rendered with seed `seed + i`, so a batch is reproducible
+    from its first seed. Renders are yielded as soon as they are ready, in
+    seed order; failed renders are yielded as {"seed", "error"} dicts.
+    With BATCH_PROCESSES > 1 the renders are spread over the process pool.
+    `stats`, if given, is filled with tried/duplicates/errors counts.
+    """
+    stats = stats if stats is not None else {}
+    stats.update({"tried": 0, "duplicates": 0, "errors": 0})
+    base = seed if seed is not None else random.getrandbits(32)
+    budget = n * BATCH_OVERSAMPLE
+    seen = set()
+    produced = 0
+
+    executor = _get_pool() if BATCH_PROCESSES > 1 else None
+    pending = []
+    try:
+        compiled = get_compiled_template(content)
+        while produced < n and stats["tried"] < budget:
+            # Each round asks for exactly the number still missing
+            seeds = [base + stats["tried"] + i for i in range(min(n - produced, budget - stats["tried"]))]
+            stats["tried"] += len(seeds)
+            if executor:
+                pending = [executor.submit(render_instance, content, s, debug_yaml) for s in seeds]
+                results = (future.result() for future in pending)
+            else:
+                results = (_render_one(compiled, s, debug_yaml) for s in seeds)
+
+            for result in results:
+                if "error" in result:
+                    stats["errors"] += 1
+                    yield result
+                    if result.get("fatal"):
+                        return
+                    continue
+                key = params_key(result["params"])
+                if key in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+                produced += 1
+                yield result
+    finally:
+        # The pool outlives this batch: drop what a closed stream no longer needs
+        for future in pending:
+            future.cancel()
+
@@ -0,0 +1,241 @@
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+
+from .compiled import get_compiled_template
+from .render import render_template_preview
+
+# A template or stage counts as regressed when its p95 (or ops/sec) is this
+# much worse than in the baseline run.
+REGRESSION_THRESHOLD = 0.10
+
+# Templates faster than this are not compared: timer noise dominates.
+MIN_COMPARE_MS = 0.05
+
+# Startup budget: cumulative import time (ms) of the modules web and Celery
+# workers load at boot, measured with -X importtime in a fresh interpreter
+# after django.setup(). None of them may import the LAZY_MODULES.
+IMPORT_BUDGETS_MS = {
+    "backend.diagram.engine": 50,
+    "backend.render": 250,
+    "backend.tasks": 400,
+    "backend.views": 800,
+}
+LAZY_MODULES = ("sympy", "openai")
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered), math.ceil(q * len(ordered))) - 1)
+    return round(ordered[rank], 3)
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50),
+        "p95_ms": percentile(samples, 0.95),
+        "p99_ms": percentile(samples, 0.99),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def bench_template(content, k, seed=0):
+    """Render one template `k` times with seeds seed..seed+k-1.
+
+    Returns the per-template result: latency summary, ops/sec, per-stage
+    summaries, rule attempts and errors. Compilation happens once, before
+    timing starts, as it does on the cached render path.
+    """
+    compiled = get_compiled_template(content)
+    totals = []
+    stages = {}
+    attempts = 0
+    errors = []
+
+    wall_start = time.perf_counter()
+    for s in range(seed, seed + k):
+        try:
+            result = render_template_preview(compiled, debug_yaml=False, seed=s, metrics=True)
+        except Exception as e:
+            errors.append(f"seed {s}: {type(e).__name__}: {e}")
+            continue
+        m = result["metrics"]
+        totals.append(m["total_ms"])
+        attempts += m["rule_attempts"]
+        for key, ms in m.items():
+            if key.endswith("_ms") and key != "total_ms":
+                stages.setdefault(key[:-3], []).append(ms)
+    wall = time.perf_counter() - wall_start
+
+    renders = len(totals)
+    return {
+        "renders": renders,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "ops_per_sec": round(renders / wall, 1) if wall > 0 else 0.0,
+        **latency_summary(totals),
+        "rule_attempts": attempts,
+        # Share of sampled parameter sets that failed validation.rules
+        "rule_rejection_rate": round((attempts - renders) / attempts, 4) if attempts else 0.0,
+        "stages": {stage: latency_summary(ms) for stage, ms in stages.items()},
+    }
+
+
+def run_bench(corpus, k, seed=0, on_result=None):
+    """Benchmark every (name, content) pair in `corpus`.
+
+    Templates that fail to compile are recorded with their error and skipped.
+    `on_result(name, result)` is called after each template, for progress.
+    Returns the full report, ready to be saved as JSON and compared later.
+    """
+    templates = {}
+    all_totals = []
+    all_stages = {}
+    attempts = renders = 0
+
+    start = time.perf_counter()
+    for name, content in corpus:
+        try:
+            result = bench_template(content, k, seed)
+        except Exception as e:
+            result = {"renders": 0, "errors": k, "first_error": f"compile: {type(e).__name__}: {e}"}
+        templates[name] = result
+        if on_result:
+            on_result(name, result)
+        if not result["renders"]:
+            continue
+        renders += result["renders"]
+        attempts += result["rule_attempts"]
+        # Library-wide percentiles are taken over each template's p50, so a
+        # template counts once however slow or fast it is.
+        all_totals.append(result["p50_ms"])
+        for stage, summary in result["stages"].items():
+            all_stages.setdefault(stage, []).append(summary["p50_ms"])
+    wall = time.perf_counter() - start
+
+    return {
+        "k": k,
+        "seed": seed,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": {
+            "templates": len(templates),
+            "failed_templates": sum(1 for r in templates.values() if not r["renders"]),
+            "renders": renders,
+            "ops_per_sec": round(renders / wall, 1) if wall > 0 else 0.0,
+            "rule_rejection_rate": round((attempts - renders) / attempts, 4) if attempts else 0.0,
+            "template_p50": latency_summary(all_totals),
+            "stages": {stage: latency_summary(ms) for stage, ms in all_stages.items()},
+        },
+        "templates": templates,
+    }
+
+
+def _worse(before, after, threshold, higher_is_better=False):
+    if higher_is_better:
+        return before > 0 and after < before * (1 - threshold)
+    return before >= MIN_COMPARE_MS and after > before * (1 + threshold)
+
+
+def compare_reports(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """List regressions of `current` against `baseline` as readable strings.
+
+    Checks overall ops/sec, per-stage p95 and per-template p95, plus
+    templates that rendered before but now fail.
+    """
+    regressions = []
+    before, after = baseline["summary"], current["summary"]
+
+    if _worse(before["ops_per_sec"], after["ops_per_sec"], threshold, higher_is_better=True):
+        regressions.append(f"overall: {before['ops_per_sec']} -> {after['ops_per_sec']} ops/sec")
+
+    for stage, summary in after["stages"].items():
+        old = before["stages"].get(stage)
+        if old and _worse(old["p95_ms"], summary["p95_ms"], threshold):
+            regressions.append(f"stage {stage}: p95 {old['p95_ms']} -> {summary['p95_ms']} ms")
+
+    for name, result in current["templates"].items():
+        old = baseline["templates"].get(name)
+        if not old or not old["renders"]:
+            continue
+        if not result["renders"]:
+            regressions.append(f"{name}: now fails ({result['first_error']})")
+        elif _worse(old["p95_ms"], result["p95_ms"], threshold):
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+
+    return regressions
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def import_profile(module, top=5):
+    """Import `module` in a fresh interpreter under -X importtime.
+
+    Returns its cumulative import time, the `top` slowest modules it pulled
+    in (by self time), and which LAZY_MODULES were imported at all.
+    """
+    code = (
+        "import os, django\n"
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')\n"
+        "django.setup()\n"
+        f"import {module}\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=_PROJECT_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1]}")
+
+    lines = [
+        (name, int(self_us), int(cumulative), len(indent) // 2)
+        for self_us, cumulative, indent, name in (m.groups() for m in map(_IMPORT_LINE.match, proc.stderr.splitlines()) if m)
+    ]
+    # A module is listed after everything it imported, one level deeper
+    end = max((i for i, (name, _, _, depth) in enumerate(lines) if name == module and depth == 0), default=None)
+    if end is None:
+        subtree, total_us = [], 0   # already imported by django.setup()
+    else:
+        start = end
+        while start > 0 and lines[start - 1][3] > 0:
+            start -= 1
+        subtree, total_us = lines[start:end + 1], lines[end][2]
+    slowest = sorted(subtree, key=lambda line: -line[1])[:top]
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "slowest": [(name, round(self_us / 1000, 1)) for name, self_us, _, _ in slowest],
+        "eager": sorted({line[0].split(".")[0] for line in lines} & set(LAZY_MODULES)),
+    }
+
+
+def check_import_budgets(budgets=None):
+    """(profiles, violations) for the modules in `budgets` ({module: ms})."""
+    profiles, violations = [], []
+    for module, budget_ms in (budgets or IMPORT_BUDGETS_MS).items():
+        profile = import_profile(module)
+        profiles.append(profile)
+        if profile["total_ms"] > budget_ms:
+            violations.append(f"{module}: imports in {profile['total_ms']} ms (budget {budget_ms} ms)")
+        if profile["eager"]:
+            violations.append(f"{module}: imports {', '.join(profile['eager'])} at startup")
+    return profiles, violations
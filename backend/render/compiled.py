@@ -0,0 +1,133 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import yaml
+
+from .engine import compile_expression
+
+EXPR_PATTERN = re.compile(r"{{(.*?)}}")
+
+# Upper bound on distinct template contents kept in memory per process.
+COMPILED_CACHE_SIZE = 256
+
+
+def compile_rule(check):
+    """Strip {{ }} wrappers from a validation rule and compile it for eval().
+
+    Returns the original value unchanged if it cannot be compiled, so the
+    error is raised (and reported as a rule error) when the rule is evaluated.
+    """
+    try:
+        expr = EXPR_PATTERN.sub(lambda m: m.group(1).strip(), check).strip()
+        return compile(expr, "<rule>", "eval")
+    except Exception:
+        return check
+
+
+class CompiledTemplate:
+    """Everything about a template that does not change between renders.
+
+    Built once per distinct template content and shared by every render of
+    it, so `parsed` must be treated as read-only.
+    """
+
+    def __init__(self, parsed, content_hash=None):
+        if not isinstance(parsed, dict):
+            raise ValueError(f"Template must be a YAML mapping, got: {type(parsed).__name__}")
+
+        self.content_hash = content_hash
+        self.template_id = None   # last Template id compiled to this content, for metrics
+        self.parsed = parsed
+        self.param_specs = parsed.get("parameters", {})
+
+        # Validation rules as (code, message) pairs
+        validation = parsed.get("validation", {})
+        rules = validation.get("rules", []) if isinstance(validation, dict) else []
+        self.rules = []
+        self.rule_texts = []
+        for rule in rules or []:
+            if not isinstance(rule, dict):
+                raise ValueError(f"Validation rule must be a mapping, got: {rule!r}")
+            self.rules.append((
+                compile_rule(rule.get("check")),
+                rule.get("message", "Validation rule failed"),
+            ))
+            self.rule_texts.append(str(rule.get("check")))
+
+        # Filled by sampler.Sampler on first render (valid parameter combinations)
+        self.sampling_cache = {}
+
+        # A diagram with no {{ }} renders the same every time; its SVG can be
+        # supplied from Template.diagram_svg so renders skip the diagram engine.
+        diagram = parsed.get("diagram")
+        self.static_diagram = diagram if isinstance(diagram, str) and "{{" not in diagram else None
+        self.diagram_svg = None
+
+        # Distinct {{ }} expressions, in the order they first appear
+        self.expressions = tuple(dict.fromkeys(self._collect_expressions(parsed)))
+        for expr in self.expressions:
+            # Compile the value part (before any | format) once, up front
+            compile_expression(expr.split("|", 1)[0].strip())
+
+    def __str__(self):
+        return f"CompiledTemplate {self.content_hash}: {len(self.expressions)} expressions"
+
+    @classmethod
+    def _collect_expressions(cls, node):
+        if isinstance(node, str):
+            for m in EXPR_PATTERN.finditer(node):
+                yield m.group(1).strip()
+        elif isinstance(node, list):
+            for item in node:
+                yield from cls._collect_expressions(item)
+        elif isinstance(node, dict):
+            for value in node.values():
+                yield from cls._collect_expressions(value)
+
+
+# ----------- PROCESS-WIDE CACHE ------------------
+
+_COMPILED_CACHE = OrderedDict()   # content hash -> CompiledTemplate (LRU order)
+_TEMPLATE_HASHES = {}             # str(template id) -> content hash last compiled for it
+_CACHE_LOCK = threading.Lock()
+
+
+def content_hash(content):
+    return hashlib.sha1((content or "").encode("utf-8")).hexdigest()
+
+
+def get_compiled_template(content, template_id=None):
+    """Return the CompiledTemplate for `content`, parsing it only on a cache miss.
+
+    Raises yaml.YAMLError or ValueError if the content is not a valid template.
+    """
+    key = content_hash(content)
+
+    with _CACHE_LOCK:
+        compiled = _COMPILED_CACHE.get(key)
+        if compiled is not None:
+            _COMPILED_CACHE.move_to_end(key)
+
+    if compiled is None:
+        compiled = CompiledTemplate(yaml.safe_load(content), key)
+        with _CACHE_LOCK:
+            _COMPILED_CACHE[key] = compiled
+            while len(_COMPILED_CACHE) > COMPILED_CACHE_SIZE:
+                _COMPILED_CACHE.popitem(last=False)
+
+    if template_id is not None:
+        compiled.template_id = template_id
+        with _CACHE_LOCK:
+            _TEMPLATE_HASHES[str(template_id)] = key
+
+    return compiled
+
+
+def invalidate_compiled_template(template_id):
+    """Drop the cached compilation of a template, e.g. after it has been saved."""
+    with _CACHE_LOCK:
+        key = _TEMPLATE_HASHES.pop(str(template_id), None)
+        if key is not None:
+            _COMPILED_CACHE.pop(key, None)
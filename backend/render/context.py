@@ -0,0 +1,42 @@
+import time
+import random
+from contextlib import contextmanager
+
+
+class RenderContext:
+    """All mutable state belonging to one render.
+
+    Nothing here is shared between renders, so separate renders can run
+    concurrently in threads (e.g. batch generation in a ThreadPoolExecutor).
+    """
+
+    def __init__(self, seed=None):
+        # Every random choice in the render comes from this generator, so the
+        # same template and seed always give the same question.
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.used_names = set()   # NameParameter picks, kept unique within the render
+        self.memo = {}            # expression text -> (raw, formatted)
+        self.timings = {}         # stage -> seconds, excluding nested stages
+        self._timer_stack = []
+
+    def __str__(self):
+        return f"RenderContext seed={self.seed}"
+
+    @contextmanager
+    def timer(self, stage):
+        """Add the time spent in the block to timings[stage].
+
+        Time spent in a timer nested inside another is only counted for the
+        inner stage, so the stages add up to the total.
+        """
+        start = time.perf_counter()
+        self._timer_stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._timer_stack.pop()
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed - nested
+            if self._timer_stack:
+                self._timer_stack[-1] += elapsed
@@ -1,30 +1,51 @@
-import sympy as sp
+import re
+import builtins
+import keyword
+from math import isfinite
+from fractions import Fraction
 from math import comb, factorial, gcd, isqrt
 from itertools import product
 from ..maths.fractions import denominator, numerator
+from ..maths.rational import Unsupported, compile_rational, normalise
+
+# sympy is imported inside the functions that need it: it is only reached on
+# the fallback path, and importing it adds about a second to process start.
 
 def evaluate_int_expression(expr, params):
     return int(evaluate_number_expression(expr, params))
 
 def evaluate_dec_expression(expr, params, dp):
-    # print("Dec calc", expr, dp)
-    result = float(evaluate_number_expression(expr, params,print_details=False))
-    # print("Dec calc", result)
-    result = round(result, dp)
-    # print("Dec calc", result)
-    return round(evaluate_number_expression(expr, params), dp)
+    result = evaluate_number_expression(expr, params)
+    float(result)  # raise early for non-numeric results
+    if isinstance(result, Fraction):
+        import sympy as sp
+        # Round as a sympy Rational so the printed decimal matches sympy's output
+        result = sp.Rational(result.numerator, result.denominator)
+    return round(result, dp)
 
-def evaluate_number_expression(expr: str, params: dict, print_details=False):
-    if print_details:
-        print("Eval number (pre):", expr)
+def _substitute_braces(expr, params):
+    if "{{" not in expr:
+        return expr
     for key, val in params.items():
         expr = expr.replace(f"{{{{ {key} }}}}", str(val))
         expr = expr.replace(f"{{{{{key}}}}}", str(val))
+    return expr
+
+def evaluate_number_expression(expr: str, params: dict, print_details=False):
+    if print_details:
+        print("Eval number (pre):", expr)
+    expr = _substitute_braces(expr, params)
 
     if print_details:
         print("Eval number (post):", expr)
 
     try:
+        return evaluate_exact(expr)
+    except Unsupported:
+        pass
+
+    try:
+        import sympy as sp
         sympy_expr = sp.sympify(expr, locals=ALLOWED_FUNCS)
         if print_details:
             print("Sympy number:", sympy_expr)
@@ -33,17 +54,224 @@ def evaluate_number_expression(expr: str, params: dict, print_details=False):
         return expr
 
 def evaluate_fraction_expression(expr: str, params: dict):
-    for key, val in params.items():
-        expr = expr.replace(f"{{{{ {key} }}}}", str(val))
-        expr = expr.replace(f"{{{{{key}}}}}", str(val))
+    expr = _substitute_braces(expr, params)
+
+    try:
+        return evaluate_exact(expr)  # already in lowest terms
+    except Unsupported:
+        pass
 
     try:
+        import sympy as sp
         sympy_expr = sp.sympify(expr, locals=ALLOWED_FUNCS)
         return sp.simplify(sympy_expr)
     except Exception:
         return expr
 
 
+# ── Exact fast path ──────────────────────────────────────────────────────────
+# Most expressions are plain rational arithmetic once parameters are
+# substituted, so they are evaluated over int/Fraction without sympy. Anything
+# else (floats, surds, symbols, unknown functions) raises Unsupported and is
+# handed to sympify as before, with the same result.
+
+EVAL_STATS = {"exact": 0, "fallback": 0}
+
+_EXACT_CACHE = {}
+_EXACT_CACHE_SIZE = 4096
+
+def _exact_sqrt(n):
+    """sqrt for perfect squares only; anything else stays a sympy surd."""
+    if n < 0:
+        raise Unsupported("sqrt of a negative number")
+    n = Fraction(n)
+    num, den = isqrt(n.numerator), isqrt(n.denominator)
+    if num * num != n.numerator or den * den != n.denominator:
+        raise Unsupported("irrational sqrt")
+    return Fraction(num, den)
+
+def _exact_factorial(n):
+    if not isinstance(n, int) or n < 0:
+        raise Unsupported("factorial of a non-natural number")
+    return factorial(n)
+
+def _exact_funcs():
+    funcs = {name: fn for name, fn in ALLOWED_FUNCS.items() if name not in ("hypergeom", "factorial", "sqrt")}
+    funcs.update({"factorial": _exact_factorial, "sqrt": _exact_sqrt, "abs": abs, "min": min, "max": max})
+    return funcs
+
+def _is_plain_symbol(expr):
+    """True if sympify would turn `expr` into a bare Symbol (e.g. a name parameter's value)."""
+    import sympy as sp
+    return (
+        expr.isidentifier()
+        and not keyword.iskeyword(expr)
+        and expr not in ALLOWED_FUNCS
+        and not hasattr(sp, expr)
+        and not hasattr(builtins, expr)
+    )
+
+def _compile_rational(expr):
+    try:
+        return compile_rational(expr, EXACT_FUNCS)
+    except Unsupported as e:
+        # Remember the failure so the text is not re-parsed on every render
+        reason = str(e)
+        def unsupported(names):
+            raise Unsupported(reason)
+        return unsupported
+
+def _compile_exact(expr):
+    stripped = expr.strip()
+    if _is_plain_symbol(stripped):
+        import sympy as sp
+        symbol = sp.Symbol(stripped)
+        return lambda names: symbol
+    return _compile_rational(expr)
+
+def evaluate_exact(expr, names=None):
+    """Evaluate `expr` exactly, raising Unsupported if sympy is needed.
+
+    Returns an int, a Fraction, or a sympy Symbol for a bare unknown name.
+    """
+    fn = _EXACT_CACHE.get(expr)
+    if fn is None:
+        fn = _compile_exact(expr)
+        if len(_EXACT_CACHE) >= _EXACT_CACHE_SIZE:
+            _EXACT_CACHE.clear()
+        _EXACT_CACHE[expr] = fn
+    try:
+        result = fn(names or {})
+    except Unsupported:
+        EVAL_STATS["fallback"] += 1
+        raise
+    EVAL_STATS["exact"] += 1
+    return result
+
+def evaluation_stats():
+    """Counts of exact vs sympy-fallback evaluations since process start."""
+    total = EVAL_STATS["exact"] + EVAL_STATS["fallback"]
+    return {
+        **EVAL_STATS,
+        "fallback_rate": EVAL_STATS["fallback"] / total if total else 0.0,
+    }
+
+
+# ── Compiled parameter expressions ───────────────────────────────────────────
+# Template expressions are compiled once per distinct text and evaluated with
+# parameter values bound by name, instead of pasting str(value) into the text
+# and re-parsing it on every render.
+
+_INT_OR_FRACTION = re.compile(r"-?\d+(/\d+)?")
+
+_EXPRESSION_CACHE = {}
+_EXPRESSION_CACHE_SIZE = 4096
+
+def exact_value(value):
+    """A parameter value as int/Fraction, or None if it is not an exact rational."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and _INT_OR_FRACTION.fullmatch(value.strip()):
+        try:
+            return normalise(Fraction(value.strip()))
+        except ZeroDivisionError:
+            return None
+    return None
+
+def sympy_value(value):
+    """A parameter value as the sympy object sympify would have read from its text, or None."""
+    import sympy as sp
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return sp.Integer(value)
+    if isinstance(value, float):
+        return sp.Float(value) if isfinite(value) else None
+    if isinstance(value, sp.Basic):
+        return value
+    if isinstance(value, str):
+        stripped = value.strip()
+        if _INT_OR_FRACTION.fullmatch(stripped):
+            try:
+                return sp.Rational(stripped)
+            except (ValueError, ZeroDivisionError):
+                return None
+        if _is_plain_symbol(stripped):
+            return sp.Symbol(stripped)
+    return None
+
+class CompiledExpression:
+    """A {{ }} expression (without its | format) ready to evaluate against parameter values."""
+
+    def __init__(self, text):
+        self.text = text.strip()
+        # Every word token, so membership matches the old \bname\b substitution
+        self.names = frozenset(re.findall(r"\w+", self.text))
+        self.bare_name = self.text if self.text.isidentifier() else None
+        self.exact = _compile_rational(self.text)
+
+    def __str__(self):
+        return f"CompiledExpression {self.text}"
+
+    def evaluate(self, values):
+        used = {k: v for k, v in values.items() if k in self.names}
+
+        if self.bare_name in used:
+            value = used[self.bare_name]
+            result = exact_value(value)
+            if result is None:
+                result = sympy_value(value)
+            if result is not None:
+                return result
+
+        exact = {}
+        for k, v in used.items():
+            ev = exact_value(v)
+            if ev is not None:
+                exact[k] = ev
+        try:
+            result = self.exact(exact)
+            EVAL_STATS["exact"] += 1
+            return result
+        except Unsupported:
+            EVAL_STATS["fallback"] += 1
+
+        local = dict(ALLOWED_FUNCS)
+        for k, v in used.items():
+            sv = sympy_value(v)
+            if sv is None:
+                # Not representable as a sympy value; fall back to text substitution
+                return evaluate_number_expression(self.substitute(values), values)
+            local[k] = sv
+        try:
+            import sympy as sp
+            return sp.sympify(self.text, locals=local)
+        except Exception:
+            return self.substitute(values)
+
+    def substitute(self, values):
+        """The expression text with parameter values pasted in (fractions parenthesised)."""
+        text = self.text
+        for key, val in values.items():
+            val_str = str(val)
+            if "/" in val_str:
+                val_str = f"({val_str})"
+            text = re.sub(rf'\b{re.escape(key)}\b', val_str, text)
+        return text
+
+def compile_expression(text):
+    """Return the CompiledExpression for `text`, compiling it on first use."""
+    compiled = _EXPRESSION_CACHE.get(text)
+    if compiled is None:
+        compiled = CompiledExpression(text)
+        if len(_EXPRESSION_CACHE) >= _EXPRESSION_CACHE_SIZE:
+            _EXPRESSION_CACHE.clear()
+        _EXPRESSION_CACHE[text] = compiled
+    return compiled
+
+
 def surd_coeff(n):
     """Largest integer a such that a² divides n. e.g. surd_coeff(12) = 2"""
     n = int(n)
@@ -76,16 +304,26 @@ def ways_sum(dice, target):
 def hypergeom(N, K, n, k):
     return comb(K, k) * comb(N - K, n - k) / comb(N, n)
 
+def sympy_factorial(n):
+    import sympy as sp
+    return sp.factorial(n)
+
+def sympy_sqrt(x):
+    import sympy as sp
+    return sp.sqrt(x)
+
 ALLOWED_FUNCS = {
     "ways_sum": ways_sum,
     "nCr": nCr,
     "nPr": nPr,
     "hypergeom": hypergeom,
-    "factorial": sp.factorial,
+    "factorial": sympy_factorial,
     "gcd": gcd,
     "denominator": denominator,
     "numerator": numerator,
-    "sqrt": sp.sqrt,
+    "sqrt": sympy_sqrt,
     "surd_coeff": surd_coeff,
     "surd_radicand": surd_radicand,
 }
+
+EXACT_FUNCS = _exact_funcs()
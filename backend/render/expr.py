@@ -1,4 +1,3 @@
-import re
 from .param import *
 from .engine import *
 
@@ -87,32 +86,18 @@ class ExpressionNode:
         return name, options
 
     def evaluate(self):
-        # 1. Generate values from parameter objects
-        value_map = {}
-        for name, param in self.params.items():
-            value_map[name] = param.value
-
-        # 2. If any referenced variable is a list, use Python eval with list functions
-        list_vars = {k for k, v in value_map.items() if isinstance(v, list)}
-        if list_vars and any(re.search(rf'\b{re.escape(k)}\b', self.raw_expr) for k in list_vars):
+        compiled = compile_expression(self.raw_expr)
+        value_map = {name: param.value for name, param in self.params.items()}
+
+        # If any referenced variable is a list, use Python eval with list functions
+        if any(isinstance(value_map.get(name), list) for name in compiled.names):
             ctx = dict(_LIST_CONTEXT)
             ctx["__builtins__"] = {}
             ctx.update(value_map)
             self.evaluated_value = eval(self.raw_expr, ctx)
             return self.evaluated_value
 
-        # 3. Substitute into expression
-        # Wrap fraction values in parentheses so that e.g. a / b with a=23/4, b=11/5
-        # becomes (23/4) / (11/5) rather than 23/4 / 11/5 (which parses incorrectly).
-        substituted = self.raw_expr
-        for key, val in value_map.items():
-            val_str = str(val)
-            if "/" in val_str:
-                val_str = f"({val_str})"
-            substituted = re.sub(rf'\b{re.escape(key)}\b', val_str, substituted)
-
-        # 4. Evaluate using maths engine
-        self.evaluated_value = evaluate_number_expression(substituted, value_map)
+        self.evaluated_value = compiled.evaluate(value_map)
         return self.evaluated_value
 
     def format(self):
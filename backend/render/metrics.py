@@ -0,0 +1,84 @@
+import threading
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in milliseconds (roughly x1.5 per step, 0.05ms to 10s).
+BUCKETS_MS = [round(0.05 * 1.5 ** i, 3) for i in range(31)]
+
+# Per-template histograms are kept for at most this many templates.
+MAX_TEMPLATES = 2000
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are bucket upper bounds (capped at the max seen)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS_MS[i], round(self.max_ms, 3)) if i < len(BUCKETS_MS) else round(self.max_ms, 3)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+# ----------- PROCESS-WIDE AGGREGATES ------------------
+
+_STAGES = {}       # stage -> Histogram
+_TEMPLATES = {}    # template key -> Histogram of total render time
+_LOCK = threading.Lock()
+
+
+def record_render(template_key, stages_ms):
+    """Add one render's stage timings (milliseconds) to the process histograms."""
+    total = sum(stages_ms.values())
+    with _LOCK:
+        for stage, ms in stages_ms.items():
+            _STAGES.setdefault(stage, Histogram()).add(ms)
+        _STAGES.setdefault("total", Histogram()).add(total)
+        if template_key in _TEMPLATES or len(_TEMPLATES) < MAX_TEMPLATES:
+            _TEMPLATES.setdefault(template_key, Histogram()).add(total)
+
+
+def record_stage(stage, ms):
+    """Add a timing for a stage that runs outside render_template_preview (e.g. parse)."""
+    with _LOCK:
+        _STAGES.setdefault(stage, Histogram()).add(ms)
+
+
+def metrics_snapshot(top=20):
+    """Per-stage summaries, plus the `top` templates with the worst p99 render time."""
+    with _LOCK:
+        stages = {stage: h.summary() for stage, h in _STAGES.items()}
+        templates = [dict(template=key, **h.summary()) for key, h in _TEMPLATES.items()]
+    templates.sort(key=lambda t: (t["p99_ms"], t["mean_ms"]), reverse=True)
+    return {"stages": stages, "templates": templates[:top]}
+
+
+def reset_metrics():
+    with _LOCK:
+        _STAGES.clear()
+        _TEMPLATES.clear()
@@ -1,4 +1,5 @@
 from .format import *
+from .context import RenderContext
 from math import gcd
 from fractions import Fraction as _Fraction
 
@@ -8,17 +9,18 @@ _NAMES = [
 ]
 
 class RandomParameter:
-    def __init__(self, name, type_name, options):
+    def __init__(self, name, type_name, options, context=None):
         self.name = name
         self.type_name = type_name
         self.options = options or {}
-        self.value = self.generate({})
+        self.context = context or RenderContext()
+        self.value = self.generate(self.context)
 
     def __str__(self):
         return f"{self.name}: {self.value}"
 
     @classmethod
-    def from_yaml(cls, name, spec):
+    def from_yaml(cls, name, spec, context=None):
         # spec may be literal, dict, or structured type
         if isinstance(spec, (int, float, str)):
             return LiteralParameter(name, spec)
@@ -29,36 +31,41 @@ class RandomParameter:
         param_type = spec.get("type")
 
         if param_type == "fraction":
-            return FractionParameter(name, spec)
+            return FractionParameter(name, spec, context)
         if param_type == "decimal":
-            return DecimalParameter(name, spec)
+            return DecimalParameter(name, spec, context)
         if param_type == "dollar":
-            return DollarParameter(name, spec)
+            return DollarParameter(name, spec, context)
         if param_type == "percent":
-            return PercentParameter(name, spec)
+            return PercentParameter(name, spec, context)
         if param_type == "choice":
-            return ChoiceParameter(name, spec)
+            return ChoiceParameter(name, spec, context)
         if param_type == "name":
-            return NameParameter(name, spec)
+            return NameParameter(name, spec, context)
         if param_type == "int":
-            return IntParameter(name, spec)
+            return IntParameter(name, spec, context)
         if param_type == "list":
-            return ListParameter(name, spec)
+            return ListParameter(name, spec, context)
 
         if "expr" in spec:
             return ExprParameter(name, spec)
 
         if "min" in spec and "max" in spec:
-            return RangeParameter(name, spec)
+            return RangeParameter(name, spec, context)
 
         if "size" in spec:
-            return RangeParameter(name, spec)
+            return RangeParameter(name, spec, context)
 
         raise ValueError(f"Unsupported parameter spec: {spec}")
 
     def generate(self, context):
         raise NotImplementedError
 
+    def domain(self):
+        """Every value generate() can return, repeated in proportion to its
+        probability, or None if that is unknown or too large to list."""
+        return None
+
     def format(self, value):
         if not hasattr(self, "format_type") or self.format_type is None:
             return value
@@ -76,14 +83,17 @@ class LiteralParameter(RandomParameter):
     def generate(self, context):
         return self._literal_value
 
+    def domain(self):
+        return [self._literal_value]
+
 class RangeParameter(RandomParameter):
     SIZE_MAP = {
         "small":  (2, 5),
         "medium": (2, 10),
     }
 
-    def __init__(self, name, options):
-        super().__init__(name, "range", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "range", options, context)
         if options.get("brackets_when_negative"):
             self.default_format_type = "brackets"
 
@@ -99,29 +109,52 @@ class RangeParameter(RandomParameter):
     def generate(self, context):
         size = self.options.get("size")
         if size == "large":
-            value = self._round_2_sig_figs(random.randint(20, 1000))
+            value = self._round_2_sig_figs(context.rng.randint(20, 1000))
         elif size in self.SIZE_MAP:
             lo, hi = self.SIZE_MAP[size]
-            value = random.randint(lo, hi)
+            value = context.rng.randint(lo, hi)
         else:
             lo = int(self.options["min"])
             hi = int(self.options["max"])
             step = int(self.options.get("step", 1))
             if step > 1:
                 steps = list(range(lo, hi + 1, step))
-                value = random.choice(steps)
+                value = context.rng.choice(steps)
             else:
-                value = random.randint(lo, hi)
+                value = context.rng.randint(lo, hi)
 
         sign = self.options.get("sign", "pos")
         if sign == "neg":
             value = -abs(value)
         elif sign == "pos_neg":
-            if random.choice([True, False]):
+            if context.rng.choice([True, False]):
                 value = -abs(value)
 
         return value
 
+    def domain(self):
+        size = self.options.get("size")
+        if size == "large":
+            values = [self._round_2_sig_figs(n) for n in range(20, 1001)]
+        elif size in self.SIZE_MAP:
+            lo, hi = self.SIZE_MAP[size]
+            values = list(range(lo, hi + 1))
+        else:
+            try:
+                lo = int(self.options["min"])
+                hi = int(self.options["max"])
+                step = int(self.options.get("step", 1))
+            except (KeyError, TypeError, ValueError):
+                return None
+            values = list(range(lo, hi + 1, step)) if step > 1 else list(range(lo, hi + 1))
+
+        sign = self.options.get("sign", "pos")
+        if sign == "neg":
+            return [-abs(v) for v in values]
+        if sign == "pos_neg":
+            return values + [-abs(v) for v in values]
+        return values
+
 class IntParameter(RandomParameter):
     """Generates a random integer using a named size preset or explicit min/max.
 
@@ -135,8 +168,8 @@ class IntParameter(RandomParameter):
         "large": (2, 20),
     }
 
-    def __init__(self, name, options):
-        super().__init__(name, "int", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "int", options, context)
 
     def generate(self, context):
         size = self.options.get("size")
@@ -145,12 +178,24 @@ class IntParameter(RandomParameter):
         else:
             lo = int(self.options.get("min", 2))
             hi = int(self.options.get("max", 10))
-        return random.randint(lo, hi)
+        return context.rng.randint(lo, hi)
+
+    def domain(self):
+        size = self.options.get("size")
+        if size in self.SIZE_MAP:
+            lo, hi = self.SIZE_MAP[size]
+        else:
+            try:
+                lo = int(self.options.get("min", 2))
+                hi = int(self.options.get("max", 10))
+            except (TypeError, ValueError):
+                return None
+        return list(range(lo, hi + 1))
 
 
 class FractionParameter(RandomParameter):
-    def __init__(self, name, options):
-        super().__init__(name, "fraction", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "fraction", options, context)
         self.default_format_type = "mixed_number" if options.get("mixed") else "fraction"
 
     def generate(self, context):
@@ -166,22 +211,22 @@ class FractionParameter(RandomParameter):
         simplified = self.options.get("simplified", True)
 
         den_min, den_max = SIZE_MAP.get(size, (2, 10))
-        den = random.randint(den_min, den_max)
+        den = context.rng.randint(den_min, den_max)
 
         if size == "v_small":
             num = 1
         elif self.options.get("mixed"):
             # Generate a proper fractional part, then add a whole number
-            num = random.randint(1, den - 1)
+            num = context.rng.randint(1, den - 1)
             min_whole = self.options.get("min_whole", 1)
             max_whole = self.options.get("max_whole", 5)
-            whole = random.randint(min_whole, max_whole)
+            whole = context.rng.randint(min_whole, max_whole)
             num = whole * den + num  # store as improper fraction
         else:
             proper = self.options.get("proper", None)
-            num = random.randint(1, den - 1)
+            num = context.rng.randint(1, den - 1)
             if proper == False:
-                num = random.randint(den + 1, den_max)
+                num = context.rng.randint(den + 1, den_max)
 
         if simplified:
             g = gcd(num, den)
@@ -191,7 +236,7 @@ class FractionParameter(RandomParameter):
         if sign == "neg":
             num = -abs(num)
         elif sign == "pos_neg":
-            if random.choice([True, False]):
+            if context.rng.choice([True, False]):
                 num = -abs(num)
 
         return f"{num}/{den}"
@@ -209,8 +254,8 @@ class DecimalParameter(RandomParameter):
     """
     default_format_type = "decimal"
 
-    def __init__(self, name, options):
-        super().__init__(name, "decimal", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "decimal", options, context)
         self.default_format_options = {"decimal_places": int(options.get("decimal_places", 1))}
 
     def generate(self, context):
@@ -218,7 +263,7 @@ class DecimalParameter(RandomParameter):
         scale = 10 ** dp
         min_scaled = int(float(self.options["min"]) * scale)
         max_scaled = int(float(self.options["max"]) * scale)
-        raw = random.randint(min_scaled, max_scaled)
+        raw = context.rng.randint(min_scaled, max_scaled)
         f = _Fraction(raw, scale)
         return f"{f.numerator}/{f.denominator}"
 
@@ -235,15 +280,15 @@ class DollarParameter(RandomParameter):
     """
     default_format_type = "dollar"
 
-    def __init__(self, name, options):
-        super().__init__(name, "dollar", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "dollar", options, context)
 
     def generate(self, context):
         size = self.options.get("size")
 
         if size == "small":
             # Whole dollars only, $3–$8
-            dollars = random.randint(
+            dollars = context.rng.randint(
                 int(self.options.get("min", 3)),
                 int(self.options.get("max", 8)),
             )
@@ -254,7 +299,7 @@ class DollarParameter(RandomParameter):
             step = int(self.options.get("step", 10))
             lo = int(self.options.get("min", 10)) // step
             hi = int(self.options.get("max", 1000)) // step
-            dollars = random.randint(lo, hi) * step
+            dollars = context.rng.randint(lo, hi) * step
             return f"{dollars}/1"
 
         # If step is specified, generate a whole-dollar multiple of step
@@ -262,13 +307,13 @@ class DollarParameter(RandomParameter):
             step = int(self.options["step"])
             lo = int(self.options.get("min", 0)) // step
             hi = int(self.options.get("max", 100)) // step
-            dollars = random.randint(lo, hi) * step
+            dollars = context.rng.randint(lo, hi) * step
             return f"{dollars}/1"
 
         # Default / size == "medium": dollars with cents, $3–$10
         min_cents = int(float(self.options.get("min", 3)) * 100)
         max_cents = int(float(self.options.get("max", 10)) * 100)
-        cents = random.randint(min_cents, max_cents)
+        cents = context.rng.randint(min_cents, max_cents)
         f = _Fraction(cents, 100)
         return f"{f.numerator}/{f.denominator}"
 
@@ -286,15 +331,15 @@ class PercentParameter(RandomParameter):
     default_format_type = "percent"
     COMMON_VALUES = [1, 5, 10, 12.5, 20, 25, 50]
 
-    def __init__(self, name, options):
-        super().__init__(name, "percent", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "percent", options, context)
 
     def generate(self, context):
         if self.options.get("common"):
-            pct = random.choice(self.COMMON_VALUES)
+            pct = context.rng.choice(self.COMMON_VALUES)
             f = _Fraction(str(pct)) / 100
             return f"{f.numerator}/{f.denominator}"
-        n = random.randint(int(self.options["min"]), int(self.options["max"]))
+        n = context.rng.randint(int(self.options["min"]), int(self.options["max"]))
         return f"{n}/100"
 
 
@@ -309,14 +354,17 @@ class ChoiceParameter(RandomParameter):
     The chosen value is stored as-is (int or float).
     """
 
-    def __init__(self, name, options):
-        super().__init__(name, "choice", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "choice", options, context)
 
     def generate(self, context):
         values = self.options.get("values", [])
         if not values:
             raise ValueError(f"ChoiceParameter '{self.name}' has an empty values list")
-        return random.choice(values)
+        return context.rng.choice(values)
+
+    def domain(self):
+        return list(self.options.get("values", [])) or None
 
 
 class NameParameter(RandomParameter):
@@ -326,20 +374,18 @@ class NameParameter(RandomParameter):
       student: { type: name }
 
     Multiple name parameters within the same template each receive a different
-    name. The pool is reset at the start of every render.
+    name. The pool belongs to the render context, so it starts fresh per render.
     """
 
-    _used_in_render: set = set()
-
-    def __init__(self, name, options):
-        super().__init__(name, "name", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "name", options, context)
 
     def generate(self, context):
-        available = [n for n in _NAMES if n not in NameParameter._used_in_render]
+        available = [n for n in _NAMES if n not in context.used_names]
         if not available:
             available = list(_NAMES)  # fallback: all 10 used, start over
-        chosen = random.choice(available)
-        NameParameter._used_in_render.add(chosen)
+        chosen = context.rng.choice(available)
+        context.used_names.add(chosen)
         return chosen
 
 
@@ -357,8 +403,8 @@ class ListParameter(RandomParameter):
     Use {{ data | sorted }} to display sorted, or {{ mode(data) }} etc.
     """
 
-    def __init__(self, name, options):
-        super().__init__(name, "list", options)
+    def __init__(self, name, options, context=None):
+        super().__init__(name, "list", options, context)
 
     SIZE_MAP = {
         "small":  (2, 9),
@@ -374,7 +420,7 @@ class ListParameter(RandomParameter):
         else:
             lo = int(self.options.get("min", 1))
             hi = int(self.options.get("max", 10))
-        values = [random.randint(lo, hi) for _ in range(count)]
+        values = [context.rng.randint(lo, hi) for _ in range(count)]
         if self.options.get("order", False):
             values.sort()
         return values
@@ -412,8 +458,7 @@ class ExprParameter(RandomParameter):
         """Evaluate the expression using already-generated param values."""
         from .expr import ExpressionNode
         try:
-            node = ExpressionNode(self._expr, param_objects)
-            result = node.evaluate()
+            result = ExpressionNode(self._expr, param_objects).evaluated_value
             # Convert sympy types to plain Python so the value is JSON-serialisable
             try:
                 f = float(result)
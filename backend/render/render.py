@@ -2,8 +2,10 @@ import yaml
 import yaml as _yaml
 import re
 from .expr import *
-
-EXPR_PATTERN = re.compile(r"{{(.*?)}}")
+from .compiled import EXPR_PATTERN, CompiledTemplate
+from .sampler import sample_parameters, _evaluate_rule
+from .context import RenderContext
+from .metrics import record_render
 
 
 def _inject_format_pipe(text, format_type):
@@ -16,144 +18,112 @@ def _inject_format_pipe(text, format_type):
     return EXPR_PATTERN.sub(repl, text)
 
 class Render:
-    def __init__(self, yaml_text):
-        self.yaml_text = yaml_text
-        self.template = yaml.safe_load(yaml_text)
+    def __init__(self, template, seed=None):
+        # template: YAML text, or a CompiledTemplate shared between renders
+        if not isinstance(template, CompiledTemplate):
+            template = CompiledTemplate(yaml.safe_load(template))
+        self.compiled = template
+        self.template = template.parsed
+
+        # Per-render state (RNG, name pool, expression memo), never shared
+        self.context = RenderContext(seed)
 
         # Filled during rendering
         self.param_objects = {}
+        self.attempts = 0
+        self.rule_errors = []
         self.substituted_yaml = None
         self.preview_yaml = None
 
     def render(self):
-        self._load_parameters()
-        self._substitute_expressions()
+        with self.context.timer("parameters"):
+            self._load_parameters()
+        with self.context.timer("substitution"):
+            self._substitute_expressions()
         return {
             "substituted_yaml": self.substituted_yaml,
             "preview": self.preview_yaml,
         }
 
     def _load_parameters(self):
-        from .param import NameParameter, ExprParameter
-        NameParameter._used_in_render = set()
-        param_specs = self.template.get("parameters", {})
+        param_specs = self.compiled.param_specs
         for name, spec in param_specs.items():
-            self.param_objects[name] = RandomParameter.from_yaml(name, spec)
-        # Second pass: resolve derived (expr) parameters in definition order.
-        # Each expr param must be defined after any params it references.
-        for name, param in self.param_objects.items():
-            if isinstance(param, ExprParameter):
-                param.resolve(self.param_objects)
+            self.param_objects[name] = RandomParameter.from_yaml(name, spec, self.context)
+        # Resolve derived (expr) parameters in definition order and bring the
+        # values into line with the validation rules. Each expr param must be
+        # defined after any params it references.
+        self.attempts, self.rule_errors = sample_parameters(self.compiled, self.param_objects, self.context)
 
     def _substitute_expressions(self):
-        # Deep copy the template for two different outputs
-        substituted = yaml.safe_load(self.yaml_text)
-        preview = yaml.safe_load(self.yaml_text)
-
-        def walk(node, formatter):
+        # One walk emits the raw and formatted trees together. walk() builds new
+        # containers, so the shared template tree is never mutated.
+        def walk(node):
             if isinstance(node, str):
-                return self._process_string(node, formatter)
+                return self._process_pair(node)
             if isinstance(node, list):
-                return [walk(item, formatter) for item in node]
+                pairs = [walk(item) for item in node]
+                return [r for r, _ in pairs], [f for _, f in pairs]
             if isinstance(node, dict):
-                return {k: walk(v, formatter) for k, v in node.items()}
-            return node
+                pairs = {k: walk(v) for k, v in node.items()}
+                return {k: r for k, (r, _) in pairs.items()}, {k: f for k, (_, f) in pairs.items()}
+            return node, node
 
-        self.substituted_yaml = walk(substituted, formatter="raw")
-        self.preview_yaml = walk(preview, formatter="formatted")
+        self.substituted_yaml, self.preview_yaml = walk(self.template)
 
-    def _process_string(self, text, formatter):
-        def repl(match):
-            expr_text = match.group(1).strip()
+    def _expression(self, expr_text):
+        """(raw, formatted) output of one {{ }} expression, evaluated once per render."""
+        outputs = self.context.memo.get(expr_text)
+        if outputs is None:
             try:
                 node = ExpressionNode(expr_text, self.param_objects)
             except Exception as e:
                 raise ValueError(f"Error evaluating expression '{{{{ {expr_text} }}}}': {e}") from e
-            value = node.evaluate()
-
-            if formatter == "raw":
-                return str(value)
-            else:
-                return node.format()
-
-        return EXPR_PATTERN.sub(repl, text)
-
+            outputs = (str(node.evaluated_value), node.output)
+            self.context.memo[expr_text] = outputs
+        return outputs
+
+    def _process_pair(self, text):
+        if "{{" not in text:
+            return text, text
+        raw, formatted = [], []
+        pos = 0
+        for match in EXPR_PATTERN.finditer(text):
+            raw_value, formatted_value = self._expression(match.group(1).strip())
+            raw.append(text[pos:match.start()])
+            raw.append(raw_value)
+            formatted.append(text[pos:match.start()])
+            formatted.append(formatted_value)
+            pos = match.end()
+        raw.append(text[pos:])
+        formatted.append(text[pos:])
+        return "".join(raw), "".join(formatted)
 
-def _evaluate_rule(expr, params):
-    from math import gcd
-    from fractions import Fraction
-    from ..maths.fractions import denominator, numerator
-    # Allow {{ a }} style in addition to bare variable names
-    expr = EXPR_PATTERN.sub(lambda m: m.group(1).strip(), expr)
-    # Convert string fraction values (e.g. "3/5") to numeric so comparisons work
-    numeric_params = {}
-    for k, v in params.items():
-        if isinstance(v, str):
-            try:
-                numeric_params[k] = Fraction(v)
-            except (ValueError, ZeroDivisionError):
-                numeric_params[k] = v
-        else:
-            numeric_params[k] = v
-    from .expr import _LIST_CONTEXT
-    ctx = {"__builtins__": {}, "gcd": gcd, "denominator": denominator, "numerator": numerator}
-    ctx.update(_LIST_CONTEXT)
-    # List parameters must be in globals (ctx), not locals, so that list
-    # comprehensions inside the rule expression can access them (Python 3
-    # comprehensions have their own scope and cannot see eval() locals).
-    scalar_params = {}
-    for k, v in numeric_params.items():
-        if isinstance(v, list):
-            ctx[k] = v
-        else:
-            scalar_params[k] = v
-    return bool(eval(expr, ctx, scalar_params))
+    def _process_string(self, text, formatter):
+        index = 0 if formatter == "raw" else 1
+        return EXPR_PATTERN.sub(lambda m: self._expression(m.group(1).strip())[index], text)
 
 
-def render_template_preview(parsed):
+def render_template_preview(parsed, debug_yaml=True, seed=None, metrics=False):
     """
     Drop-in replacement for rendering.render_template_preview.
     Uses the Render class for parameter generation and expression substitution.
+    `parsed` is a template dict or a CompiledTemplate (see compiled.get_compiled_template).
+    With debug_yaml=False the substituted_yaml debug dump is skipped and left empty.
+    `seed` fixes the random choices; the seed used is returned, so passing it
+    back re-renders the same question.
+    Stage timings always go to the process histograms (see metrics.py); with
+    metrics=True they are also returned in a `metrics` block.
     Returns: {question, answers, solution, diagram_svg, diagram_code,
-               substituted_yaml, params, errors}
+               substituted_yaml, params, errors, multi_step, attempts, seed[, metrics]}
     """
-    yaml_text = _yaml.dump(parsed)
-
-    validation = parsed.get("validation", {})
-    rules = validation.get("rules", []) if isinstance(validation, dict) else []
-
-    MAX_ATTEMPTS = 10
-    last_error = None
-    renderer = None
-    collected_errors = []
-
-    for attempt in range(MAX_ATTEMPTS):
-        renderer = Render(yaml_text)
-        renderer.render()
+    compiled = parsed if isinstance(parsed, CompiledTemplate) else CompiledTemplate(parsed)
 
-        params = {name: p.value for name, p in renderer.param_objects.items()}
-
-        rule_failed = False
-        for rule in rules:
-            check = rule.get("check")
-            message = rule.get("message", "Validation rule failed")
-            try:
-                if not _evaluate_rule(check, params):
-                    rule_failed = True
-                    last_error = message
-                    break
-            except Exception as e:
-                rule_failed = True
-                last_error = f"Rule error: {e}"
-                collected_errors.append(last_error)
-                break
-
-        if not rule_failed:
-            break
-    else:
-        raise ValueError(
-            f"Parameter generation failed after {MAX_ATTEMPTS} attempts: {last_error}"
-        )
+    # Parameters are sampled to satisfy validation.rules before anything is
+    # substituted; raises ParameterGenerationError if that is impossible.
+    renderer = Render(compiled, seed)
+    renderer.render()
+    timer = renderer.context.timer
+    collected_errors = list(renderer.rule_errors)
 
     preview = renderer.preview_yaml or {}
     raw_sub = renderer.substituted_yaml or {}
@@ -184,273 +154,285 @@ def render_template_preview(parsed):
     if not isinstance(preview_answers, list):
         preview_answers = []
 
-    answers = []
-    for i, ans in enumerate(raw_answers):
-        if not isinstance(ans, dict):
-            answers.append(ans)
-            continue
-
-        # Graph answer: answer contains a diagram spec dict or code string.
-        if "diagram" in ans:
-            diagram_spec = ans["diagram"]
-            if isinstance(diagram_spec, dict):
-                diagram_type = diagram_spec.get("type", "Cartesian")
-                parts = []
-                for k, v in diagram_spec.items():
-                    if k == "type":
-                        continue
-                    parts.append(f'eq: "{v}"' if k == "eq" else f"{k}: {v}")
-                code = f'{diagram_type}({", ".join(parts)})'
-            else:
-                code = str(diagram_spec)
-            from ..diagram.engine import render_diagram_from_code
-            svg = render_diagram_from_code(code)
-            answers.append({"diagram_svg": svg, "correct": ans.get("correct", False)})
-            continue
-
-        # New format: answer has a text field.
-        # If a `format` key is present, inject it as a pipe into each {{ }} expression
-        # and re-process through the renderer so the correct formatter is applied.
-        # Otherwise fall back to the already-walked preview value.
-        if "text" in ans:
-            format_type = ans.get("format")
-            raw_text = str(ans.get("text", ""))
-            if format_type:
-                piped = _inject_format_pipe(raw_text, format_type)
-                if "{{" in piped:
-                    # Expressions still present — process through renderer with pipe injected
-                    formatted_text = renderer._process_string(piped, "formatted")
+    with timer("answers"):
+        answers = []
+        for i, ans in enumerate(raw_answers):
+            if not isinstance(ans, dict):
+                answers.append(ans)
+                continue
+
+            # Graph answer: answer contains a diagram spec dict or code string.
+            if "diagram" in ans:
+                diagram_spec = ans["diagram"]
+                if isinstance(diagram_spec, dict):
+                    diagram_type = diagram_spec.get("type", "Cartesian")
+                    parts = []
+                    for k, v in diagram_spec.items():
+                        if k == "type":
+                            continue
+                        parts.append(f'eq: "{v}"' if k == "eq" else f"{k}: {v}")
+                    code = f'{diagram_type}({", ".join(parts)})'
                 else:
-                    # Already substituted by walk() — apply formatter directly to the value
-                    from fractions import Fraction
-                    from .format import FORMAT_REGISTRY
-                    formatter_cls = FORMAT_REGISTRY.get(format_type)
-                    if formatter_cls:
-                        try:
-                            val = Fraction(raw_text) if "/" in raw_text else float(raw_text)
-                            formatted_text = formatter_cls().format(val)
-                        except Exception:
-                            formatted_text = raw_text
+                    code = str(diagram_spec)
+                from ..diagram.engine import render_diagram_from_code
+                with timer("diagram"):
+                    svg = render_diagram_from_code(code)
+                answers.append({"diagram_svg": svg, "correct": ans.get("correct", False)})
+                continue
+
+            # New format: answer has a text field.
+            # If a `format` key is present, inject it as a pipe into each {{ }} expression
+            # and re-process through the renderer so the correct formatter is applied.
+            # Otherwise fall back to the already-walked preview value.
+            if "text" in ans:
+                format_type = ans.get("format")
+                raw_text = str(ans.get("text", ""))
+                if format_type:
+                    piped = _inject_format_pipe(raw_text, format_type)
+                    if "{{" in piped:
+                        # Expressions still present — process through renderer with pipe injected
+                        formatted_text = renderer._process_string(piped, "formatted")
                     else:
-                        formatted_text = raw_text
-            else:
-                preview_ans = preview_answers[i] if i < len(preview_answers) else {}
-                formatted_text = str(preview_ans.get("text", raw_text)) if isinstance(preview_ans, dict) else raw_text
-            answers.append({"text": formatted_text, "correct": ans.get("correct", False)})
-            continue
-
-        # Old format: answer value is stored under a type key; Render has already
-        # substituted {{ }} expressions so the value is a number string like "12" or "3/7".
-        if "logic" in ans:
-            try:
-                is_true = _evaluate_rule(ans["logic"], params)
-            except Exception:
-                is_true = False
-            answers.append({"text": ans.get("text", ""), "correct": ans.get("correct", False) and is_true})
-            continue
-
-        if "input" in ans:
-            text = str(ans["input"])
-            answer_obj = {"text": text, "correct": ans.get("correct", False), "input_type": "text"}
-            if ans.get("format_instruction"):
-                answer_obj["format_instruction"] = str(ans["format_instruction"])
-            if ans.get("answer_format"):
-                answer_obj["answer_format"] = str(ans["answer_format"])
-            if ans.get("tolerance") is not None:
-                answer_obj["tolerance"] = float(ans["tolerance"])
-            answers.append(answer_obj)
-            continue
-
-        if "int" in ans:
-            try:
-                text = str(evaluate_int_expression(str(ans["int"]), {}))
-            except Exception:
-                text = str(ans["int"])
-            answers.append({"text": text, "correct": ans.get("correct", False)})
-            continue
+                        # Already substituted by walk() — apply formatter directly to the value
+                        from fractions import Fraction
+                        from .format import FORMAT_REGISTRY
+                        formatter_cls = FORMAT_REGISTRY.get(format_type)
+                        if formatter_cls:
+                            try:
+                                val = Fraction(raw_text) if "/" in raw_text else float(raw_text)
+                                formatted_text = formatter_cls().format(val)
+                            except Exception:
+                                formatted_text = raw_text
+                        else:
+                            formatted_text = raw_text
+                else:
+                    preview_ans = preview_answers[i] if i < len(preview_answers) else {}
+                    formatted_text = str(preview_ans.get("text", raw_text)) if isinstance(preview_ans, dict) else raw_text
+                answers.append({"text": formatted_text, "correct": ans.get("correct", False)})
+                continue
+
+            # Old format: answer value is stored under a type key; Render has already
+            # substituted {{ }} expressions so the value is a number string like "12" or "3/7".
+            if "logic" in ans:
+                try:
+                    is_true = _evaluate_rule(ans["logic"], params)
+                except Exception:
+                    is_true = False
+                answers.append({"text": ans.get("text", ""), "correct": ans.get("correct", False) and is_true})
+                continue
+
+            if "input" in ans:
+                text = str(ans["input"])
+                answer_obj = {"text": text, "correct": ans.get("correct", False), "input_type": "text"}
+                if ans.get("format_instruction"):
+                    answer_obj["format_instruction"] = str(ans["format_instruction"])
+                if ans.get("answer_format"):
+                    answer_obj["answer_format"] = str(ans["answer_format"])
+                if ans.get("tolerance") is not None:
+                    answer_obj["tolerance"] = float(ans["tolerance"])
+                answers.append(answer_obj)
+                continue
+
+            if "int" in ans:
+                try:
+                    text = str(evaluate_int_expression(str(ans["int"]), {}))
+                except Exception:
+                    text = str(ans["int"])
+                answers.append({"text": text, "correct": ans.get("correct", False)})
+                continue
 
-        if "dec_1" in ans:
-            try:
-                text = str(evaluate_dec_expression(str(ans["dec_1"]), {}, 1))
-            except Exception:
-                text = str(ans["dec_1"])
-            answers.append({"text": text, "correct": ans.get("correct", False)})
-            continue
+            if "dec_1" in ans:
+                try:
+                    text = str(evaluate_dec_expression(str(ans["dec_1"]), {}, 1))
+                except Exception:
+                    text = str(ans["dec_1"])
+                answers.append({"text": text, "correct": ans.get("correct", False)})
+                continue
 
-        if "dec_2" in ans:
-            try:
-                text = str(evaluate_dec_expression(str(ans["dec_2"]), {}, 2))
-            except Exception:
-                text = str(ans["dec_2"])
-            answers.append({"text": text, "correct": ans.get("correct", False)})
-            continue
+            if "dec_2" in ans:
+                try:
+                    text = str(evaluate_dec_expression(str(ans["dec_2"]), {}, 2))
+                except Exception:
+                    text = str(ans["dec_2"])
+                answers.append({"text": text, "correct": ans.get("correct", False)})
+                continue
 
-        if "fraction" in ans:
-            try:
-                val = evaluate_fraction_expression(str(ans["fraction"]), {})
-                text = FractionFormat().format(val)
-            except Exception:
-                text = str(ans["fraction"])
-            answers.append({"text": text, "correct": ans.get("correct", False)})
-            continue
-
-        answers.append(ans)
-
-    seen = set()
-    deduped_answers = []
-    for ans in answers:
-        if isinstance(ans, dict):
-            # Diagram answers have no text — use a unique sentinel per index so
-            # they are never collapsed by the deduplication logic.
-            key = ans.get("text") if "text" in ans else id(ans)
-        else:
-            key = str(ans)
-        if key not in seen:
-            seen.add(key)
-            deduped_answers.append(ans)
+            if "fraction" in ans:
+                try:
+                    val = evaluate_fraction_expression(str(ans["fraction"]), {})
+                    text = FractionFormat().format(val)
+                except Exception:
+                    text = str(ans["fraction"])
+                answers.append({"text": text, "correct": ans.get("correct", False)})
+                continue
+
+            answers.append(ans)
+
+        seen = set()
+        deduped_answers = []
+        for ans in answers:
+            if isinstance(ans, dict):
+                # Diagram answers have no text — use a unique sentinel per index so
+                # they are never collapsed by the deduplication logic.
+                key = ans.get("text") if "text" in ans else id(ans)
+            else:
+                key = str(ans)
+            if key not in seen:
+                seen.add(key)
+                deduped_answers.append(ans)
 
     # Diagram
-    diagram_code = preview.get("diagram", "")
-    svg = ""
-    if isinstance(diagram_code, str) and diagram_code.strip() and diagram_code.strip().lower() != "none":
-        try:
-            from ..diagram.engine import render_diagram_from_code
-            svg = render_diagram_from_code(diagram_code)
-        except Exception as e:
-            collected_errors.append(f"Diagram error: {e}")
+    with timer("diagram"):
+        diagram_code = preview.get("diagram", "")
+        svg = ""
+        if compiled.diagram_svg and diagram_code == compiled.static_diagram:
+            svg = compiled.diagram_svg
+        elif isinstance(diagram_code, str) and diagram_code.strip() and diagram_code.strip().lower() != "none":
+            try:
+                from ..diagram.engine import render_diagram_from_code
+                svg = render_diagram_from_code(diagram_code)
+            except Exception as e:
+                collected_errors.append(f"Diagram error: {e}")
+                diagram_code = ""
+        else:
             diagram_code = ""
-    else:
-        diagram_code = ""
 
     # Multi-step AlgebraTable: pre-render one SVG per blank with its highlight active
-    multi_step = None
-    if diagram_code and diagram_code.strip().startswith("AlgebraTable") and "blanks:" in diagram_code:
-        try:
-            import re as _mre
-            from ..diagram import algebra_table as _at
-            from ..diagram.engine import render_diagram_from_code as _rdc
-            d = _at.parse(diagram_code)
-            if d and d.blanks:
-                # Get raw solution template (before param substitution) so we can
-                # re-render it with blank_x = each step's x value.
-                _raw = _yaml.safe_load(yaml_text)
-                _sol_raw = _raw.get("solution", "")
-                _sol_tmpl = (
-                    _sol_raw.get("text", "") if isinstance(_sol_raw, dict)
-                    else (str(_sol_raw) if _sol_raw else "")
-                )
-
-                steps = []
-                for i, bx in enumerate(d.blanks):
-                    # Only keep blanks from this step onward; earlier cells show their value
-                    remaining = ",".join(str(b) for b in d.blanks[i:])
-                    step_code = _mre.sub(r'\bblanks:\s*"[^"]*"', f'blanks: "{remaining}"', diagram_code)
-                    if _mre.search(r'\bhighlight:\s*-?\d+', step_code):
-                        step_code = _mre.sub(r'\bhighlight:\s*-?\d+', f'highlight: {bx}', step_code)
-                    else:
-                        step_code = step_code.rstrip(')') + f', highlight: {bx})'
-                    step_svg = _rdc(step_code)
-
-                    answer_val = _at._eval_expr(d.expr, bx)
-                    if answer_val is None:
-                        answer_str = ""
-                    elif isinstance(answer_val, float) and answer_val == int(answer_val):
-                        answer_str = str(int(answer_val))
-                    else:
-                        answer_str = str(answer_val)
-
-                    # Render solution with blank_x substituted as a literal for this step.
-                    # We inject the numeric value directly into {{ }} expressions so we
-                    # don't need to mutate param objects.
-                    step_solution = ""
-                    if _sol_tmpl:
+    with timer("multi_step"):
+        multi_step = None
+        if diagram_code and diagram_code.strip().startswith("AlgebraTable") and "blanks:" in diagram_code:
+            try:
+                import re as _mre
+                from dataclasses import replace as _replace
+                from ..diagram import algebra_table as _at
+                from ..diagram.engine import parse_diagram, render_parsed
+                diagrams = parse_diagram(diagram_code)
+                table = next((i for i, item in enumerate(diagrams) if item[0] == "AlgebraTable"), None)
+                d = diagrams[table][2] if table is not None else None
+                if d and d.blanks:
+                    # Get raw solution template (before param substitution) so we can
+                    # re-render it with blank_x = each step's x value.
+                    _sol_raw = compiled.parsed.get("solution", "")
+                    _sol_tmpl = (
+                        _sol_raw.get("text", "") if isinstance(_sol_raw, dict)
+                        else (str(_sol_raw) if _sol_raw else "")
+                    )
+
+                    steps = []
+                    for i, bx in enumerate(d.blanks):
+                        # The whole diagram, with only the table's blanks from this step onward
+                        # (earlier cells show their value). The parsed lines are reused, so the
+                        # table's values are evaluated only once.
+                        frame = list(diagrams)
+                        frame[table] = (diagrams[table][0], diagrams[table][1],
+                                        _replace(d, blanks=d.blanks[i:], highlight=bx))
+                        step_svg = render_parsed(frame)
+
+                        answer_val = _at._eval_expr(d.expr, bx)
+                        if answer_val is None:
+                            answer_str = ""
+                        elif isinstance(answer_val, float) and answer_val == int(answer_val):
+                            answer_str = str(int(answer_val))
+                        else:
+                            answer_str = str(answer_val)
+
+                        # Render solution with blank_x substituted as a literal for this step.
+                        # We inject the numeric value directly into {{ }} expressions so we
+                        # don't need to mutate param objects.
+                        step_solution = ""
+                        if _sol_tmpl:
+                            try:
+                                def _inject_blank_x(tmpl, val):
+                                    return _mre.sub(
+                                        r'\{\{(.*?)\}\}',
+                                        lambda m: '{{' + _mre.sub(r'\bblank_x\b', str(val), m.group(1)) + '}}',
+                                        tmpl,
+                                    )
+                                step_solution = renderer._process_string(_inject_blank_x(_sol_tmpl, bx), "formatted")
+                            except Exception as _e:
+                                collected_errors.append(f"Multi-step solution error (blank_x={bx}): {_e}")
+                                step_solution = ""
+
+                        steps.append({"svg": step_svg, "answer": answer_str, "solution": step_solution})
+                    multi_step = {"steps": steps}
+            except Exception:
+                pass
+
+        # Multi-part questions via question.parts (any diagram type)
+        if not multi_step:
+            preview_parts = []
+            if isinstance(question_block, dict):
+                preview_parts = question_block.get("parts", [])
+                if not isinstance(preview_parts, list):
+                    preview_parts = []
+            # Use raw_sub for answers (unformatted, for exact comparison)
+            raw_q_block = raw_sub.get("question", {})
+            raw_parts = raw_q_block.get("parts", []) if isinstance(raw_q_block, dict) else []
+
+            if preview_parts:
+                part_steps = []
+                for i, part in enumerate(preview_parts):
+                    if not isinstance(part, dict):
+                        continue
+                    raw_part = raw_parts[i] if i < len(raw_parts) and isinstance(raw_parts[i], dict) else {}
+
+                    # Compute raw answer: prefer value from raw substitution walk,
+                    # then fall back to re-evaluating the answer template directly from param objects.
+                    # Accept both "answer" (canonical) and "answers" (common typo).
+                    raw_ans = str(
+                        raw_part.get("answer", raw_part.get("answers",
+                        part.get("answer", part.get("answers", ""))))
+                    )
+                    if "{{" in raw_ans:
+                        # Substitution didn't fully expand — re-process directly
                         try:
-                            def _inject_blank_x(tmpl, val):
-                                return _mre.sub(
-                                    r'\{\{(.*?)\}\}',
-                                    lambda m: '{{' + _mre.sub(r'\bblank_x\b', str(val), m.group(1)) + '}}',
-                                    tmpl,
-                                )
-                            step_solution = renderer._process_string(_inject_blank_x(_sol_tmpl, bx), "formatted")
-                        except Exception as _e:
-                            collected_errors.append(f"Multi-step solution error (blank_x={bx}): {_e}")
-                            step_solution = ""
-
-                    steps.append({"svg": step_svg, "answer": answer_str, "solution": step_solution})
-                multi_step = {"steps": steps}
-        except Exception:
-            pass
-
-    # Multi-part questions via question.parts (any diagram type)
-    if not multi_step:
-        preview_parts = []
-        if isinstance(question_block, dict):
-            preview_parts = question_block.get("parts", [])
-            if not isinstance(preview_parts, list):
-                preview_parts = []
-        # Use raw_sub for answers (unformatted, for exact comparison)
-        raw_q_block = raw_sub.get("question", {})
-        raw_parts = raw_q_block.get("parts", []) if isinstance(raw_q_block, dict) else []
-
-        if preview_parts:
-            part_steps = []
-            for i, part in enumerate(preview_parts):
-                if not isinstance(part, dict):
-                    continue
-                raw_part = raw_parts[i] if i < len(raw_parts) and isinstance(raw_parts[i], dict) else {}
-
-                # Compute raw answer: prefer value from raw substitution walk,
-                # then fall back to re-evaluating the answer template directly from param objects.
-                # Accept both "answer" (canonical) and "answers" (common typo).
-                raw_ans = str(
-                    raw_part.get("answer", raw_part.get("answers",
-                    part.get("answer", part.get("answers", ""))))
-                )
-                if "{{" in raw_ans:
-                    # Substitution didn't fully expand — re-process directly
-                    try:
-                        raw_ans = renderer._process_string(raw_ans, "raw")
-                    except Exception:
-                        pass
-                # Normalise: convert "14.0" or sympy float strings → clean int/decimal
-                try:
-                    _f = float(raw_ans)
-                    raw_ans = str(int(_f)) if _f == int(_f) else f"{_f:g}"
-                except (ValueError, TypeError):
-                    pass
-
-                step = {
-                    "svg": svg,
-                    "question": str(part.get("text", "")),
-                    "answer": raw_ans,
-                    "solution": str(part.get("solution", "")),
-                }
-                tol = part.get("tolerance")
-                if tol is not None:
+                            raw_ans = renderer._process_string(raw_ans, "raw")
+                        except Exception:
+                            pass
+                    # Normalise: convert "14.0" or sympy float strings → clean int/decimal
                     try:
-                        step["tolerance"] = float(tol)
-                    except (TypeError, ValueError):
+                        _f = float(raw_ans)
+                        raw_ans = str(int(_f)) if _f == int(_f) else f"{_f:g}"
+                    except (ValueError, TypeError):
                         pass
-                part_steps.append(step)
-            if part_steps:
-                multi_step = {"steps": part_steps}
+
+                    step = {
+                        "svg": svg,
+                        "question": str(part.get("text", "")),
+                        "answer": raw_ans,
+                        "solution": str(part.get("solution", "")),
+                    }
+                    tol = part.get("tolerance")
+                    if tol is not None:
+                        try:
+                            step["tolerance"] = float(tol)
+                        except (TypeError, ValueError):
+                            pass
+                    part_steps.append(step)
+                if part_steps:
+                    multi_step = {"steps": part_steps}
 
     # Build debug substituted_yaml string
-    debug = {
-        "parameters": params,
-        "question": question_text,
-        "solution": solution_text,
-        "answers": raw_answers,
-        "diagram": preview.get("diagram", {}),
-    }
-    if multi_step:
-        debug["multi_step_answers"] = [
-            {"question": s.get("question", ""), "answer": s.get("answer", "")}
-            for s in multi_step.get("steps", [])
-        ]
-    substituted_yaml = _yaml.dump(debug, sort_keys=False)
-
-    return {
+    with timer("debug_yaml"):
+        debug = {
+            "parameters": params,
+            "question": question_text,
+            "solution": solution_text,
+            "answers": raw_answers,
+            "diagram": preview.get("diagram", {}),
+        }
+        if multi_step:
+            debug["multi_step_answers"] = [
+                {"question": s.get("question", ""), "answer": s.get("answer", "")}
+                for s in multi_step.get("steps", [])
+            ]
+        substituted_yaml = _yaml.dump(debug, sort_keys=False) if debug_yaml else ""
+
+
+    stages_ms = {stage: seconds * 1000 for stage, seconds in renderer.context.timings.items()}
+    record_render(compiled.template_id or compiled.content_hash or "inline", stages_ms)
+
+    result = {
         "question": question_text,
         "answers": deduped_answers,
         "solution": solution_text,
@@ -460,4 +442,11 @@ def render_template_preview(parsed):
         "params": params,
         "errors": collected_errors,
         "multi_step": multi_step,
-    }
\ No newline at end of file
+        "attempts": renderer.attempts,
+        "seed": renderer.context.seed,
+    }
+    if metrics:
+        result["metrics"] = {f"{stage}_ms": round(ms, 3) for stage, ms in stages_ms.items()}
+        result["metrics"]["total_ms"] = round(sum(stages_ms.values()), 3)
+        result["metrics"]["rule_attempts"] = renderer.attempts
+    return result
\ No newline at end of file
@@ -0,0 +1,268 @@
+import re
+from fractions import Fraction
+from itertools import product
+
+from .compiled import EXPR_PATTERN
+from .param import ExprParameter, LiteralParameter
+
+# Resamples allowed before a template is reported as failing its rules.
+MAX_ATTEMPTS = 100
+# Joint domains up to this many combinations are enumerated exactly.
+ENUMERATE_LIMIT = 10000
+# Failures of one rule before resampling moves on to its next-earlier input.
+RETRIES_PER_INPUT = 3
+
+
+class ParameterGenerationError(ValueError):
+    """No parameter values satisfying the validation rules were found."""
+
+
+_RULE_GLOBALS = None
+
+
+def _rule_globals():
+    global _RULE_GLOBALS
+    if _RULE_GLOBALS is None:
+        from math import gcd
+        from ..maths.fractions import denominator, numerator
+        from .expr import _LIST_CONTEXT
+        ctx = {"__builtins__": {}, "gcd": gcd, "denominator": denominator, "numerator": numerator}
+        ctx.update(_LIST_CONTEXT)
+        # Assigned only once complete, so a concurrent render never sees a partial dict
+        _RULE_GLOBALS = ctx
+    return _RULE_GLOBALS
+
+
+def _evaluate_rule(expr, params):
+    # Accept a pre-compiled code object (see compiled.compile_rule) or rule text.
+    # Allow {{ a }} style in addition to bare variable names
+    if isinstance(expr, str):
+        expr = EXPR_PATTERN.sub(lambda m: m.group(1).strip(), expr)
+    ctx = _rule_globals()
+    # List parameters must be in globals (ctx), not locals, so that list
+    # comprehensions inside the rule expression can access them (Python 3
+    # comprehensions have their own scope and cannot see eval() locals).
+    scalar_params = {}
+    for k, v in params.items():
+        if isinstance(v, str):
+            # Convert string fraction values (e.g. "3/5") to numeric so comparisons work
+            try:
+                v = Fraction(v)
+            except (ValueError, ZeroDivisionError):
+                pass
+        if isinstance(v, list):
+            if ctx is _RULE_GLOBALS:
+                ctx = dict(ctx)
+            ctx[k] = v
+        else:
+            scalar_params[k] = v
+    return bool(eval(expr, ctx, scalar_params))
+
+
+class Rule:
+    """A validation rule with the parameters it reads.
+
+    `point` is the position (in definition order) of the last parameter the
+    rule reads, i.e. the earliest moment it can be checked. `inputs` are the
+    random parameters that decide its outcome, latest first.
+    """
+
+    def __init__(self, check, message, text, position, depends_on):
+        self.check = check
+        self.message = message
+        self.names = set(re.findall(r"\w+", str(text))) & position.keys()
+        self.point = max((position[n] for n in self.names), default=-1)
+        inputs = set()
+        for name in self.names:
+            inputs |= depends_on[name]
+        self.inputs = sorted(inputs, key=position.get, reverse=True)
+
+    def __str__(self):
+        return f"Rule {self.message} (point {self.point}, inputs {self.inputs})"
+
+
+class Sampler:
+    """Generates parameter values that satisfy a template's validation rules.
+
+    Each rule is checked as soon as its parameters are bound, and a failure
+    resamples only that rule's inputs rather than the whole parameter set.
+    When every rule reads plain parameters with small finite domains, the
+    valid combinations are enumerated once per compiled template and one is
+    picked uniformly, which matches rejection sampling without the rejections.
+    """
+
+    def __init__(self, compiled, param_objects, context):
+        self.compiled = compiled
+        self.params = param_objects
+        self.context = context
+        self.order = list(param_objects)
+        self.position = {name: i for i, name in enumerate(self.order)}
+        self.attempts = 1
+        self.errors = []
+        self.last_error = None
+
+        # Random parameters each parameter's value depends on
+        self.depends_on = {}
+        for name, param in param_objects.items():
+            if isinstance(param, ExprParameter):
+                refs = set(re.findall(r"\w+", param._expr)) & self.depends_on.keys()
+                self.depends_on[name] = set().union(*(self.depends_on[r] for r in refs))
+            elif isinstance(param, LiteralParameter):
+                self.depends_on[name] = set()
+            else:
+                self.depends_on[name] = {name}
+
+        self.rules = [
+            Rule(check, message, text, self.position, self.depends_on)
+            for (check, message), text in zip(compiled.rules, compiled.rule_texts)
+        ]
+
+    def sample(self):
+        if not self.rules:
+            self._resolve_from(0)
+            return
+        if not self._sample_enumerated():
+            self._sample_sequential()
+
+    def _values(self, names):
+        return {name: self.params[name].value for name in names}
+
+    def _passes(self, rule, values):
+        try:
+            with self.context.timer("rules"):
+                passed = _evaluate_rule(rule.check, values)
+            if passed:
+                return True
+            self.last_error = rule.message
+        except Exception as e:
+            self.last_error = f"Rule error: {e}"
+            if self.last_error not in self.errors:
+                self.errors.append(self.last_error)
+        return False
+
+    def _fail(self):
+        raise ParameterGenerationError(
+            f"Parameter generation failed after {self.attempts} attempts: {self.last_error}"
+        )
+
+    def _resolve_from(self, start):
+        for name in self.order[start:]:
+            param = self.params[name]
+            if isinstance(param, ExprParameter):
+                param.resolve(self.params)
+
+    # ----------- Exact enumeration ------------------
+
+    def _enumeration_domains(self):
+        """{name: domain} for the rules' inputs, or None if they cannot be enumerated."""
+        inputs = set()
+        for rule in self.rules:
+            if any(isinstance(self.params[n], ExprParameter) for n in rule.names):
+                return None
+            inputs |= set(rule.inputs)
+        domains = {}
+        size = 1
+        for name in sorted(inputs, key=self.position.get):
+            domain = self.params[name].domain()
+            if not domain:
+                return None
+            size *= len(domain)
+            if size > ENUMERATE_LIMIT:
+                return None
+            domains[name] = domain
+        return domains
+
+    def _valid_combinations(self):
+        """(names, valid value tuples) cached on the compiled template, or None."""
+        cache = self.compiled.sampling_cache
+        if "combinations" in cache:
+            return cache["combinations"]
+
+        domains = self._enumeration_domains()
+        result = None
+        if domains is not None:
+            names = list(domains)
+            fixed = {n: self.params[n].value for rule in self.rules for n in rule.names if n not in domains}
+            valid = []
+            for combo in product(*domains.values()):
+                values = dict(fixed)
+                values.update(zip(names, combo))
+                if all(self._passes(rule, values) for rule in self.rules):
+                    valid.append(combo)
+            # A rule that raised explains an empty result better than one that was False
+            result = (names, valid, self.errors[-1] if self.errors else self.last_error)
+        cache["combinations"] = result
+        return result
+
+    def _sample_enumerated(self):
+        combinations = self._valid_combinations()
+        if combinations is None:
+            return False
+        names, valid, last_error = combinations
+        if not valid:
+            raise ParameterGenerationError(
+                f"Parameter generation failed: no values of {', '.join(names)} "
+                f"satisfy the validation rules: {last_error}"
+            )
+        for name, value in zip(names, self.context.rng.choice(valid)):
+            self.params[name].value = value
+        self._resolve_from(0)
+        return True
+
+    # ----------- Sequential resampling ------------------
+
+    def _sample_sequential(self):
+        by_point = {}
+        for rule in self.rules:
+            by_point.setdefault(rule.point, []).append(rule)
+
+        # Rules that read no parameters can never be fixed by resampling
+        for rule in by_point.pop(-1, []):
+            if not self._passes(rule, {}):
+                self._fail()
+
+        failures = {}
+        stale = set()   # random parameters to draw again when the cursor reaches them
+        i = 0
+        while i < len(self.order):
+            name = self.order[i]
+            param = self.params[name]
+            if isinstance(param, ExprParameter):
+                param.resolve(self.params)
+            elif name in stale:
+                param.value = param.generate(self.context)
+                stale.discard(name)
+
+            failed = next(
+                (rule for rule in by_point.get(i, []) if not self._passes(rule, self._values(rule.names))),
+                None,
+            )
+            if failed is None:
+                i += 1
+                continue
+
+            self.attempts += 1
+            if self.attempts > MAX_ATTEMPTS or not failed.inputs:
+                self._fail()
+
+            # Resample the latest input first, moving to earlier ones (and
+            # finally all of them together) if that keeps failing.
+            count = failures[failed] = failures.get(failed, 0) + 1
+            step = (count - 1) // RETRIES_PER_INPUT
+            if step < len(failed.inputs):
+                targets = [failed.inputs[step]]
+            else:
+                targets = failed.inputs
+            stale.update(targets)
+            i = min(self.position[t] for t in targets)
+
+
+def sample_parameters(compiled, param_objects, context):
+    """Bring freshly generated `param_objects` into line with the template's rules.
+
+    Returns (attempts, rule errors). Raises ParameterGenerationError if no
+    valid values are found.
+    """
+    sampler = Sampler(compiled, param_objects, context)
+    sampler.sample()
+    return sampler.attempts, sampler.errors
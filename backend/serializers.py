@@ -8,7 +8,7 @@ class TemplateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Template
-        fields = "__all__"
+        exclude = ["diagram_svg"]   # server-rendered; can be large
         read_only_fields = ['id']
 
 class SkillSerializer(serializers.ModelSerializer):
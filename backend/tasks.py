@@ -1,5 +1,6 @@
 from celery import shared_task
 from .message import process_sms_jobs
+from .question_pool import refill_question_pools
 
 @shared_task
 def run_sms_jobs():
@@ -9,4 +10,12 @@ def run_sms_jobs():
         print("RUN_SMS_JOBS: ERROR", e)
         raise
 
+@shared_task
+def refill_question_pools_task():
+    try:
+        return refill_question_pools()
+    except Exception as e:
+        print("REFILL_QUESTION_POOLS: ERROR", e)
+        raise
+
 
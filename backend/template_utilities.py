@@ -1,11 +1,68 @@
 from .models import *
 import yaml
 import traceback as _traceback
-from .render import render_template_preview
+from .render import render_template_preview, get_compiled_template, ParameterGenerationError
 from .validation import *
 from rest_framework.response import Response
+from django.core.cache import cache
 
 import re as _re
+import time
+import random
+from .render.metrics import record_stage
+
+# Seeded renders are deterministic, so they are shared through the Django cache.
+RENDER_CACHE_SECONDS = 60 * 60
+
+
+def render_seeded(compiled, seed=None, debug_yaml=True, metrics=False):
+    """render_template_preview, cached by (template content, seed) when a seed is given.
+
+    Requests for metrics always render, so the timings are real.
+    """
+    if seed is None or not compiled.content_hash or metrics:
+        return render_template_preview(compiled, debug_yaml=debug_yaml, seed=seed, metrics=metrics)
+    key = f"render:{compiled.content_hash}:{seed}:{int(debug_yaml)}"
+    preview = cache.get(key)
+    if preview is None:
+        preview = render_template_preview(compiled, debug_yaml=debug_yaml, seed=seed)
+        cache.set(key, preview, RENDER_CACHE_SECONDS)
+    return preview
+
+
+# The seed of each question served to a student, so the answer can be
+# recorded with it without the client having to send it back.
+SERVED_SEED_SECONDS = 24 * 60 * 60
+
+
+def _served_seed_key(student_id, template_id):
+    return f"served_seed:{student_id}:{template_id}"
+
+
+def remember_served_seed(student_id, template_id, preview):
+    """Keep the seed `preview` was rendered with, for the student's next answer."""
+    if preview.get("seed") is not None:
+        cache.set(_served_seed_key(student_id, template_id), preview["seed"], SERVED_SEED_SECONDS)
+
+
+def served_seed(student_id, template_id):
+    """The seed of the last question from the template served to the student, or None."""
+    return cache.get(_served_seed_key(student_id, template_id))
+
+
+def parse_seed(value):
+    """A seed from request data as an int, or None if absent or invalid."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_flag(value):
+    """A boolean from request data: true for True, 1, "1", "true", "yes" or "on"."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return value is True or value == 1
 
 def _fix_unquoted_diagram(content: str) -> str:
     """
@@ -171,9 +228,10 @@ def _fix_parameters_indentation(content: str) -> str:
     return '\n'.join(new_lines)
 
 
-def generate_preview_from_content(content: str):
+def generate_preview_from_content(content: str, seed=None, metrics=False):
     # 1. Parse YAML
     # print("Generate preview from content - 1")
+    start = time.perf_counter()
     content = _fix_unquoted_diagram(content)
     content = _fix_parameters_indentation(content)
     try:
@@ -208,7 +266,11 @@ def generate_preview_from_content(content: str):
     # 3. Render preview
     # print("Generate preview from content - 3")
     try:
-        preview = render_template_preview(parsed)
+        parse_ms = (time.perf_counter() - start) * 1000
+        record_stage("parse", parse_ms)
+        preview = render_template_preview(parsed, seed=seed, metrics=metrics)
+        if metrics:
+            preview["metrics"]["parse_ms"] = round(parse_ms, 3)
         if "substituted_yaml" not in preview:
             preview["substituted_yaml"] = yaml.safe_dump(preview.get("full_yaml", parsed))
         #
@@ -237,10 +299,29 @@ def generate_preview_from_content(content: str):
         }
 
 
-def generate_values_and_question(template_id: int):
+def render_knowledge_items(template_obj):
+    knowledge_items = []
+    for k in template_obj.knowledge_items.all():
+        # Static diagrams were rendered when the item was saved
+        svg = k.stored_diagram_svg()
+        if not svg and k.diagram and k.diagram.strip() and k.diagram.strip().lower() != "none":
+            try:
+                from .diagram.engine import render_diagram_from_code
+                svg = render_diagram_from_code(k.diagram)
+            except Exception:
+                pass
+        knowledge_items.append({
+            "id": k.id,
+            "title": k.title,
+            "text": k.text,
+            "text_2": k.text_2,
+            "diagram_svg": svg,
+        })
+    return knowledge_items
+
+
+def generate_values_and_question(template_id: int, debug_yaml=True, seed=None, metrics=False):
     # 1. Load template
-    template_obj = Template.objects.select_related("skill").get(pk=template_id)
-    print("Template object", template_obj)
     try:
         template_obj = Template.objects.select_related("skill").get(pk=template_id)
     except Template.DoesNotExist:
@@ -254,9 +335,15 @@ def generate_values_and_question(template_id: int):
     content = template_obj.content
     # print("Generate values and question (content):", content)
 
-    # 2. Parse YAML
+    # 2. Parse YAML (cached by content hash, so repeat requests skip parsing)
+    start = time.perf_counter()
     try:
-        parsed = yaml.safe_load(content)
+        compiled = get_compiled_template(content, template_id)
+        if template_obj.stored_diagram_svg():
+            compiled.diagram_svg = template_obj.diagram_svg
+        parsed = compiled.parsed
+        parse_ms = (time.perf_counter() - start) * 1000
+        record_stage("parse", parse_ms)
     except Exception as e:
         return {
             "ok": False,
@@ -284,7 +371,7 @@ def generate_values_and_question(template_id: int):
 
     # 4. Render preview
     try:
-        preview = render_template_preview(parsed)
+        preview = render_seeded(compiled, seed, debug_yaml, metrics)
 
         # Always include substituted YAML
         if "substituted_yaml" not in preview:
@@ -298,23 +385,14 @@ def generate_values_and_question(template_id: int):
         preview["difficulty"] = template_obj.difficulty
 
         # Inject linked knowledge items (rendered)
-        knowledge_items = []
-        for k in template_obj.knowledge_items.all():
-            svg = ""
-            if k.diagram and k.diagram.strip() and k.diagram.strip().lower() != "none":
-                try:
-                    from .diagram.engine import render_diagram_from_code
-                    svg = render_diagram_from_code(k.diagram)
-                except Exception:
-                    pass
-            knowledge_items.append({
-                "id": k.id,
-                "title": k.title,
-                "text": k.text,
-                "text_2": k.text_2,
-                "diagram_svg": svg,
-            })
-        preview["knowledge_items"] = knowledge_items
+        start = time.perf_counter()
+        preview["knowledge_items"] = render_knowledge_items(template_obj)
+        knowledge_ms = (time.perf_counter() - start) * 1000
+        record_stage("knowledge_items", knowledge_ms)
+
+        if metrics:
+            preview["metrics"]["parse_ms"] = round(parse_ms, 3)
+            preview["metrics"]["knowledge_items_ms"] = round(knowledge_ms, 3)
 
         return {
             "ok": True,
@@ -341,7 +419,7 @@ def generate_values_and_question(template_id: int):
         }
 
 
-def generate_preview_from_template_id(template_id: int):
+def generate_preview_from_template_id(template_id: int, debug_yaml=True, seed=None):
     # 1. Load template
     try:
         template_obj = Template.objects.select_related("skill").get(pk=template_id)
@@ -354,9 +432,12 @@ def generate_preview_from_template_id(template_id: int):
 
     content = template_obj.content
 
-    # 2. Parse YAML
+    # 2. Parse YAML (cached by content hash)
     try:
-        parsed = yaml.safe_load(content)
+        compiled = get_compiled_template(content, template_id)
+        if template_obj.stored_diagram_svg():
+            compiled.diagram_svg = template_obj.diagram_svg
+        parsed = compiled.parsed
     except Exception as e:
         return {
             "ok": False,
@@ -382,13 +463,17 @@ def generate_preview_from_template_id(template_id: int):
             "error": errors
         }
 
-    # 4. Render preview (retry loop)
+    # 4. Render preview (retry loop). Validation rules are already retried by
+    # the parameter sampler, so this only covers other random failures.
     MAX_ATTEMPTS = 5
     last_error = None
 
     for attempt in range(MAX_ATTEMPTS):
         try:
-            preview = render_template_preview(parsed)
+            # A retry with the same seed would fail the same way, so step it
+            attempt_seed = None if seed is None else seed + attempt
+            preview = render_seeded(compiled, attempt_seed, debug_yaml)
+            preview["attempts"] += attempt
 
             # Inject metadata
             preview["skill"] = template_obj.skill.description if template_obj.skill else None
@@ -401,6 +486,10 @@ def generate_preview_from_template_id(template_id: int):
                 "error": None
             }
 
+        except ParameterGenerationError as e:
+            last_error = str(e)
+            break
+
         except Exception as e:
             import traceback
             traceback.print_exc()
@@ -417,11 +506,63 @@ def generate_preview_from_template_id(template_id: int):
             "diagram_code": "",
             "substituted_yaml": content,
             "params": {},
-            "errors": [f"Failed after {MAX_ATTEMPTS} attempts: {last_error}"]
+            "errors": [f"Failed after {attempt + 1} attempts: {last_error}"]
         },
-        "error": f"Failed after {MAX_ATTEMPTS} attempts: {last_error}"
+        "error": f"Failed after {attempt + 1} attempts: {last_error}"
+    }
+
+MAX_BATCH_SIZE = 500
+
+
+def generate_question_batch(template_obj, n, seed=None):
+    """
+    Yield records for `n` distinct instances of one template, for NDJSON streaming.
+
+    The template is loaded, parsed, validated and its knowledge items rendered
+    once, in a leading {"type": "template"} record. Then come one
+    {"type": "question"} record per instance (or {"type": "error"} for a failed
+    render), and a closing {"type": "done"} record with counts. Passing the
+    returned seed back reproduces the batch.
+    """
+    from .render.batch import render_batch
+
+    try:
+        compiled = get_compiled_template(template_obj.content, template_obj.id)
+    except Exception as e:
+        yield {"type": "error", "error": f"YAML error: {str(e)}"}
+        return
+    if template_obj.stored_diagram_svg():
+        compiled.diagram_svg = template_obj.diagram_svg
+
+    errors = validate_template(compiled.parsed)
+    if errors:
+        yield {"type": "error", "error": errors}
+        return
+
+    seed = seed if seed is not None else random.getrandbits(32)
+    yield {
+        "type": "template",
+        "template_id": template_obj.id,
+        "seed": seed,
+        "requested": n,
+        "skill": template_obj.skill.description if template_obj.skill else None,
+        "grade": template_obj.grade,
+        "difficulty": template_obj.difficulty,
+        "knowledge_items": render_knowledge_items(template_obj),
     }
 
+    stats = {}
+    count = 0
+    for result in render_batch(template_obj.content, n, seed=seed, stats=stats):
+        if "error" in result:
+            yield {"type": "error", "seed": result["seed"], "error": result["error"]}
+            continue
+        yield {"type": "question", "index": count, **result}
+        count += 1
+
+    yield {"type": "done", "count": count, **stats}
+
+
 def generate_first_question(request):
     print("Generating first question")
     student_id = request.data.get("student_id")
@@ -485,7 +626,12 @@ def generate_first_question(request):
     # ---------------------------------------------------------
     # GENERATE PREVIEW FOR THE FIRST QUESTION
     # ---------------------------------------------------------
-    preview = generate_preview_from_template_id(template.id)
+    from .question_pool import take_pooled_question
+    pooled = take_pooled_question(template)
+    if pooled is not None:
+        preview = {"ok": True, "preview": pooled, "error": None}
+    else:
+        preview = generate_preview_from_template_id(template.id, debug_yaml=False)
 
     if not preview["ok"]:
         return Response(
@@ -495,6 +641,7 @@ def generate_first_question(request):
 
     next_question = preview["preview"]
     next_question["template_id"] = template.id  # <-- CRITICAL FIX
+    remember_served_seed(user.pk, template.id, next_question)
 
     # ---------------------------------------------------------
     # RETURN FIRST QUESTION
@@ -1,3 +1,582 @@
-from django.test import TestCase
+import copy
+import datetime
+import random
+import types
+from unittest import mock
+import xml.etree.ElementTree as ET
+
+from django.test import SimpleTestCase
+
+from .cache import (
+    TutorCache, bump_tutor_version, week_end, masked_projection, overlay_masked,
+    BOOKING_INDEX, get_or_build_indexed, apply_booking_change, set_booking_field,
+)
+from .availability import (
+    merge, subtract, bookable_starts, day_slots, weekly_bookable_slots, adhoc_bookable_slots,
+)
+from .availability_bench import (
+    run_bench as run_availability_bench, random_tutor, legacy_weekly_slots, legacy_adhoc_slots,
+)
+from .models import AvailabilityContext, Knowledge
+from .diagram import algebra_table, cartesian, compact, dsl, engine
+from .management.commands.bench_render import load_corpus
+from .render.bench import run_bench, compare_reports, percentile, import_profile
+from .template_utilities import remember_served_seed, served_seed, parse_flag
+from . import question_pool
+from .models import Template
+
+
+class RenderBenchTests(SimpleTestCase):
+    """Benchmark suite over the question_templates/*.yaml fixtures."""
+
+    K = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.corpus = load_corpus("yaml")
+        cls.report = run_bench(cls.corpus, cls.K, seed=1)
+
+    def test_every_fixture_renders(self):
+        self.assertTrue(self.corpus)
+        for name, result in self.report["templates"].items():
+            self.assertEqual(result["renders"], self.K, f"{name}: {result['first_error']}")
+            self.assertGreater(result["ops_per_sec"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+
+    def test_report_has_stages_and_rejection_rate(self):
+        summary = self.report["summary"]
+        self.assertEqual(summary["renders"], self.K * len(self.corpus))
+        self.assertIn("parameters", summary["stages"])
+        self.assertGreaterEqual(summary["rule_rejection_rate"], 0.0)
+        self.assertLess(summary["rule_rejection_rate"], 1.0)
+
+    def test_compare_flags_regressions(self):
+        self.assertEqual(compare_reports(self.report, self.report), [])
+
+        slower = copy.deepcopy(self.report)
+        name = next(iter(slower["templates"]))
+        slower["templates"][name]["p95_ms"] = max(self.report["templates"][name]["p95_ms"], 1.0) * 10
+        slower["summary"]["ops_per_sec"] = self.report["summary"]["ops_per_sec"] / 2
+        regressions = compare_reports(self.report, slower)
+        self.assertTrue(any(line.startswith("overall") for line in regressions))
+        self.assertTrue(any(line.startswith(name) for line in regressions))
+
+    def test_startup_imports_stay_lazy(self):
+        for module in ("backend.diagram.engine", "backend.render"):
+            self.assertEqual(import_profile(module)["eager"], [], module)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.50), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class CartesianCurveTests(SimpleTestCase):
+
+    def curve(self, eq):
+        d = cartesian.parse(f'Cartesian(xmin: -6, xmax: 6, ymin: -9, ymax: 9, eq: "{eq}")')
+        return cartesian.sample_curve(
+            cartesian.compile_equation(d.eq), d.xmin, d.xmax, lambda x: x, lambda y: -y, d.h
+        )
+
+    def test_straight_line_is_one_segment(self):
+        self.assertEqual([len(run) for run in self.curve("2*x + 1")], [2])
+
+    def test_runs_break_at_asymptotes(self):
+        self.assertEqual(len(self.curve("1/x")), 2)
+        self.assertEqual(len(self.curve("tan(x)")), 5)
+
+    def test_invalid_equation_draws_nothing(self):
+        self.assertIsNone(cartesian.compile_equation("bad(("))
+        self.assertNotIn("<path", cartesian.render(cartesian.parse('Cartesian(xmin: 0, xmax: 1, ymin: 0, ymax: 1, eq: "bad((")')))
+
+
+class AlgebraTableTests(SimpleTestCase):
+
+    def test_expression_compiled_once_and_evaluated(self):
+        self.assertIs(algebra_table.compile_expr("2x+1"), algebra_table.compile_expr("2x+1"))
+        self.assertEqual(algebra_table.table_values("2x+1", (1, 2, 3)), {1: 3, 2: 5, 3: 7})
+        self.assertEqual(algebra_table._eval_expr("x/4", 2), 0.5)
+        self.assertIsNone(algebra_table._eval_expr("x +* (", 2))
+
+    def test_float_noise_is_rounded_away(self):
+        self.assertEqual(algebra_table.table_values("x*0.7 + 0.1", (3, 7)), {3: 2.2, 7: 5})
+        self.assertEqual(algebra_table._eval_expr("x/3", 1), 0.3333)
+
+    def test_multi_step_frames_show_the_whole_diagram(self):
+        from .render import render_template_preview
+        preview = render_template_preview({
+            "question": {"text": "Fill in the table"},
+            "answers": [],
+            "solution": {"text": "x is {{ blank_x }}"},
+            "diagram": 'AlgebraTable(x_min: 1, x_max: 4, expr: "3x", blanks: "3,4")\nRect(x: 5, y: 3, pos: (0, 0))',
+        }, debug_yaml=False)
+        rect = engine.DIAGRAM_REGISTRY["Rect"]
+        rect_svg = rect.render(rect.parse("Rect(x: 5, y: 3, pos: (0, 0))"))
+        steps = preview["multi_step"]["steps"]
+        self.assertEqual([s["answer"] for s in steps], ["9", "12"])
+        for step in steps:
+            self.assertIn(rect_svg, step["svg"])
+        self.assertNotIn(">9</text>", steps[0]["svg"])
+        self.assertIn(">9</text>", steps[1]["svg"])
+
+    def test_render_shows_values_except_blanks(self):
+        d = algebra_table.parse('AlgebraTable(x_min: 1, x_max: 4, expr: "3x", blanks: "3,4")')
+        svg = algebra_table.render(d)
+        self.assertIn(">6</text>", svg)
+        self.assertNotIn(">9</text>", svg)
+
+
+class DiagramCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        engine.clear_svg_cache()
+
+    def test_repeat_renders_hit_the_cache(self):
+        code = "Clock(time: 3:15, pos: (0, 0))"
+        first = engine.render_diagram_from_code(code)
+        self.assertEqual(engine.render_diagram_from_code(code), first)
+        stats = engine.svg_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        self.assertGreater(stats["bytes"], len(first))
+
+    def test_only_static_diagrams_are_prerendered(self):
+        self.assertTrue(engine.render_static_diagram("Rect(x: 4, y: 3)").startswith("<svg"))
+        self.assertEqual(engine.render_static_diagram("Rect(x: {{ w }}, y: 3)"), "")
+        self.assertEqual(engine.render_static_diagram("none"), "")
+
+    def test_stored_svg_from_another_engine_version_is_redrawn(self):
+        item = Knowledge(pk=1, diagram="Rect(x: 4, y: 3)", diagram_svg="<svg>old</svg>", diagram_svg_version="0:full")
+        with mock.patch.object(Knowledge, "objects") as objects:
+            svg = item.stored_diagram_svg()
+        self.assertEqual(svg, engine.render_static_diagram("Rect(x: 4, y: 3)"))
+        self.assertEqual(item.diagram_svg_version, engine.SVG_FORMAT)
+        # Served, not written back: that is left to save() and backfill_diagram_svg
+        self.assertEqual(objects.mock_calls, [])
+
+    def test_diagram_modules_load_on_first_use(self):
+        self.assertEqual(len(engine.DIAGRAM_REGISTRY), 16)
+        self.assertIn("Cartesian", engine.DIAGRAM_REGISTRY)
+        engine.render_diagram_from_code("Balls(red: 3, blue: 2)")
+        self.assertIn("Balls", engine.DIAGRAM_REGISTRY.loaded())
+
+    def test_dispatch_by_name(self):
+        self.assertEqual(engine._find_module("Rect(w: 4, h: 2)")[0], "Rect")
+        self.assertEqual(engine._find_module("GraphPie(values: \"1,2\")")[0], "GraphPie")
+        self.assertEqual(engine._find_module("Unknown(a: 1)"), (None, None))
+
+
+class DiagramDslTests(SimpleTestCase):
+
+    def test_parse_call_value_types(self):
+        call = dsl.parse_call(
+            'GraphLine(points: [("Jan", 4), (“Jul”, 18.5)], pos: (1, -2), show_values: false, '
+            'time: 3:15, expr: 2*(x+1))'
+        )
+        self.assertEqual(call.name, "GraphLine")
+        self.assertEqual(call.args["points"], (("Jan", 4), ("Jul", 18.5)))
+        self.assertEqual(call.args["pos"], (1, -2))
+        self.assertIs(call.args["show_values"], False)
+        self.assertEqual(call.args["time"], "3:15")
+        self.assertEqual(call.args["expr"], "2*(x+1)")
+
+    def test_bind_applies_schema(self):
+        schema = {"x": (dsl.number, dsl.REQUIRED), "scale": (dsl.number, 1.0), "name": (dsl.text, "")}
+        self.assertEqual(dsl.bind("Rect(x: 4, scale: big)", schema), {"x": 4.0, "scale": 1.0, "name": ""})
+        self.assertIsNone(dsl.bind("Rect(y: 4)", schema))
+
+    def test_modules_parse_through_dsl(self):
+        self.assertEqual(
+            engine.DIAGRAM_REGISTRY["Clock"].parse("Clock(time: 3:30, pos: (0, 0))").pos, (0, 0)
+        )
+        d = engine.DIAGRAM_REGISTRY["DotArray"].parse("DotArray(count: 3x4, pos: (0, 0))")
+        self.assertEqual((d.rows, d.cols), (3, 4))
+        self.assertIsNone(engine.DIAGRAM_REGISTRY["Triangle"].parse("Triangle(a: 1, b: 1, c: 5)"))
+
+    # Template diagrams from the database that the old per-key regexes accepted
+
+    def test_missing_comma_between_points(self):
+        d = engine.DIAGRAM_REGISTRY["GraphLine"].parse(
+            'GraphLine(points: [("0", 0), ("10", 50), ("20", 100),  ("30", 125)("40", 150)("50", 175)], '
+            'y_label: "Metres", show_values: false)'
+        )
+        self.assertEqual([label for label, _ in d.points], ["0", "10", "20", "30", "40", "50"])
+        self.assertEqual((d.y_label, d.show_values), ("Metres", False))
+
+    def test_key_after_closing_paren(self):
+        d = engine.DIAGRAM_REGISTRY["GraphLine"].parse(
+            'GraphLine(y_label: "Temp", points: [("Jan", 30), ("Feb", 31), ("Mar", 28)], pos: (0, 0)), '
+            'show_values: false'
+        )
+        self.assertEqual((len(d.points), d.y_label, d.show_values), (3, "Temp", False))
+
+    def test_numeric_prefix_of_malformed_value(self):
+        d = engine.DIAGRAM_REGISTRY["Triangle"].parse(
+            "Triangle(a: 12}, b: 10, c: 8, ticks_a: 1, ticks_b:2, ticks_c:3, arcs_A:1, arcs_B:2, arcs_C:3, "
+            "pos:(-10,0), scale:1)"
+        )
+        self.assertEqual((d.a, d.b, d.c, d.ticks_c, d.pos), (12.0, 10.0, 8.0, 3, [-10.0, 0.0]))
+
+    def test_fraction_is_not_read_as_its_numerator(self):
+        parse = engine.DIAGRAM_REGISTRY["Triangle"].parse
+        # An optional key falls back to its default: c is the hypotenuse
+        self.assertEqual(parse("Triangle(a: 3, b: 4, c: 1/2)").c, 5.0)
+        self.assertIsNone(parse("Triangle(a: 1/2, b: 4)"))
+        with self.assertRaises(ValueError):
+            dsl.number("1/2")
+
+
+class CompactSvgTests(SimpleTestCase):
+
+    CODE = 'Cartesian(xmin: -6, xmax: 6, ymin: -9, ymax: 9, eq: "x^2 - 3")'
+
+    def render(self, compact_mode):
+        d = cartesian.parse(self.CODE)
+        return engine.svg_document([cartesian.render(d)], cartesian.viewbox(d), compact=compact_mode)
+
+    def test_compact_output_is_valid_and_smaller(self):
+        full, small = self.render(False), self.render(True)
+        ET.fromstring(small)
+        self.assertLess(len(small), len(full) * 0.6)
+        self.assertIn("<style>", small)
+        self.assertNotIn("<line", small)   # grid lines merged into paths
+
+    def test_precision_follows_viewbox_scale(self):
+        self.assertEqual(compact.precision(60), 2)
+        self.assertEqual(compact.precision(600), 1)
+        self.assertEqual(compact._round("1.2049 -0.001 -0.25", 2), "1.2 0 -.25")
+
+    def test_compact_mode_is_opt_in(self):
+        self.assertFalse(engine.COMPACT_SVG)
+        self.assertNotIn("<style>", engine.render_diagram_from_code(self.CODE))
+
+    def test_text_content_is_kept(self):
+        css, defs, body = compact.compact_body(
+            '<text x="1" y="2"> a  b </text>\n  <text x="0" y="3"><tspan>x</tspan> <tspan>y</tspan></text>', 2
+        )
+        self.assertEqual(body, '<text x="1" y="2"> a  b </text><text y="3"><tspan>x</tspan> <tspan>y</tspan></text>')
+
+    def test_runs_with_the_same_style_share_a_group(self):
+        body = "".join(f'<circle cx="{x}" cy="1" r="1.5" fill="black" />\n' for x in range(4))
+        css, defs, body = compact.compact_body(body + '<rect width="2" height="2" fill="red"/>', 2)
+        self.assertEqual(body, '<g fill="black"><circle cy="1" r="1.5"/><circle cx="1" cy="1" r="1.5"/>'
+                               '<circle cx="2" cy="1" r="1.5"/><circle cx="3" cy="1" r="1.5"/></g>'
+                               '<rect width="2" height="2" fill="red"/>')
+
+
+class DiagramBatchTests(SimpleTestCase):
+
+    def test_batch_keeps_order_and_reports_per_item(self):
+        engine.clear_svg_cache()
+        codes = ["Rect(x: 4, y: 3)", "none", "Clock(time: 3:15, pos: (0, 0))", "Rect(x: 4, y: 3)"]
+        results = engine.render_diagrams_batch(codes)
+        self.assertEqual([r["error"] for r in results], [None] * 4)
+        self.assertEqual(results[1]["diagram_svg"], "")
+        self.assertEqual(results[0]["diagram_svg"], results[3]["diagram_svg"])
+        self.assertEqual(results[2]["diagram_svg"], engine.render_diagram_from_code(codes[2]))
+        self.assertEqual(engine.svg_cache_stats()["entries"], 2)
+
+    def test_task_times_out(self):
+        result = engine.render_diagram_task('Cartesian(xmin: 0, xmax: 1, ymin: 0, ymax: 1, eq: "x + 9**9**9")', 0.2)
+        self.assertEqual(result, {"diagram_svg": "", "error": "Timed out after 0.2s"})
+
+
+class RequestParsingTests(SimpleTestCase):
+
+    def test_flags_parse_false_strings_as_false(self):
+        for value in (True, 1, "1", "true", "True", "yes", "on"):
+            self.assertTrue(parse_flag(value), value)
+        for value in (None, False, 0, "", "0", "false", "False", "no", "off"):
+            self.assertFalse(parse_flag(value), value)
+
+    def test_non_numeric_top_is_a_bad_request(self):
+        from rest_framework.test import APIRequestFactory
+        from .views import TemplateViewSet
+        view = TemplateViewSet.as_view({"get": "render_metrics"})
+        factory = APIRequestFactory()
+        self.assertEqual(view(factory.get("/", {"top": "abc"})).status_code, 400)
+        self.assertEqual(view(factory.get("/", {"top": "0"})).status_code, 400)
+        self.assertEqual(view(factory.get("/", {"top": "3"})).status_code, 200)
+
+
+class ServedSeedTests(SimpleTestCase):
+
+    def test_served_seed_is_kept_per_student_and_template(self):
+        remember_served_seed(1, 7, {"seed": 1234})
+        remember_served_seed(2, 7, {"seed": 99})
+        self.assertEqual(served_seed(1, 7), 1234)
+        self.assertEqual(served_seed(2, 7), 99)
+        self.assertIsNone(served_seed(1, 8))
+        remember_served_seed(1, 7, {"seed": 0})
+        self.assertEqual(served_seed(1, 7), 0)
+
+
+class QuestionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.template = Template(pk=900, content="question: pooled")
+        with mock.patch.object(question_pool, "pooling_enabled", lambda: True):
+            question_pool.discard_question_pool(self.template.pk)
+
+    def batch(self, template, n):
+        yield {"type": "template", "skill": None, "grade": "7", "difficulty": "easy", "knowledge_items": []}
+        for i in range(n):
+            yield {"type": "question", "index": i, "params": {"n": self.rendered + i}, "seed": self.rendered + i}
+        self.rendered += n
+
+    def refill(self, target):
+        with mock.patch("backend.template_utilities.generate_question_batch", self.batch):
+            return question_pool.refill_pool(self.template, target)
+
+    def test_pooling_needs_a_shared_cache(self):
+        self.assertFalse(question_pool.pooling_enabled())
+        self.assertEqual(question_pool.refill_pool(self.template), 0)
+        self.assertIsNone(question_pool.take_pooled_question(self.template))
+
+    @mock.patch.object(question_pool, "pooling_enabled", lambda: True)
+    def test_each_instance_is_taken_once(self):
+        self.rendered = 0
+        self.assertEqual(self.refill(3), 3)
+        self.assertEqual(question_pool.pool_size(self.template), 3)
+        # Another request claims the next instance between our read and our take
+        pool = question_pool._pool_key(self.template)
+        question_pool._incr(f"{pool}:head")
+        taken = [question_pool.take_pooled_question(self.template) for _ in range(3)]
+        self.assertEqual([p and p["seed"] for p in taken], [1, 2, None])
+
+        self.assertEqual(self.refill(2), 2)
+        self.assertEqual(question_pool.take_pooled_question(self.template)["seed"], 3)
+        question_pool.discard_question_pool(self.template.pk)
+        self.assertEqual(question_pool.pool_size(self.template), 0)
+        self.assertIsNone(question_pool.take_pooled_question(self.template))
+
+
+class TutorCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.slots = TutorCache("test_slots")
+        self.weeks = TutorCache("test_weeks")
+
+    def test_invalidate_drops_only_that_tutor_and_namespace(self):
+        self.slots.set(1, {"mon": ["09:00"]})
+        self.slots.set(2, {"mon": ["10:00"]})
+        self.weeks.set(1, ["a"], "2026-03-02")
+        self.slots.invalidate(1)
+        self.assertIsNone(self.slots.get(1))
+        self.assertEqual(self.slots.get(2), {"mon": ["10:00"]})
+        self.assertEqual(self.weeks.get(1, "2026-03-02"), ["a"])
+
+    def test_tutor_version_drops_every_namespace(self):
+        self.slots.set(3, "slots")
+        self.weeks.set_parts(3, {"2026-03-02": "w1", "2026-03-09": "w2"})
+        self.assertEqual(self.weeks.get_parts(3, ["2026-03-02", "2026-03-16"]), {"2026-03-02": "w1"})
+        bump_tutor_version(3)
+        self.assertIsNone(self.slots.get(3))
+        self.assertEqual(self.weeks.get_parts(3, ["2026-03-02", "2026-03-09"]), {})
+        self.assertEqual(self.slots.get_or_build(3, lambda: "rebuilt"), "rebuilt")
+
+    def test_weeks_are_bounded_and_past_weeks_dropped(self):
+        weeks = TutorCache("test_bounded", max_parts=3, expires=week_end)
+        today = datetime.date.today()
+        starts = [(today + datetime.timedelta(days=i)).isoformat() for i in range(5)]
+        for start in starts:
+            weeks.get_or_build(4, lambda: start, start)
+        self.assertEqual(list(weeks.get_parts(4, starts)), starts[2:])
+        self.assertEqual(weeks.get_or_build(4, lambda: "rebuilt", starts[4]), starts[4])
+
+        past = (today - datetime.timedelta(days=10)).isoformat()
+        weeks.set(4, "old", past)
+        self.assertIsNone(weeks.get(4, past))
+        self.assertEqual(weeks.stats(), {"hits": 1, "misses": 6, "evictions": 2, "hit_rate": 0.1429})
+
+
+    def test_lock_is_exclusive_across_holders(self):
+        with self.slots.locked(5) as held:
+            self.assertTrue(held)
+            with self.slots.locked(5) as second:
+                self.assertFalse(second)
+            with self.weeks.locked(5) as other_namespace:
+                self.assertTrue(other_namespace)
+        with self.slots.locked(5) as again:
+            self.assertTrue(again)
+
+
+class BookingIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = TutorCache("test_index")
+        self.cache.invalidate(1)
+        # The first change with no index starts an empty one
+        self.assertFalse(apply_booking_change(self.cache, 1, 0))
+        for week in ("2026-03-02", "2026-03-03"):
+            self.build(week)
+
+    def build(self, week, tutor_id=1):
+        return get_or_build_indexed(self.cache, tutor_id, week, lambda: {
+            "2026-03-04": [{"id": 1, "t": "09:00"}, {"id": 2, "t": "10:00"}, {"id": 3, "t": "11:00"}],
+        })
+
+    def day(self, week):
+        return self.cache.get(1, week)["2026-03-04"]
+
+    def test_delete_fills_gap_with_last_booking(self):
+        apply_booking_change(self.cache, 1, 1)
+        self.assertEqual([b["id"] for b in self.day("2026-03-02")], [3, 2])
+        self.assertEqual([b["id"] for b in self.day("2026-03-03")], [3, 2])
+        # The moved booking is still found through the index
+        set_booking_field(self.cache, 1, 3, "confirmed", True)
+        self.assertTrue(self.day("2026-03-03")[0]["confirmed"])
+
+    def test_edit_moves_booking_between_cached_windows(self):
+        apply_booking_change(self.cache, 1, 2, {"id": 2, "t": "12:00"}, "2026-03-09", ["2026-03-03"])
+        self.assertEqual([b["id"] for b in self.day("2026-03-02")], [1, 3])
+        self.assertEqual(self.cache.get(1, "2026-03-03")["2026-03-09"], [{"id": 2, "t": "12:00"}])
+        index = self.cache.get(1, BOOKING_INDEX)
+        self.assertEqual(index[2], [("2026-03-03", "2026-03-09", 0)])
+
+    def test_evicted_index_invalidates_on_delete(self):
+        self.cache.delete(1, BOOKING_INDEX)
+        # Built while there is no index: cached, but not indexed
+        self.build("2026-03-04")
+        self.assertIsNone(self.cache.get(1, BOOKING_INDEX))
+        self.assertFalse(apply_booking_change(self.cache, 1, 2))
+        for week in ("2026-03-02", "2026-03-03", "2026-03-04"):
+            self.assertIsNone(self.cache.get(1, week))
+        self.assertEqual(self.cache.get(1, BOOKING_INDEX), {})
+
+    def test_unconfirmed_location_invalidates(self):
+        self.cache.set(1, {"2026-03-04": [{"id": 3}]}, "2026-03-02")   # written around the index
+        self.assertFalse(apply_booking_change(self.cache, 1, 1))
+        self.assertIsNone(self.cache.get(1, "2026-03-03"))
+
+    def test_change_without_lock_invalidates(self):
+        with self.cache.locked(1):
+            self.assertFalse(apply_booking_change(self.cache, 1, 1))
+        self.assertIsNone(self.cache.get(1, "2026-03-02"))
+
+    def test_change_during_build_is_not_lost(self):
+        def build():
+            snapshot = {"2026-03-11": [{"id": 4, "t": "09:00"}]}
+            # Another worker deletes the booking after this one read it
+            self.assertTrue(apply_booking_change(self.cache, 1, 4))
+            return snapshot
+
+        self.assertEqual(get_or_build_indexed(self.cache, 1, "2026-03-09", build)["2026-03-11"][0]["id"], 4)
+        self.assertIsNone(self.cache.get(1, "2026-03-09"))
+        self.assertNotIn(4, self.cache.get(1, BOOKING_INDEX))
+        # The next build caches what it reads
+        self.build("2026-03-09")
+        self.assertIsNotNone(self.cache.get(1, "2026-03-09"))
+
+
+class MaskedBookingsTests(SimpleTestCase):
+
+    BOOKINGS = {
+        0: [
+            {"id": 1, "student_id": 7, "student_name": "Sam Lee", "start_time": "09:00"},
+            {"id": 2, "student_id": 8, "student_name": "Ali Khan", "start_time": "10:00"},
+        ],
+        1: [],
+    }
+
+    def test_overlay_marks_only_the_viewers_bookings(self):
+        projection = masked_projection(self.BOOKINGS)
+        seen = overlay_masked(projection, 7)
+        self.assertEqual(seen, {
+            0: [
+                {"id": 1, "start_time": "09:00", "status": "booked_self"},
+                {"id": 2, "start_time": "10:00", "status": "booked_other"},
+            ],
+            1: [],
+        })
+        # The shared template is not changed by a student's view of it
+        self.assertEqual(overlay_masked(projection, 8)[0][0]["status"], "booked_other")
+        self.assertIn("student_id", self.BOOKINGS[0][0])
+
+
+class AvailabilityEngineTests(SimpleTestCase):
+
+    def test_subtract_blocks_from_windows(self):
+        blocks = merge([(600, 660), (630, 700), (900, 960)])
+        self.assertEqual(blocks, [(600, 700), (900, 960)])
+        self.assertEqual(subtract([(540, 720), (840, 1020)], blocks), [(540, 600), (700, 720), (840, 900), (960, 1020)])
+
+    def test_bookable_starts_stay_on_the_window_grid(self):
+        # 09:00-13:00 with 10:00-11:10 taken: an hour fits at 9:00 and from 11:15
+        self.assertEqual(bookable_starts([(540, 780)], [(600, 670)], 60), [540, 675, 690, 705, 720])
+
+    def test_day_slots_need_an_available_session_end(self):
+        grid, bookable = day_slots([(540, 660)], [(600, 615, "appt")], 60)
+        self.assertEqual(grid[36:45], ["available"] * 4 + ["appt"] + ["available"] * 3 + ["outside"])
+        self.assertEqual(bookable, [555, 570, 585])
+
+    def test_matches_legacy_stepping(self):
+        report = run_availability_bench(tutors=30, repeat=1, seed=1)
+        for name, result in report["results"].items():
+            self.assertEqual(result["mismatches"], [], name)
+
+    def test_off_grid_bookings_block_the_slots_they_overlap(self):
+        # Behaviour change: the legacy stepping blocked only the marks it stepped
+        # onto from the booking's (or buffer's) start, so these blocked nothing
+        window = [types.SimpleNamespace(weekday=0, start_time=datetime.time(9), end_time=datetime.time(12))]
+        short = [types.SimpleNamespace(weekday=0, start_time=datetime.time(10, 10), end_time=datetime.time(10, 20))]
+        on_grid = [types.SimpleNamespace(weekday=0, start_time=datetime.time(10), end_time=datetime.time(10, 30))]
+        every_start = [f"{m // 60:02d}:{m % 60:02d}" for m in range(540, 661, 15)]
+
+        self.assertEqual(legacy_weekly_slots(window, short, 60, 0)[0], every_start)
+        self.assertEqual(weekly_bookable_slots(window, short, 60, 0)[0], ["09:00", "10:30", "10:45", "11:00"])
+        # A 10-minute buffer around 10:00-10:30 blocks 09:50-10:40
+        self.assertEqual(legacy_weekly_slots(window, on_grid, 60, 10)[0], every_start)
+        self.assertEqual(weekly_bookable_slots(window, on_grid, 60, 10)[0], ["10:45", "11:00"])
+
+        day = datetime.date(2026, 3, 2)
+        weekly = {0: ["10:00", "10:15", "10:30", "10:45"]}
+        booking_map = {"2026-03-02": [{"start_time": "10:10", "end_time": "10:40"}]}
+        self.assertEqual(legacy_adhoc_slots(weekly, booking_map, [day])["2026-03-02"], weekly[0])
+        self.assertEqual(adhoc_bookable_slots(weekly, booking_map, [day])["2026-03-02"], ["10:00", "10:45"])
+
+    def test_off_grid_only_blocks_more_than_legacy(self):
+        rng = random.Random(3)
+        for _ in range(30):
+            t = random_tutor(rng, off_grid=True)
+            legacy = legacy_weekly_slots(t.availability, t.weekly, t.session, t.buffer)
+            engine_slots = weekly_bookable_slots(t.availability, t.weekly, t.session, t.buffer)
+            for weekday in range(7):
+                self.assertLessEqual(set(engine_slots[weekday]), set(legacy[weekday]))
+
+
+class AvailabilityContextTests(SimpleTestCase):
+
+    def setUp(self):
+        monday = datetime.date(2026, 3, 2)
+        at = lambda day, h, m: datetime.datetime.combine(day, datetime.time(h, m))
+        window = types.SimpleNamespace(weekday=0, start_time=datetime.time(9), end_time=datetime.time(13))
+        appt = types.SimpleNamespace(id=1, student_id=7, start_datetime=at(monday, 10, 0), end_datetime=at(monday, 11, 0))
+        self.monday = monday
+        self.at = at
+        self.context = AvailabilityContext(
+            monday, monday + datetime.timedelta(days=7), [monday + datetime.timedelta(days=7)], [appt], [window],
+        )
+
+    def test_status_at(self):
+        student = types.SimpleNamespace(id=7)
+        self.assertEqual(self.context.status_at(self.monday, datetime.time(9, 30)), "available")
+        self.assertEqual(self.context.status_at(self.monday, datetime.time(10, 30), student), "booked_self")
+        self.assertEqual(self.context.status_at(self.monday, datetime.time(10, 30)), "booked_other")
+        self.assertEqual(self.context.status_at(self.monday, datetime.time(13)), "outside")
+        self.assertEqual(self.context.status_at(self.monday + datetime.timedelta(days=7), datetime.time(9, 30)), "blocked")
+        with self.assertRaises(ValueError):
+            self.context.status_at(self.monday - datetime.timedelta(days=1), datetime.time(9))
+
+    def test_is_free_and_free_slots(self):
+        self.assertTrue(self.context.is_free(self.at(self.monday, 9, 0), self.at(self.monday, 10, 0)))
+        self.assertFalse(self.context.is_free(self.at(self.monday, 9, 30), self.at(self.monday, 10, 30)))
+        self.assertFalse(self.context.is_free(self.at(self.monday, 12, 30), self.at(self.monday, 13, 30)))
+        slots = self.context.free_slots()
+        self.assertEqual(slots[self.monday], [datetime.time(9), datetime.time(11), datetime.time(11, 15),
+                                              datetime.time(11, 30), datetime.time(11, 45), datetime.time(12)])
+        self.assertEqual(slots[self.monday + datetime.timedelta(days=7)], [])
 
-# Create your tests here.
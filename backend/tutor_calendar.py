@@ -1,24 +1,11 @@
 from datetime import datetime, date, time, timedelta
-from django.utils.timezone import make_aware
+from django.utils import timezone
 
 from .models import TutorProfile, TutorAvailability, TutorBlockedDay, BookingAdhoc
+from .availability import DAY_MINUTES, to_minutes, to_time, minutes_on, merge, bookable_starts, day_grid
 
-
-# ---------------------------------------------------------
-# Helper: convert HH:MM string to datetime for a given date
-# ---------------------------------------------------------
-def dt(day_date, t):
-    return make_aware(datetime.combine(day_date, t))
-
-
-# ---------------------------------------------------------
-# Helper: generate time range in increments
-# ---------------------------------------------------------
-def time_range(start_dt, end_dt, step_minutes):
-    current = start_dt
-    while current + timedelta(minutes=step_minutes) <= end_dt:
-        yield current
-        current += timedelta(minutes=step_minutes)
+# Segments in the graphical weekly view are this many minutes long
+SEGMENT_MINUTES = 5
 
 
 # ---------------------------------------------------------
@@ -26,8 +13,9 @@ def time_range(start_dt, end_dt, step_minutes):
 # ---------------------------------------------------------
 def generate_weekly_slots(tutor_profile, week_start):
 
-    default_session = timedelta(minutes=tutor_profile.default_session_minutes)
-    buffer = timedelta(minutes=tutor_profile.buffer_minutes)
+    tutor = tutor_profile.tutor
+    session = tutor_profile.default_session_minutes
+    buffer = tutor_profile.buffer_minutes
 
     # Build the 7-day scaffold
     week = []
@@ -45,7 +33,7 @@ def generate_weekly_slots(tutor_profile, week_start):
     # ---------------------------------------------------------
     # Load availability (weekly pattern)
     # ---------------------------------------------------------
-    availability = TutorAvailability.objects.filter(tutor=tutor_profile)
+    availability = TutorAvailability.objects.filter(tutor=tutor)
     availability_by_weekday = {i: [] for i in range(7)}
     for a in availability:
         availability_by_weekday[a.weekday].append(a)
@@ -55,7 +43,7 @@ def generate_weekly_slots(tutor_profile, week_start):
     # ---------------------------------------------------------
 
     blocked_days = set(
-        TutorBlockedDay.objects.filter(tutor=tutor_profile)
+        TutorBlockedDay.objects.filter(tutor=tutor)
         .values_list("date", flat=True)
     )
 
@@ -64,14 +52,15 @@ def generate_weekly_slots(tutor_profile, week_start):
     # ---------------------------------------------------------
     week_end = week_start + timedelta(days=7)
     bookings = BookingAdhoc.objects.filter(
-        tutor=tutor_profile,
+        tutor=tutor,
         start_datetime__date__gte=week_start,
         start_datetime__date__lt=week_end
     )
 
     bookings_by_date = {}
     for b in bookings:
-        bookings_by_date.setdefault(b.start.date(), []).append(b)
+        start = timezone.localtime(b.start_datetime)
+        bookings_by_date.setdefault(start.date(), []).append(b)
 
     # ---------------------------------------------------------
     # Fill in availability, blocked, bookings
@@ -94,8 +83,8 @@ def generate_weekly_slots(tutor_profile, week_start):
         if d in bookings_by_date:
             for b in bookings_by_date[d]:
                 day["bookings"].append({
-                    "start": b.start,
-                    "end": b.end,
+                    "start": timezone.localtime(b.start_datetime),
+                    "end": timezone.localtime(b.end_datetime),
                     "student": b.student_id
                 })
 
@@ -109,89 +98,32 @@ def generate_weekly_slots(tutor_profile, week_start):
 
         d = day["date"]
 
-        # Convert bookings to aware datetimes
-        booking_intervals = [
-            (b["start"], b["end"])
+        # A session may not come within the buffer of a booking
+        blocks = merge(
+            (minutes_on(d, b["start"]) - buffer, minutes_on(d, b["end"]) + buffer)
             for b in day["bookings"]
-        ]
-
-        for window in day["availability"]:
-            start_dt = dt(d, window["start"])
-            end_dt = dt(d, window["end"])
-
-            # Candidate start times every 15 minutes
-            for candidate in time_range(start_dt, end_dt, 15):
-
-                session_end = candidate + default_session
+        )
+        windows = [(to_minutes(a["start"]), to_minutes(a["end"])) for a in day["availability"]]
 
-                # Must fit inside availability
-                if session_end > end_dt:
-                    continue
-
-                # Check against bookings + buffer
-                valid = True
-                for b_start, b_end in booking_intervals:
-                    if not (
-                        session_end + buffer <= b_start or
-                        candidate >= b_end + buffer
-                    ):
-                        valid = False
-                        break
-
-                if valid:
-                    day["bookable_slots"].append(candidate.time())
+        day["bookable_slots"] = [to_time(m) for m in bookable_starts(windows, blocks, session)]
 
     # ---------------------------------------------------------
     # Build graphical segments (for student weekly view)
     # ---------------------------------------------------------
     for day in week:
-        segments = []
-        d = day["date"]
-
-        # Build a 5-minute timeline
-        t = time(0, 0)
-        end_of_day = time(23, 59)
-
-        for minute in range(0, 24 * 60, 5):
-            t = (datetime.min + timedelta(minutes=minute)).time()
-
-            # Determine segment type
-            if day["blocked"]:
-                seg_type = "blocked"
-
-            else:
-                # Check if inside availability
-                in_avail = False
-                for a in day["availability"]:
-                    if a["start"] <= t < a["end"]:
-                        in_avail = True
-                        break
-
-                # Check if inside booking
-                in_booking = False
-                for b in day["bookings"]:
-                    if b["start"].time() <= t < b["end"].time():
-                        in_booking = True
-                        break
-
-                if in_booking:
-                    seg_type = "booked_other"
-                elif in_avail:
-                    seg_type = "available"
-                else:
-                    seg_type = "outside"
-
-            segments.append({
-                "time": t,
-                "type": seg_type
-            })
-
-            # Increment 5 minutes
-            dt_obj = datetime.combine(d, t) + timedelta(minutes=5)
-            t = dt_obj.time()
-
-        day["segments"] = segments
-
-
+        if day["blocked"]:
+            grid = ["blocked"] * (DAY_MINUTES // SEGMENT_MINUTES)
+        else:
+            windows = [(to_minutes(a["start"]), to_minutes(a["end"])) for a in day["availability"]]
+            booked = [
+                (to_minutes(b["start"].time()), to_minutes(b["end"].time()), "booked_other")
+                for b in day["bookings"]
+            ]
+            grid = day_grid(windows, booked, SEGMENT_MINUTES)
+
+        day["segments"] = [
+            {"time": to_time(i * SEGMENT_MINUTES), "type": seg_type}
+            for i, seg_type in enumerate(grid)
+        ]
 
-    return week
\ No newline at end of file
+    return week
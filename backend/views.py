@@ -14,7 +14,10 @@ from .validation import *
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
+import os
+import json
 import yaml
+from django.http import StreamingHttpResponse
 from .import_skills import *
 from .ai import *
 from .utilities import *
@@ -31,6 +34,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .pre_view import *
 from .message import *
 from .booking import *
+from .question_pool import next_question_preview, pool_stats
 
 @method_decorator(csrf_exempt, name='dispatch')
 class AuthViewSet(viewsets.ViewSet):
@@ -139,6 +143,11 @@ class AuthViewSet(viewsets.ViewSet):
 
 
 class QuestionViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=["get"])
+    def pool_stats(self, request):
+        """Hit rate and refill latency of the pre-rendered question pools."""
+        return Response(pool_stats())
+
     @action(detail=False, methods=["post"])
     def record(self, request):
         student_id = request.data.get("student_id")
@@ -164,6 +173,12 @@ class QuestionViewSet(viewsets.ViewSet):
             return Response({"error": "Template not found"}, status=404)
         print("Found template")
 
+        # The seed the question was rendered with: sent back by the client, or
+        # the one remembered when it was served
+        seed = parse_seed(request.data.get("seed"))
+        if seed is None:
+            seed = served_seed(student.id, template.id)
+
         # Create the Question record
         q = Question.objects.create(
             template=template,
@@ -175,6 +190,7 @@ class QuestionViewSet(viewsets.ViewSet):
             selected_answer=request.data.get("selected_answer"),
             correct=request.data.get("correct", False),
             time_taken_ms=request.data.get("time_taken_ms"),
+            seed=seed,
         )
 
         # ---------------------------------------------------------
@@ -229,16 +245,6 @@ class QuestionViewSet(viewsets.ViewSet):
         )
 
         print(f"Found next_template for specific difficulty: {next_template}")
-        if next_template:
-            preview = generate_values_and_question(next_template.id)
-            if preview["ok"]:
-                next_question = preview["preview"]
-                next_question["template_id"] = next_template.id  # <-- FIX
-                # print("Next question", next_question)
-            else:
-                next_question = None
-        else:
-            next_question = None
 
         if not next_template:
             print("No template found for specific difficulty, looking for any template...")
@@ -252,10 +258,12 @@ class QuestionViewSet(viewsets.ViewSet):
             next_template_id = next_template.id
             print(f"Generating question for template: {next_template_id}")
 
-            preview = generate_values_and_question(next_template.id)
+            # Ready-rendered from the template's pool when available
+            preview = next_question_preview(next_template)
             if preview["ok"]:
                 next_question = preview["preview"]
                 next_question["template_id"] = next_template.id
+                remember_served_seed(student.id, next_template.id, next_question)
                 print(f"Successfully generated question with template_id: {next_template.id}")
             else:
                 print("Failed to generate question from template")
@@ -343,35 +351,58 @@ class TemplateViewSet(viewsets.ModelViewSet):
         update_matrix_cache_for_count(copy.skill_id)
         return Response({"id": copy.id})
 
+    @action(detail=False, methods=["get"])
+    def render_metrics(self, request):
+        """Process-level render latency histograms: per stage, and the slowest templates by p99.
+        Also includes the hit rate and size of the rendered diagram SVG cache."""
+        from .render.metrics import metrics_snapshot
+        from .diagram.engine import svg_cache_stats
+        try:
+            top = int(request.query_params.get("top", 20))
+        except (TypeError, ValueError):
+            return Response({"error": "top must be an integer"}, status=400)
+        if top < 1:
+            return Response({"error": "top must be at least 1"}, status=400)
+        snapshot = metrics_snapshot(top=top)
+        snapshot["diagram_cache"] = svg_cache_stats()
+        return Response(snapshot)
+
+    @action(detail=True, methods=["post"])
+    def generate_batch(self, request, pk=None):
+        """Stream n distinct instances of this template as NDJSON (one JSON object per line)."""
+        template = self.get_object()
+        try:
+            n = int(request.query_params.get("n", request.data.get("n", 10)))
+        except (TypeError, ValueError):
+            return Response({"error": "n must be an integer"}, status=400)
+        if n < 1 or n > MAX_BATCH_SIZE:
+            return Response({"error": f"n must be between 1 and {MAX_BATCH_SIZE}"}, status=400)
+        seed = parse_seed(request.query_params.get("seed", request.data.get("seed")))
+
+        records = generate_question_batch(template, n, seed=seed)
+        return StreamingHttpResponse(
+            (json.dumps(record, default=str) + "\n" for record in records),
+            content_type="application/x-ndjson",
+        )
+
     @action(detail=False, methods=["post"])
     def preview(self, request):
 
+        # Optional seed: the same seed re-renders the same question
+        seed = parse_seed(request.data.get("seed"))
+        # Optional per-stage timings in preview["metrics"]
+        metrics = parse_flag(request.data.get("metrics", request.query_params.get("metrics")))
+
         # 1. Content-based preview (TemplateEditorPage)
         content = request.data.get("content")
         if content:
-            result = generate_preview_from_content(content)
+            result = generate_preview_from_content(content, seed=seed, metrics=metrics)
             # Inject knowledge items when the template ID is also known
             template_id = request.data.get("templateId")
             if result["ok"] and template_id and result.get("preview") is not None:
                 try:
                     tpl = Template.objects.get(pk=template_id)
-                    from .diagram.engine import render_diagram_from_code
-                    knowledge_items = []
-                    for k in tpl.knowledge_items.all():
-                        svg = ""
-                        if k.diagram and k.diagram.strip() and k.diagram.strip().lower() != "none":
-                            try:
-                                svg = render_diagram_from_code(k.diagram)
-                            except Exception:
-                                pass
-                        knowledge_items.append({
-                            "id": k.id,
-                            "title": k.title,
-                            "text": k.text,
-                            "text_2": k.text_2,
-                            "diagram_svg": svg,
-                        })
-                    result["preview"]["knowledge_items"] = knowledge_items
+                    result["preview"]["knowledge_items"] = render_knowledge_items(tpl)
                 except Exception:
                     pass
             return Response(
@@ -409,7 +440,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
                     "error": "No templates exist for this skill and grade."
                 }, status=404)
 
-            result = generate_values_and_question(first.id)
+            result = generate_values_and_question(first.id, seed=seed, metrics=metrics)
             print(qs)
             print(result)
             return Response({
@@ -422,7 +453,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
         # 3. Template ID preview (Editor navigation)
         template_id = request.data.get("templateId") or request.data.get("id")
         if template_id:
-            result = generate_values_and_question(template_id)
+            result = generate_values_and_question(template_id, seed=seed, metrics=metrics)
             return Response(
                 {"ok": result["ok"], "preview": result["preview"], "error": result["error"]},
                 status=200 if result["ok"] else 400
@@ -722,8 +753,7 @@ class SkillViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["post"])
     def load_syllabus(self, request):
         import_syllabus()
-        global MATRIX_CACHE
-        MATRIX_CACHE = None
+        invalidate_matrix_cache()
         return Response({"status": "Syllabus loaded successfully"})
 
 
@@ -1127,12 +1157,10 @@ class StudentViewSet(viewsets.ModelViewSet):
         start_date = (date.today() + timedelta(days=1)).isoformat()
 
         weekly_slots = get_weekly_slots(tutor)
-        weekly_bookings = get_weekly_bookings(tutor)
-        weekly_bookings = mask_weekly_bookings(weekly_bookings, student.id)
+        weekly_bookings = get_masked_weekly_bookings(tutor, student.id)
 
         adhoc_slots = get_availability_adhoc(tutor, start_date)
-        adhoc_bookings = get_adhoc_bookings(tutor, start_date)
-        adhoc_bookings = mask_adhoc_bookings(adhoc_bookings, student.id)
+        adhoc_bookings = get_masked_adhoc_bookings(tutor, start_date, student.id)
 
         return Response({
             "weekly_slots": weekly_slots,
@@ -1395,6 +1423,18 @@ class KnowledgeViewSet(viewsets.ModelViewSet):
                 error = str(e)
         return Response({"diagram_svg": svg, "error": error})
 
+    @action(detail=False, methods=["post"])
+    def preview_batch(self, request):
+        """Render a list of diagram codes in one request: {"diagrams": [code, ...]}.
+        Returns {"results": [{"diagram_svg", "error"}, ...]} in the same order."""
+        from .diagram.engine import render_diagrams_batch, MAX_BATCH_DIAGRAMS
+        codes = request.data.get("diagrams")
+        if not isinstance(codes, list):
+            return Response({"error": "diagrams must be a list of diagram codes"}, status=400)
+        if len(codes) > MAX_BATCH_DIAGRAMS:
+            return Response({"error": f"at most {MAX_BATCH_DIAGRAMS} diagrams per batch"}, status=400)
+        return Response({"results": render_diagrams_batch(codes)})
+
     @action(detail=False, methods=["post"])
     def generate_from_image(self, request):
         image_b64 = request.data.get("image")
@@ -281,8 +281,26 @@ CELERY_BEAT_SCHEDULE = {
         "task": "backend.tasks.run_sms_jobs",
         "schedule": 30.0,
     },
+    "refill-question-pools-every-60s": {
+        "task": "backend.tasks.refill_question_pools_task",
+        "schedule": 60.0,
+    },
 }
 
+# Shared cache (pre-rendered question pools are filled by the Celery worker and
+# read by the web processes). Falls back to Django's per-process default locally,
+# where question pooling is switched off (see backend/question_pool.py).
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+
+# Cache holding tutor calendars, student lists and the skills matrix (backend/cache.py)
+CALENDAR_CACHE_ALIAS = "default"
+
 CELERY_TIMEZONE = "Australia/Sydney"
 CELERY_ENABLE_UTC = False
 